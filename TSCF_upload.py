@@ -27,6 +27,10 @@
 # 		Purchase Cost都相同。但是这并不能保证将来也是如此。本文件在 
 # 		samples/Jones Holding 2017.12.20.xlsx
 #
+# 		为此，update_position() 先按 (ISIN, portfolio) 查找 Jones 数据，
+# 		找不到再按 ISIN 查找。目前 Jones 文件没有 portfolio 列，如果将来
+# 		每一行带有 'Portfolio'，则会自动按组合匹配。
+#
 # 
 # File 2 is for another data field -- "days between last year end and
 # maturity" -- for each security in trustee fixed income portfolios in
@@ -40,11 +44,15 @@
 
 
 from small_program.read_file import read_file
-from trustee.holding import get_security_id_map
 from trustee.utility import get_output_directory, get_geneva_input_directory, \
 							get_current_directory
-from trustee.geneva import read_line
-from trustee.quick_holding import is_cash_position, is_AFS_position
+from trustee.geneva import iter_position_files
+from trustee.cache import read_with_cache
+from trustee.record import JonesPosition
+from trustee.writer import iter_rows, make_row_builder, write_rows, required, \
+							fixed, computed
+from trustee.quick_holding import is_cash_position, is_AFS_position, \
+								iter_non_cash_position
 from datetime import date, timedelta
 from os.path import join, isfile
 from os import listdir
@@ -62,9 +70,10 @@ class PositionNotFound(Exception):
 
 
 def read_line_jones(ws, row, fields):
-	position = {}
-	for i in range(22):
-		cell_value = ws.cell_value(row, i)
+	position = JonesPosition()
+	values = ws.row_values(row, 0, 22)
+	for i in (1, 20, 21):
+		cell_value = values[i]
 		if isinstance(cell_value, str):
 			cell_value = cell_value.strip()
 
@@ -87,13 +96,25 @@ def update_position(geneva_holding, jones_holding):
 	For each position in Geneva holding, find its Yield at Cost
 	and Purchase Cost from Jones Holdings, and update that position
 	with these two fields.
+
+	The Jones holding is indexed once, see index_jones_holding().
 	"""
-	for position in geneva_holding:
-		if is_cash_position(position):
-			continue
+	for position in iter_updated_position(geneva_holding, jones_holding):
+		pass
+
+
 
+def iter_updated_position(geneva_holding, jones_holding):
+	"""
+	The streaming version of update_position(), a generator that updates
+	each non cash position as it goes and yields it. geneva_holding can be
+	any iterable of positions, including a generator.
+	"""
+	jones_index = index_jones_holding(jones_holding)
+	for position in iter_non_cash_position(geneva_holding):
 		try:
-			p = find_jones_position(jones_holding, get_ISIN_from_investID(position['InvestID']))
+			p = lookup_jones_position(jones_index, get_ISIN_from_investID(position['InvestID']),
+										position['Portfolio'])
 			position['Yield at Cost'] = p['Yield at Cost']
 			position['Purchase Cost'] = p['Purchase Cost']
 
@@ -105,6 +126,8 @@ def update_position(geneva_holding, jones_holding):
 		else:
 			position['Maturity to Last Year End'] = get_days_maturity_LYE(position['MaturityDate'])
 
+		yield position
+
 
 
 def get_days_maturity_LYE(maturity_date):
@@ -123,13 +146,37 @@ def get_ISIN_from_investID(geneva_invest_id):
 
 
 
-def find_jones_position(jones_holding, isin):
+def index_jones_holding(jones_holding):
+	"""
+	Index the Jones positions by (ISIN, portfolio), and by (ISIN, None) as
+	the fallback when a portfolio has no position of its own. If there are
+	multiple positions with the same key, the first one wins.
+
+	A Jones position has a portfolio only if it has the 'Portfolio' field.
+	"""
+	jones_index = {}
 	for position in jones_holding:
-		if position['ISIN'] == isin:
-			return position
+		portfolio = position.get('Portfolio')
+		if not portfolio is None:
+			jones_index.setdefault((position['ISIN'], portfolio), position)
+
+		jones_index.setdefault((position['ISIN'], None), position)
+
+	return jones_index
+
 
-	print('{0} not found in jones holding'.format(isin))
-	raise PositionNotFound()
+
+def lookup_jones_position(jones_index, isin, portfolio):
+	try:
+		return jones_index[(isin, portfolio)]
+	except KeyError:
+		pass
+
+	try:
+		return jones_index[(isin, None)]
+	except KeyError:
+		logger.warning('lookup_jones_position(): {0} not found in jones holding'.format(isin))
+		raise PositionNotFound()
 
 
 
@@ -144,42 +191,89 @@ def get_portfolio_code(geneva_holding):
 
 
 def write_upload_csv(geneva_holding, output_dir=get_output_directory()):
-	with open(join(output_dir, get_filename()), 'w', newline='') as csvfile:
+	rows = iter_rows(iter_non_cash_position(geneva_holding),
+						make_row_builder(get_upload_columns('CD021', 'Yield at Cost')),
+						make_row_builder(get_upload_columns('CD022', 'Purchase Cost')))
+	write_upload_rows(join(output_dir, get_filename()), rows)
+
+
+
+def get_upload_columns(field_id, field_name, account_code=None):
+	"""
+	Columns of an upload file row: field id, security id type (4 = ISIN),
+	ISIN, account code (the portfolio, if not given), numeric value and
+	char value (both the value of the field).
+	"""
+	if account_code is None:
+		account = required('Portfolio')
+	else:
+		account = fixed(account_code)
+
+	return [fixed(field_id), fixed('4'), computed(get_ISIN_from_position), account,
+			required(field_name), required(field_name)]
+
+
+
+def get_ISIN_from_position(position):
+	return get_ISIN_from_investID(position['InvestID'])
+
 
+
+def write_upload_rows(upload_file, rows):
+	"""
+	Write the upload file, the two header rows followed by the rows.
+	"""
+	with open(upload_file, 'w', newline='') as csvfile:
 		file_writer = csv.writer(csvfile, delimiter=',')
-		file_writer.writerow(['Upload Method','INCREMENTAL','','','',''])
-		file_writer.writerow(['Field Id','Security Id Type','Security Id','Account Code',
-								'Numeric Value','Char Value'])
+		file_writer.writerows(get_upload_header())
+		write_rows(file_writer, rows)
+
+	return upload_file
 
-		for position in geneva_holding:
-			if is_cash_position(position):
-				continue
 
-			# print(position['InvestID'])
-			row1 = ['CD021','4',get_ISIN_from_investID(position['InvestID']),
-					position['Portfolio'],position['Yield at Cost'],position['Yield at Cost']]
-			row2 = ['CD022','4',get_ISIN_from_investID(position['InvestID']),
-					position['Portfolio'],position['Purchase Cost'],position['Purchase Cost']]
-			
-			file_writer.writerow(row1)
-			file_writer.writerow(row2)
 
+def get_upload_header():
+	return [['Upload Method','INCREMENTAL','','','',''],
+			['Field Id','Security Id Type','Security Id','Account Code',
+				'Numeric Value','Char Value']]
 
 
-def get_holding_from_files(input_dir=get_geneva_input_directory()):
+
+def get_holding_from_files(input_dir=get_geneva_input_directory(), incremental=False,
+							workers=1):
 	"""
 	Based on all local position appraisal files in a directory, then
 	read Geneva holdings from them.
+
+	This is a generator, positions are yielded file after file as they
+	are read, so that only one file's positions are in memory at a time.
+	Put it in a list if the holding needs to be gone through more than
+	once.
+
+	Only the columns needed by the TSCF uploads are read, and the result
+	of each file is cached by its content.
+
+	incremental: if True, only files new or changed since the last run 
+		are parsed.
+
+	workers: number of processes to read the files in parallel.
+
+	A file that fails to read raises geneva.PositionFileError, so that
+	nothing is uploaded from a partial holding.
 	"""
 	file_list = [join(input_dir, f) for f in listdir(input_dir) \
 					if isfile(join(input_dir, f)) and f.split('.')[-1] == 'xlsx']
 
-	geneva_holding = []
-	for file in file_list:
-		holding, row_in_error = read_file(file, read_line)
-		geneva_holding = geneva_holding + holding
+	return iter_position_files(file_list, get_geneva_columns(), incremental, workers)
 
-	return geneva_holding
+
+
+def get_geneva_columns():
+	"""
+	Columns of the local position appraisal report needed by the uploads,
+	'Description' is there for the maturity date.
+	"""
+	return ['Portfolio', 'InvestID', 'Group1', 'Group2', 'Quantity', 'Description']
 
 
 
@@ -191,61 +285,53 @@ def consolidate_security(position_holding):
 	"maturity date to last year end", it's security level, not 
 	position level.
 	"""
-	holding = []
-	for position in position_holding:
-		if is_cash_position(position):
-				continue
-
-		if not has_position(holding, position):
-			holding.append(position)
-
-	return holding
+	return list(iter_consolidated_security(position_holding))
 
 
 
-def has_position(holding, position):
-	for p in holding:
-		if get_ISIN_from_investID(p['InvestID']) == \
-			get_ISIN_from_investID(position['InvestID']):
-			
-			return True
-
-	return False
+def iter_consolidated_security(position_holding):
+	"""
+	The streaming version of consolidate_security(), a generator that
+	yields the first non cash position of each ISIN. position_holding
+	can be any iterable of positions, including a generator.
+	"""
+	isin_seen = set()
+	for position in iter_non_cash_position(position_holding):
+		isin = get_ISIN_from_investID(position['InvestID'])
+		if not isin in isin_seen:
+			isin_seen.add(isin)
+			yield position
 
 
 
 def write_upload_csv_maturity(holding, output_dir=get_output_directory()):
-	with open(join(output_dir, 'f3321tscf.maturity_to_lye.inc'), 'w', newline='') as csvfile:
-
-		file_writer = csv.writer(csvfile, delimiter=',')
-		file_writer.writerow(['Upload Method','INCREMENTAL','','','',''])
-		file_writer.writerow(['Field Id','Security Id Type','Security Id','Account Code',
-								'Numeric Value','Char Value'])
-
-		for position in holding:
-			if is_cash_position(position):
-				continue
-
-			# print(position['InvestID'])
-			row = ['CD023','4',get_ISIN_from_investID(position['InvestID']),
-					'', position['Maturity to Last Year End'],
-					position['Maturity to Last Year End']]
-
-			file_writer.writerow(row)
+	rows = iter_rows(iter_non_cash_position(holding), 
+						make_row_builder(get_upload_columns('CD023', 'Maturity to Last Year End', '')))
+	write_upload_rows(join(output_dir, 'f3321tscf.maturity_to_lye.inc'), rows)
 
 
 
 
 if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser(description='Create the TSCF upload files from Geneva \
+										local position appraisal files.')
+	parser.add_argument('--incremental', help='parse only files new or changed since the last run', 
+						action='store_true')
+	parser.add_argument('--workers', help='number of processes to parse files in parallel', 
+						type=int, default=1)
+	args = parser.parse_args()
+
 	import logging.config
 	logging.config.fileConfig('logging.config', disable_existing_loggers=False)
 
 	input_file = join(get_current_directory(), 'samples', 'Jones Holding 2017.12.20.xlsx')
-	jones_holding, row_in_error = read_file(input_file, read_line_jones)
+	jones_holding, row_in_error = read_with_cache(input_file, 'jones', read_file, read_line_jones)
 
-	holding = get_holding_from_files()
-	update_position(holding, jones_holding)
+	# two upload files out of the same holding, so keep it in a list
+	holding = list(iter_updated_position(get_holding_from_files(incremental=args.incremental,
+																workers=args.workers), 
+											jones_holding))
 	write_upload_csv(holding)
 
-	consolidated_holding = consolidate_security(holding)
-	write_upload_csv_maturity(consolidated_holding)
\ No newline at end of file
+	write_upload_csv_maturity(iter_consolidated_security(holding))
\ No newline at end of file
@@ -28,25 +28,18 @@
 
 
 from trustee.utility import get_output_directory, get_input_directory, \
-							get_current_directory, get_exchange_file
-from trustee.TSCF_upload import consolidate_security, get_ISIN_from_investID, \
-							get_holding_from_files
-from trustee.sftp import upload
+							get_current_directory
+from trustee.TSCF_upload import iter_consolidated_security, get_ISIN_from_investID, \
+							get_holding_from_files, get_ISIN_from_position, \
+							write_upload_rows
+from trustee.rate_table import get_rate_table
 from datetime import date, timedelta
 from os.path import join
-import logging, csv, configparser
+import logging, configparser
 logger = logging.getLogger(__name__)
 
 
 
-class InvalidCurrency(Exception):
-	pass
-
-class ExchangeRateNotFound(Exception):
-	pass
-
-
-
 def get_days_since_LYE():
 	"""
 	Workout the number of days since the last year end (LYE) to today.
@@ -67,28 +60,13 @@ def get_bond_list():
 
 
 
-def get_exchange_rate(currency_description):
-	if "exchange" not in get_exchange_rate.__dict__:
-		get_exchange_rate.exchange = configparser.ConfigParser()
-		get_exchange_rate.exchange.read(get_exchange_file())
-
-	c_map = {
-		'United States Dollar':'USD',
-		'Chinese Renminbi Yuan':'CNY'
-	}
-
-	if currency_description == 'Hong Kong Dollar':
-		return 1.0
-
-	else:
-		try:
-			currency = c_map[currency_description]
-			return get_exchange_rate.exchange['Exchange'][currency+'HKD']
-
-		except KeyError:
-			logger.exception('get_exchange_rate(): currency {0} has problem'.
-								format(currency_description))
-			raise ExchangeRateNotFound()
+def reload_exchange_rates():
+	"""
+	Check the exchange file now and read it again if it is modified.
+	Return the rates as a dictionary, like {'USDHKD': 7.8472, ...}, empty
+	if the file has no rates.
+	"""
+	return dict(get_rate_table(check=True).rates)
 
 
 
@@ -116,44 +94,23 @@ def write_upload_csv_lye(bond_list=get_bond_list(), output_dir=get_output_direct
 	"""
 	Create the "days since last year end" upload file.
 	"""
-	upload_file = join(output_dir, get_lye_file_name())
-	with open(upload_file, 'w', newline='') as csvfile:
-
-		file_writer = csv.writer(csvfile, delimiter=',')
-		file_writer.writerow(['Upload Method','INCREMENTAL','','','',''])
-		file_writer.writerow(['Field Id','Security Id Type','Security Id','Account Code',
-								'Numeric Value','Char Value'])
-
-		days_since_lye = get_days_since_LYE()
-		for isin in bond_list:
-			row = ['CD024','4',isin,'',days_since_lye,days_since_lye]
-			file_writer.writerow(row)
-
-	return upload_file
+	days_since_lye = get_days_since_LYE()
+	return write_upload_rows(join(output_dir, get_lye_file_name()), 
+								(['CD024','4',isin,'',days_since_lye,days_since_lye] \
+									for isin in bond_list))
 
 
 
 def write_upload_csv_exc(holding, output_dir=get_output_directory()):
 	"""
-	Create the "exchange rate" upload file.
+	Create the "exchange rate" upload file, the rates of all positions are
+	looked up in one go from their currency descriptions.
 	"""
-	upload_file = join(output_dir, get_exc_file_name())
-	with open(upload_file, 'w', newline='') as csvfile:
-
-		file_writer = csv.writer(csvfile, delimiter=',')
-		file_writer.writerow(['Upload Method','INCREMENTAL','','','',''])
-		file_writer.writerow(['Field Id','Security Id Type','Security Id','Account Code',
-								'Numeric Value','Char Value'])
-
-		for security in holding:
-			row = ['CD025','4',get_ISIN_from_investID(security['InvestID']),
-					'',get_exchange_rate(security['Group1']),
-					get_exchange_rate(security['Group1'])]
-
-			file_writer.writerow(row)
-		# end of for loop
-
-	return upload_file
+	holding = list(holding)
+	rates = get_rate_table().get_rates([position['Group1'] for position in holding])
+	return write_upload_rows(join(output_dir, get_exc_file_name()), 
+								(['CD025','4',get_ISIN_from_position(position),'',rate,rate] \
+									for position, rate in zip(holding, rates)))
 
 
 
@@ -167,4 +124,4 @@ if __name__ == '__main__':
 
 	logger.info('start to create TSCF upload file.')
 	upload_file_lye = write_upload_csv_lye()
-	upload_file_exc = write_upload_csv_exc(consolidate_security(get_holding_from_files()))
\ No newline at end of file
+	upload_file_exc = write_upload_csv_exc(iter_consolidated_security(get_holding_from_files()))
\ No newline at end of file
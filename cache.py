@@ -0,0 +1,96 @@
+# coding=utf-8
+#
+# On-disk cache of parsed results of input files.
+#
+# Most runs re-parse Excel files that have not changed since the last run.
+# The parsed result of a file (holdings, transactions, Geneva positions)
+# is pickled into the cache directory, keyed by the file's content hash,
+# the parser name and PARSER_VERSION. When the same content is read by the
+# same parser again, the result is loaded from the cache and the Excel
+# file is not parsed at all.
+#
+# Bump PARSER_VERSION whenever the output of a parser changes, so that the
+# results cached by the old parsers are not used any more.
+#
+
+from trustee.utility import get_cache_directory, is_cache_enabled, write_atomic
+from os.path import join
+import hashlib, pickle
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+PARSER_VERSION = '2'
+
+
+
+def read_with_cache(filename, parser_name, read_func, *args, file_hash=None):
+	"""
+	Return read_func(filename, *args), from the cache if the same content
+	has been parsed by the same parser before.
+
+	parser_name: identifies the parser and its arguments, results of the
+		same file read by different parsers are cached separately.
+
+	file_hash: content hash of the file, if already known.
+	"""
+	if not is_cache_enabled():
+		return read_func(filename, *args)
+
+	return read_cached(filename, parser_name, read_func, *args, file_hash=file_hash)
+
+
+
+def read_cached(filename, parser_name, read_func, *args, file_hash=None):
+	"""
+	The same as read_with_cache(), but the cache is used even if it is
+	not enabled in the configuration file.
+	"""
+	if file_hash is None:
+		file_hash = get_file_hash(filename)
+
+	cache_file = get_cache_file(file_hash, parser_name)
+	try:
+		return load_result(cache_file)
+	except FileNotFoundError:
+		pass
+	except Exception:
+		logger.warning('read_cached(): cache file {0} for {1} cannot be loaded'.
+						format(cache_file, filename))
+
+	result = read_func(filename, *args)
+	save_result(cache_file, result)
+	return result
+
+
+
+def get_file_hash(filename):
+	"""
+	Hash of the file content, read in chunks so that big files are not
+	loaded into memory at once.
+	"""
+	h = hashlib.blake2b(digest_size=20)
+	with open(filename, 'rb') as f:
+		for chunk in iter(lambda: f.read(1024*1024), b''):
+			h.update(chunk)
+
+	return h.hexdigest()
+
+
+
+def get_cache_file(file_hash, parser_name):
+	key = hashlib.blake2b('{0}|{1}|{2}'.format(file_hash, parser_name, PARSER_VERSION).
+							encode('utf-8'), digest_size=20).hexdigest()
+	return join(get_cache_directory(), key + '.pickle')
+
+
+
+def load_result(cache_file):
+	with open(cache_file, 'rb') as f:
+		return pickle.load(f)
+
+
+
+def save_result(cache_file, result):
+	write_atomic(cache_file, lambda f: pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL))
@@ -4,21 +4,44 @@
 # portfolio currency" data field for all securities and upload to 
 # Bloomberg AIM.
 # 
+# Run with --minutes from the scheduler, it uploads once if the exchange
+# file was modified within that many minutes. Run with --daemon, it stays
+# resident: the consolidated Geneva holding is kept in memory (read again
+# only when the appraisal files change), the exchange file is watched
+# (inotify if inotify_simple is installed, otherwise a stat poll), and
+# the file is uploaded as soon as the rates in it actually change.
+# 
 
 
-from trustee.TSCF_upload_daily import write_upload_csv_exc
-from trustee.TSCF_upload import consolidate_security, \
+from trustee.TSCF_upload_daily import write_upload_csv_exc, reload_exchange_rates
+from trustee.TSCF_upload import iter_consolidated_security, \
 									get_holding_from_files
-from trustee.utility import get_exchange_file
+from trustee.geneva import PositionFileError
+from trustee.utility import get_exchange_file, get_geneva_input_directory
 from trustee.sftp import upload
-from os.path import isfile, getmtime
+from os.path import isfile, getmtime, dirname, basename, join
 from datetime import datetime, timedelta
+import os, time
+try:
+	from inotify_simple import INotify, flags
+except ImportError:
+	INotify = None
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 
+# seconds to wait for a change of the exchange file, the appraisal files
+# are checked in between
+WATCH_INTERVAL = 10
+
+# seconds the exchange file must stay the same before it is read, so that
+# a file still being written is not read
+SETTLE_TIME = 1
+
+
+
 def exchange_file_exists():
 	if isfile(get_exchange_file()):
 		return True
@@ -41,6 +64,172 @@ def modified_within(minutes):
 
 
 
+def upload_exc(holding):
+	"""
+	Create the exchange rate file for the holding and upload it, return
+	True if the upload is OK.
+	"""
+	logger.info('start to upload EXC file.')
+	result = upload([write_upload_csv_exc(holding)])
+	if len(result['pass']) == 1:
+		logger.info('upload OK: {0}'.format(result['pass'][0]))
+		return True
+	else:
+		logger.error('upload failed: {0}'.format(result['fail']))
+		return False
+
+
+
+def load_holding(workers=1, incremental=False):
+	"""
+	The consolidated Geneva holding in a list, so that it can be uploaded
+	again and again.
+	"""
+	return list(iter_consolidated_security(get_holding_from_files(incremental=incremental,
+																	workers=workers)))
+
+
+
+def get_file_state(filename):
+	"""
+	(modified time, size) of a file, None if the file does not exist.
+	"""
+	try:
+		stat = os.stat(filename)
+		return (stat.st_mtime, stat.st_size)
+	except FileNotFoundError:
+		return None
+
+
+
+def get_directory_state(directory):
+	"""
+	The state of all appraisal files (.xlsx) in a directory, it changes
+	when a file is added, removed or modified.
+	"""
+	return {f: get_file_state(join(directory, f)) for f in os.listdir(directory) \
+				if f.split('.')[-1] == 'xlsx'}
+
+
+
+def wait_until_settled(filename, settle_time=SETTLE_TIME):
+	state = get_file_state(filename)
+	while True:
+		time.sleep(settle_time)
+		new_state = get_file_state(filename)
+		if new_state == state:
+			return
+
+		state = new_state
+
+
+
+def watch_file(filename, interval=WATCH_INTERVAL):
+	"""
+	A generator that yields True when the file has changed, or False after
+	waiting interval seconds without a change. It never ends.
+	"""
+	if not INotify is None:
+		try:
+			yield from watch_file_inotify(filename, interval)
+		except OSError:
+			logger.warning('watch_file(): inotify not available on {0}, poll instead'.
+							format(filename))
+
+	yield from watch_file_poll(filename, interval)
+
+
+
+def watch_file_inotify(filename, interval):
+	inotify = INotify()
+	inotify.add_watch(dirname(filename) or '.', flags.CLOSE_WRITE | flags.MOVED_TO | \
+						flags.CREATE | flags.DELETE)
+	name = basename(filename)
+	while True:
+		events = inotify.read(timeout=int(interval*1000))
+		yield any(event.name == name for event in events)
+
+
+
+def watch_file_poll(filename, interval, poll_interval=1):
+	"""
+	Check the modified time and size of the file every poll_interval
+	seconds, a stat call is cheap even on a network drive.
+	"""
+	state = get_file_state(filename)
+	while True:
+		changed = False
+		deadline = time.monotonic() + interval
+		while not changed and time.monotonic() < deadline:
+			time.sleep(min(poll_interval, interval))
+			new_state = get_file_state(filename)
+			changed = new_state != state
+			state = new_state
+
+		yield changed
+
+
+
+def run_daemon(workers=1, incremental=False, interval=WATCH_INTERVAL, events=None):
+	"""
+	Upload the exchange rate file whenever the rates change, until stopped.
+	An error in a check, like a bad appraisal file or a currency missing
+	from a half edited exchange file, is logged and the upload is tried
+	again on the next check, the daemon keeps running.
+
+	incremental: if True, only appraisal files new or changed since the
+		last read are parsed, see incremental.py
+
+	events: the changes of the exchange file, watch_file() by default.
+	"""
+	input_dir = get_geneva_input_directory()
+	holding, directory_state = None, None
+	try:
+		directory_state = get_directory_state(input_dir)
+		holding = load_holding(workers, incremental)
+		logger.info('run_daemon(): {0} securities, watch {1}'.
+						format(len(holding), get_exchange_file()))
+	except Exception:
+		logger.exception('run_daemon(): failed to read holding, try again later')
+
+	rates = reload_exchange_rates()
+	upload_pending = False
+	if events is None:
+		events = watch_file(get_exchange_file(), interval)
+
+	for changed in events:
+		try:
+			new_state = get_directory_state(input_dir)
+			if holding is None or new_state != directory_state:
+				logger.info('run_daemon(): appraisal files changed, read holding again')
+				holding = load_holding(workers, incremental)
+				directory_state = new_state
+
+			if not changed and not upload_pending:
+				continue
+
+			if changed:
+				wait_until_settled(get_exchange_file())
+
+			new_rates = reload_exchange_rates()
+			if new_rates == rates and not upload_pending:
+				logger.debug('run_daemon(): exchange file touched, rates unchanged')
+				continue
+
+			if len(new_rates) == 0:
+				logger.warning('run_daemon(): no rates in exchange file, not uploaded')
+				continue
+
+			# a failed upload is tried again on the next check
+			rates = new_rates
+			upload_pending = not upload_exc(holding)
+
+		except Exception:
+			logger.exception('run_daemon(): check failed, try again on the next check')
+			upload_pending = True
+
+
+
 if __name__ == '__main__':
 
 	import argparse
@@ -48,8 +237,16 @@ if __name__ == '__main__':
 										rate file.')
 	parser.add_argument('--minutes', help='if exchange file modified within this \
 										amount of time, the upload will be triggered', 
-										required=True)
+										required=False)
+	parser.add_argument('--workers', help='number of processes to read the Geneva \
+										appraisal files', type=int, default=1)
+	parser.add_argument('--daemon', help='stay resident and upload whenever the \
+										rates change', action='store_true')
+	parser.add_argument('--incremental', help='parse only appraisal files new or \
+										changed since the last run', action='store_true')
 	args = parser.parse_args()
+	if args.minutes is None and not args.daemon:
+		parser.error('either --minutes or --daemon is required')
 
 	import logging.config
 	logging.config.fileConfig('logging.config', disable_existing_loggers=False)
@@ -59,11 +256,12 @@ if __name__ == '__main__':
 	# from now, the do nothing. Othereise do upload.
 	# 
 	logger.info('program starts')
-	if exchange_file_exists() and modified_within(int(args.minutes)):
-
-		logger.info('start to upload EXC file.')
-		result = upload([write_upload_csv_exc(consolidate_security(get_holding_from_files()))])
-		if len(result['pass']) == 1:
-			logger.info('upload OK: {0}'.format(result['pass'][0]))
-		else:
-			logger.error('upload failed: {0}'.format(result['fail'][0]))
\ No newline at end of file
+	if args.daemon:
+		run_daemon(args.workers, args.incremental)
+
+	elif exchange_file_exists() and modified_within(int(args.minutes)):
+		try:
+			upload_exc(iter_consolidated_security(get_holding_from_files(incremental=args.incremental, 
+												workers=args.workers)))
+		except PositionFileError as e:
+			logger.error('failed to read appraisal file {0}, not uploaded'.format(e.args[0]))
@@ -0,0 +1,104 @@
+# coding=utf-8
+#
+# Convert a whole column of Excel serial dates at once.
+#
+# xlrd's xldate_as_datetime() converts one cell at a time, and the parsers
+# used to call it for every date cell inside a try/except. Here a column
+# of cell values is converted in one step, with NumPy if it is installed,
+# and the cells that are not dates (text like 'N/A', blank cells) are
+# reported in a mask instead of one warning per cell.
+#
+# The conversion follows xldate_as_datetime(): serials are rounded to the
+# millisecond, and for the 1900 date system (datemode 0) serials before 60
+# are counted from 1899-12-31, later ones from 1899-12-30, which works
+# around the 1900 leap year bug of Excel.
+#
+
+from datetime import datetime, timedelta
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+
+EPOCH_1900 = datetime(1899, 12, 31)
+EPOCH_1900_MINUS_1 = datetime(1899, 12, 30)
+EPOCH_1904 = datetime(1904, 1, 1)
+
+
+
+def convert_excel_dates(values, datemode=0):
+	"""
+	Convert a list of cell values from Excel serials to datetime.
+
+	Return (dates, invalid), where dates is a list of the same length as
+	values, a valid serial becomes a datetime, an invalid value is kept as
+	it is. invalid is a list of booleans telling which values are invalid.
+	"""
+	if not np is None:
+		dates64, invalid = to_datetime64(values, datemode)
+		dates = dates64.astype(object).tolist()	# datetime64[ms] -> datetime
+		invalid = invalid.tolist()
+		for i, value in enumerate(values):
+			if invalid[i]:
+				dates[i] = value
+
+		return dates, invalid
+
+	dates = []
+	invalid = []
+	for value in values:
+		if is_serial(value):
+			days = int(value)
+			milliseconds = int(round((value - days)*86400000.0))
+			dates.append(get_epoch(value, datemode) + timedelta(days, 0, 0, milliseconds))
+			invalid.append(False)
+		else:
+			dates.append(value)
+			invalid.append(True)
+
+	return dates, invalid
+
+
+
+def to_datetime64(values, datemode=0):
+	"""
+	Convert a list of cell values from Excel serials to datetime64[ms],
+	needs NumPy.
+
+	Return (dates, invalid), both are arrays, an invalid value becomes
+	NaT in dates and True in invalid.
+	"""
+	serials = np.array([value if is_serial(value) else np.nan for value in values],
+						dtype=np.float64)
+	invalid = np.isnan(serials)
+	serials[invalid] = 0
+
+	days = np.trunc(serials)
+	milliseconds = np.round((serials - days) * 86400000.0)
+	if datemode == 1:
+		epoch = np.full(len(serials), np.datetime64(EPOCH_1904, 'ms'))
+	else:
+		epoch = np.where(serials < 60, np.datetime64(EPOCH_1900, 'ms'),
+							np.datetime64(EPOCH_1900_MINUS_1, 'ms'))
+
+	dates = epoch + days.astype('timedelta64[D]') + milliseconds.astype('timedelta64[ms]')
+	dates[invalid] = np.datetime64('NaT')
+	return dates, invalid
+
+
+
+def is_serial(value):
+	return isinstance(value, (int, float)) and not isinstance(value, bool) \
+			and value == value	# not NaN
+
+
+
+def get_epoch(serial, datemode):
+	if datemode == 1:
+		return EPOCH_1904
+	elif serial < 60:
+		return EPOCH_1900
+	else:
+		return EPOCH_1900_MINUS_1
@@ -0,0 +1,205 @@
+# coding=utf-8
+#
+# Export parsed holdings and transactions to columnar binary files.
+#
+# The csv files written by holding.py, transaction.py and geneva.py are
+# for people to read, the reconciliation jobs downstream would have to
+# parse the text again. Here the same data is written column by column
+# with typed columns (text, amounts as float64, dates as timestamps):
+#
+#	Parquet (.parquet), if pyarrow is installed;
+#	otherwise NumPy compressed archive (.npz), one array per column.
+#
+# read_columnar() loads either format back into a dictionary of column
+# name to NumPy array.
+#
+
+from datetime import datetime
+from os.path import join
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+try:
+	import numpy as np
+except ImportError:
+	np = None
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class ColumnarExportNotAvailable(Exception):
+	pass
+
+
+
+# column types
+TEXT = 'text'
+AMOUNT = 'amount'
+DATE = 'date'
+
+BOND_HOLDING_COLUMNS = [('portfolio_id', TEXT), ('date', DATE), ('isin', TEXT), ('name', TEXT),
+						('currency', TEXT), ('accounting_treatment', TEXT),
+						('par_amount', AMOUNT), ('coupon_rate', AMOUNT),
+						('coupon_start_date', DATE), ('maturity_date', DATE),
+						('average_cost', AMOUNT), ('amortized_cost', AMOUNT),
+						('book_cost', AMOUNT), ('interest_bought', AMOUNT),
+						('amortized_value', AMOUNT), ('accrued_interest', AMOUNT),
+						('amortized_gain_loss', AMOUNT), ('fx_gain_loss', AMOUNT)]
+
+TRANSACTION_COLUMNS = [('portfolio_id', TEXT), ('action', TEXT), ('security_id', TEXT),
+						('description', TEXT), ('trade date', DATE), ('value date', DATE),
+						('currency', TEXT), ('reference code', TEXT), ('broker', TEXT),
+						('amount', AMOUNT), ('price', AMOUNT), ('cost', AMOUNT),
+						('bought interest', AMOUNT), ('fx rate', AMOUNT),
+						('effective yield', AMOUNT)]
+
+GENEVA_COLUMNS = [('Portfolio', TEXT), ('InvestID', TEXT), ('Group1', TEXT), ('Group2', TEXT),
+					('ExtendedDescription', TEXT), ('Quantity', AMOUNT), ('UnitCost', AMOUNT),
+					('MaturityDate', DATE)]
+
+
+
+def get_columnar_format():
+	"""
+	The file extension of the columnar format in use, 'parquet' or 'npz'.
+	"""
+	if not pyarrow is None:
+		return 'parquet'
+	elif not np is None:
+		return 'npz'
+	else:
+		logger.error('get_columnar_format(): neither pyarrow nor numpy is installed')
+		raise ColumnarExportNotAvailable()
+
+
+
+def write_columnar(filename, columns, records):
+	"""
+	Write the records into a columnar file.
+
+	filename: the file name without extension, the extension of the format
+		in use is added.
+
+	columns: a list of (field name, column type), a record without the
+		field gets an empty value: '' for text, NaN for amount, no date
+		(null or NaT) for date. So does a value of the wrong type, e.g.,
+		'N/A' in a date column.
+
+	Return the file name with extension.
+	"""
+	file_format = get_columnar_format()
+	filename = filename + '.' + file_format
+	values = {name: [convert_value(record.get(name, ''), column_type) for record in records] \
+				for name, column_type in columns}
+	if file_format == 'parquet':
+		write_parquet(filename, columns, values)
+	else:
+		write_npz(filename, columns, values)
+
+	return filename
+
+
+
+def convert_value(value, column_type):
+	"""
+	Convert the value to the column type, None for an empty value.
+	"""
+	if column_type == TEXT:
+		if isinstance(value, float) and value.is_integer():
+			return str(int(value))	# codes like 12229 read as float
+
+		return str(value)
+
+	elif column_type == AMOUNT:
+		if isinstance(value, (int, float)) and not isinstance(value, bool):
+			return float(value)
+
+		return None
+
+	elif isinstance(value, datetime):
+		return value
+
+	return None
+
+
+
+def write_parquet(filename, columns, values):
+	types = {TEXT: pyarrow.string(), AMOUNT: pyarrow.float64(), DATE: pyarrow.timestamp('ms')}
+	table = pyarrow.table({name: pyarrow.array(values[name], type=types[column_type]) \
+							for name, column_type in columns})
+	pyarrow.parquet.write_table(table, filename)
+
+
+
+def write_npz(filename, columns, values):
+	arrays = {}
+	for name, column_type in columns:
+		v = values[name]
+		if column_type == TEXT:
+			arrays[name] = np.array(v, dtype=str)
+		elif column_type == AMOUNT:
+			arrays[name] = np.array([np.nan if x is None else x for x in v], dtype=np.float64)
+		else:
+			arrays[name] = np.array(v, dtype='datetime64[ms]')	# None becomes NaT
+
+	with open(filename, 'wb') as f:
+		np.savez_compressed(f, **arrays)
+
+
+
+def read_columnar(filename):
+	"""
+	Load a columnar file, return a dictionary of column name to NumPy array,
+	in the order of the columns in the file.
+	"""
+	if filename.endswith('.parquet'):
+		table = pyarrow.parquet.read_table(filename)
+		return {name: table.column(name).to_numpy() for name in table.column_names}
+
+	with np.load(filename, allow_pickle=False) as data:
+		return {name: data[name] for name in data.files}
+
+
+
+def export_bond_holding(port_values, output_dir):
+	"""
+	Export the bond holding of a portfolio on a date, like holding.write_bond_holding_csv()
+	"""
+	date = port_values['date'].strftime('%Y-%m-%d')
+	extra = {'portfolio_id': port_values['portfolio_id'], 'date': port_values['date']}
+	records = [ChainedRecord(bond, extra) for bond in port_values['bond']]
+	return write_columnar(join(output_dir, port_values['portfolio_id']+'_'+date+'_trustee_nav'),
+							BOND_HOLDING_COLUMNS, records)
+
+
+
+def export_transactions(filename, transactions, output_dir):
+	return write_columnar(join(output_dir, filename), TRANSACTION_COLUMNS, transactions)
+
+
+
+def export_geneva_holding(holding, filename, output_dir):
+	return write_columnar(join(output_dir, filename), GENEVA_COLUMNS, holding)
+
+
+
+class ChainedRecord():
+	"""
+	Look up a field in the record first, then in the extra fields shared
+	by all records, without copying the record.
+	"""
+	__slots__ = ('record', 'extra')
+
+	def __init__(self, record, extra):
+		self.record = record
+		self.extra = extra
+
+
+	def get(self, name, default=None):
+		try:
+			return self.record[name]
+		except KeyError:
+			return self.extra.get(name, default)
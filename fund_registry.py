@@ -0,0 +1,115 @@
+# coding=utf-8
+#
+# The fund registry: trustee fund name -> portfolio id -> custodian.
+#
+# The holding report and the transaction report of the trustee spell the
+# same fund differently, e.g., 'CLI HK BR (CLASS A-HK) TRUST FUND
+# (SUB-FUND-BOND)' and 'CLT-CLI HK BR (Class A-HK) Trust Fund (Sub-Fund-Bond)',
+# sometimes with a space more or less. The registry (see fund_registry.csv)
+# lists the names of each fund, and indexes them by a normalised name (no
+# case, spaces or punctuation), so any of these variants resolves to the
+# portfolio with one dictionary lookup.
+#
+# Like the security master, the registry is loaded once per process, and
+# again when the file is modified.
+#
+
+from trustee.utility import get_fund_registry_file, ReloadingFile
+import csv, hashlib, re
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class InvalidFundRegistry(Exception):
+	pass
+
+
+
+NON_ALPHANUMERIC = re.compile('[\\W_]+')
+
+
+
+class FundRegistry():
+	"""
+	Lookups of portfolio id by fund name, and custodian by portfolio id.
+	"""
+	def __init__(self, entries=[]):
+		self.portfolio_by_name = {}
+		self.custodian_by_portfolio = {}
+		for portfolio_id, custodian, fund_name in entries:
+			self.add(portfolio_id, custodian, fund_name)
+
+
+	def add(self, portfolio_id, custodian, fund_name):
+		key = normalise_fund_name(fund_name)
+		if self.portfolio_by_name.get(key, portfolio_id) != portfolio_id:
+			logger.error('FundRegistry.add(): fund name {0} maps to both {1} and {2}'.
+							format(fund_name, self.portfolio_by_name[key], portfolio_id))
+			raise InvalidFundRegistry()
+
+		self.portfolio_by_name[key] = portfolio_id
+		if custodian != '':
+			self.custodian_by_portfolio[portfolio_id] = custodian
+
+
+	def get_portfolio_id(self, fund_name):
+		"""
+		Raise KeyError if the fund name is unknown.
+		"""
+		return self.portfolio_by_name[normalise_fund_name(fund_name)]
+
+
+	def get_custodian(self, portfolio_id):
+		"""
+		Raise KeyError if the custodian of the portfolio is unknown.
+		"""
+		return self.custodian_by_portfolio[portfolio_id]
+
+
+	def get_key(self):
+		"""
+		A short hash of the registry, to tell apart results that depend on
+		it, e.g., parsed holdings in the cache.
+		"""
+		h = hashlib.blake2b(digest_size=8)
+		for name, portfolio_id in sorted(self.portfolio_by_name.items()):
+			h.update('{0}|{1}|{2}\n'.format(name, portfolio_id,
+						self.custodian_by_portfolio.get(portfolio_id, '')).encode('utf-8'))
+
+		return h.hexdigest()
+
+
+
+def normalise_fund_name(fund_name):
+	return NON_ALPHANUMERIC.sub('', fund_name).lower()
+
+
+
+def read_fund_registry(filename):
+	"""
+	Read the fund registry csv file, lines starting with '#' are comments,
+	the first line after them is the header.
+	"""
+	with open(filename, newline='', encoding='utf-8') as f:
+		reader = csv.DictReader(line for line in f if not line.startswith('#'))
+		try:
+			return FundRegistry([(row['portfolio_id'].strip(), row['custodian'].strip(),
+									row['fund_name']) for row in reader])
+		except (KeyError, AttributeError):
+			logger.error('read_fund_registry(): invalid fund registry file {0}'.
+							format(filename))
+			raise InvalidFundRegistry()
+
+
+
+_fund_registry = ReloadingFile(read_fund_registry)
+
+
+
+def get_fund_registry():
+	"""
+	The fund registry of this process, loaded from the file the first
+	time, and again after the file is modified.
+	"""
+	return _fund_registry.get(get_fund_registry_file())
@@ -7,22 +7,39 @@
 
 from small_program.read_file import read_file
 from trustee.utility import get_output_directory, get_input_directory
-from DIF.open_dif import convert_datetime_to_string
+from trustee.xlsx_reader import read_rows
+from trustee.record import GenevaPosition
+from trustee.cache import read_with_cache
+from trustee.parallel import iter_files
+from trustee.writer import write_csv, field, format_date
 from datetime import datetime
+from os.path import join, basename
 import re
+import logging
+logger = logging.getLogger(__name__)
 
 
 
 class InvalidDateString(Exception):
 	pass
 
+class PositionFileError(Exception):
+	pass
+
 
 
 def read_line(ws, row, fields):
-	position = {}
-	i = 0
-	for fld in fields:
-		cell_value = ws.cell_value(row, i)
+	return make_position(fields, ws.row_values(row, 0, len(fields)))
+
+
+
+def make_position(fields, values):
+	"""
+	Create a position from the field names and the cell values of a row
+	in the local position appraisal report.
+	"""
+	position = GenevaPosition()
+	for fld, cell_value in zip(fields, values):
 		if isinstance(cell_value, str):
 			cell_value = cell_value.strip()
 
@@ -37,12 +54,91 @@ def read_line(ws, row, fields):
 				position['MaturityDate'] = get_maturity_date(m.group(0))
 
 		position[fld] = cell_value
-		i = i + 1
 
 	return position
 
 
 
+def read_positions(filename, columns=['Portfolio', 'Group1', 'Group2', 'InvestID',
+										'Description', 'ExtendedDescription',
+										'Quantity', 'UnitCost']):
+	"""
+	A generator that streams positions out of a local position appraisal
+	report (.xlsx), only the columns given are read.
+
+	Unlike read_file(filename, read_line), the workbook is not loaded into
+	memory as a whole, rows are parsed one at a time.
+	"""
+	for values in read_rows(filename, columns):
+		yield make_position(columns, values)
+
+
+
+def read_position_table(filename, columns=['Portfolio', 'Group1', 'Group2', 'InvestID',
+											'Description', 'ExtendedDescription',
+											'Quantity', 'UnitCost']):
+	"""
+	Read the positions of a local position appraisal report into a
+	columnar table, see table.py. The 'MaturityDate' column is added if
+	'Description' is read.
+	"""
+	from trustee.table import PositionTable	# needs NumPy
+	fields = list(columns)
+	if 'Description' in columns:
+		fields.append('MaturityDate')
+
+	return PositionTable.from_records(read_positions(filename, columns), fields)
+
+
+
+def iter_position_files(file_list, columns, incremental=False, workers=1, skip_error=False):
+	"""
+	A generator that chains the positions of a list of local position
+	appraisal reports, file after file.
+
+	Positions of one file are held in memory at a time, not all of them.
+
+	skip_error: if False, a file that fails to read raises PositionFileError,
+		so that a partial holding is not taken as the whole. If True, the
+		file is logged and left out.
+	"""
+	for file, positions, error in iter_files(file_list, get_parser_name(columns),
+												list_positions, columns,
+												workers=workers, incremental=incremental):
+		if error is None:
+			yield from positions
+		elif not skip_error:
+			raise PositionFileError(file, error)
+
+
+
+def get_parser_name(columns):
+	return 'geneva positions: ' + '|'.join(columns)
+
+
+
+def list_positions(filename, columns):
+	return list(read_positions(filename, columns))
+
+
+
+def get_report_date(filename):
+	"""
+	The date of a local position appraisal report from its file name, like
+	'12229 local appraisal 20180103.xlsx', None if there is no date in the
+	file name.
+	"""
+	m = re.search('(\d{8})', basename(filename))
+	if m is None:
+		return None
+
+	try:
+		return datetime.strptime(m.group(1), '%Y%m%d')
+	except ValueError:
+		return None
+
+
+
 def get_maturity_date(date_string):
 	"""
 	Get date from string 'mm/dd/yy'
@@ -65,8 +161,7 @@ def filter_maturity(holding):
 	for position in holding:
 		if position['Group1'] == 'Cash and Equivalents' or \
 			position['Group2'] == 'Cash and Equivalents' or \
-			isinstance(position['MaturityDate'], datetime) and \
-			position['MaturityDate'] < datetime(2017,1,1):
+			is_matured(position):
 			
 			continue
 
@@ -76,40 +171,41 @@ def filter_maturity(holding):
 
 
 
-def write_bond_holding_csv(holding, filename, output_dir=get_output_directory()):
-	with open(join(output_dir, filename+'_output.csv'), 'w', newline='') as csvfile:
-		file_writer = csv.writer(csvfile, delimiter='|')
-	
-		# pick all fields that HTM bond have
-		fields = ['Portfolio', 'InvestID', 'ExtendedDescription', 'Quantity', 'UnitCost', 'MaturityDate']
-
-		file_writer.writerow(fields)
-		
-		for bond in holding:
-			row = []
-			
-			for fld in fields:
-				try:
-					item = bond[fld]
-					if fld == 'MaturityDate' and isinstance(item, datetime):
-						item = convert_datetime_to_string(item)
-				except KeyError:
-					item = ''
+def is_matured(position):
+	"""
+	A bond matured earlier than 2017-01-01, the same cut off as
+	holding.filter_maturity() on the trustee side.
+	"""
+	return isinstance(position.get('MaturityDate'), datetime) and \
+			position['MaturityDate'] < datetime(2017,1,1)
+
 
-				row.append(item)
 
-			file_writer.writerow(row)
+def write_bond_holding_csv(holding, filename, output_dir=get_output_directory()):
+	# pick all fields that HTM bond have
+	fields = ['Portfolio', 'InvestID', 'ExtendedDescription', 'Quantity', 'UnitCost', 'MaturityDate']
+	columns = [field(fld, format_date) if fld == 'MaturityDate' else field(fld) for fld in fields]
+	write_csv(join(output_dir, filename+'_output.csv'), [fields], columns, holding, delimiter='|')
 
 
 
 if __name__ == '__main__':
 	import argparse, sys, glob, csv
 	from os.path import join, isdir, exists
+	from trustee.export import export_geneva_holding
+	from trustee.history import HistoryStore, HistoryOutOfOrder, append_geneva_holding
 	parser = argparse.ArgumentParser(description='Read Geneva position file and create csv output.')
 	parser.add_argument('--folder', help='folder containing multiple position files', required=False)
 	parser.add_argument('--file', help='input position file', required=False)
+	parser.add_argument('--columnar', help='also export to a columnar binary file (parquet or npz)', 
+						action='store_true')
+	parser.add_argument('--history', help='also save the positions to the holdings history store, \
+						as of the date in the file name (yyyymmdd)', action='store_true')
 	args = parser.parse_args()
 
+	if args.history:
+		store = HistoryStore()
+
 	if not args.file is None:
 		file = join(get_input_directory(), args.file)
 		if not exists(file):
@@ -130,8 +226,12 @@ if __name__ == '__main__':
 		print('Please provide either --file or --folder input')
 		sys.exit(1)
 
+	if args.history:
+		# snapshots of a portfolio must go in date order
+		files.sort(key=lambda f: get_report_date(f) or datetime.min)
+
 	for input_file in files:
-		holding, row_in_error = read_file(input_file, read_line)
+		holding, row_in_error = read_with_cache(input_file, 'geneva', read_file, read_line)
 
 		filename = input_file.split('\\')[-1]	# the file name without path
 		print('read file {0}'.format(filename))
@@ -139,4 +239,17 @@ if __name__ == '__main__':
 			print('some rows in error')
 
 		write_bond_holding_csv(filter_maturity(holding), filename.split('.')[0])
+		if args.columnar:
+			export_geneva_holding(filter_maturity(holding), filename.split('.')[0]+'_output',
+									get_output_directory())
+		if args.history:
+			report_date = get_report_date(filename)
+			if report_date is None:
+				print('{0} has no date in file name, not saved to history'.format(filename))
+				continue
+
+			try:
+				append_geneva_holding(store, holding, report_date)
+			except HistoryOutOfOrder:
+				print('{0} is older than the holdings history, not saved'.format(filename))
 
@@ -0,0 +1,290 @@
+# coding=utf-8
+#
+# Holdings history: an append-only store of daily holding snapshots.
+#
+# Each run of the parsers used to leave only csv files behind, to look at
+# holdings across dates the NAV files had to be parsed again. Here the
+# holding of a portfolio on a date is appended to a store, partitioned by
+# source ('trustee' or 'geneva'), portfolio and date:
+#
+#	<history directory>/<source>/<portfolio>/<yyyy-mm-dd>.pickle
+#
+# Most positions don't change from one day to the next, so a snapshot is
+# saved as the delta from the previous one (positions added or changed,
+# keys removed), with a full snapshot every FULL_SNAPSHOT_INTERVAL days to
+# bound the number of files read for a query. index.json keeps the dates
+# of each portfolio and, for each ISIN, the snapshots in which its position
+# changed, so that:
+#
+#	as_of(source, portfolio, date)	reads one full snapshot and the deltas after it
+#	isin_history(isin)		reads only the snapshots where the ISIN changed
+#
+
+from trustee.utility import get_history_directory, write_atomic
+from bisect import bisect_right
+from datetime import datetime
+from os.path import join
+import json, os, pickle
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class HistoryOutOfOrder(Exception):
+	pass
+
+
+
+# a full snapshot after this many deltas
+FULL_SNAPSHOT_INTERVAL = 20
+
+TRUSTEE = 'trustee'
+GENEVA = 'geneva'
+
+
+
+class HistoryStore():
+	"""
+	The history store in a directory, the index is loaded when the store
+	is opened and saved after each append.
+	"""
+	def __init__(self, directory=None):
+		if directory is None:
+			directory = get_history_directory()
+
+		self.directory = directory
+		self.index = load_index(directory)
+
+
+	def get_dates(self, source, portfolio):
+		"""
+		Dates (yyyy-mm-dd) of the snapshots of a portfolio, in order.
+		"""
+		return [entry[0] for entry in self.get_entries(source, portfolio)]
+
+
+	def get_entries(self, source, portfolio):
+		"""
+		A list of [date, is full snapshot] of a portfolio, in date order.
+		"""
+		return self.index['snapshots'].get(source, {}).get(portfolio, [])
+
+
+	def append(self, source, portfolio, date, positions, get_key):
+		"""
+		Append the positions of a portfolio on a date, date must be later
+		than the last date of the portfolio in the store.
+
+		get_key: a function that returns the key of a position (unique in
+			the portfolio), such as the ISIN or the investment id.
+
+		Return True if the snapshot is saved, False if the same snapshot of
+		the date is already there, e.g., a file read again.
+		"""
+		date = get_date_string(date)
+		current = index_positions(positions, get_key)
+		if not self.check_order(source, portfolio, date, current):
+			return False
+
+		entries = self.get_entries(source, portfolio)
+		if len(entries) == 0:
+			previous = {}
+		else:
+			previous = self.as_of(source, portfolio, entries[-1][0], as_dict=True)
+
+		changed = {key: p for key, p in current.items() \
+					if not key in previous or previous[key] != p}
+		removed = [key for key in previous if not key in current]
+
+		deltas = 0
+		for entry in reversed(entries):
+			if entry[1]:
+				break
+
+			deltas = deltas + 1
+
+		is_full = len(entries) == 0 or deltas >= FULL_SNAPSHOT_INTERVAL
+		if is_full:
+			snapshot = {'full': True, 'positions': current}
+		else:
+			snapshot = {'full': False, 'positions': changed, 'removed': removed}
+
+		save_snapshot(self.get_snapshot_file(source, portfolio, date), snapshot)
+		self.index['snapshots'].setdefault(source, {}).setdefault(portfolio, []).\
+			append([date, is_full])
+		for key in list(changed) + removed:
+			self.index['isin'].setdefault(get_isin(key), []).append([source, portfolio, date, key])
+
+		save_index(self.directory, self.index)
+		return True
+
+
+	def check_order(self, source, portfolio, date, current):
+		"""
+		Check whether a snapshot (current: a dictionary of key to position)
+		can be appended. Return True if it can, False if the same snapshot
+		of the date is already there, raise HistoryOutOfOrder if the date
+		is not after the last date of the portfolio.
+		"""
+		date = get_date_string(date)
+		entries = self.get_entries(source, portfolio)
+		if len(entries) == 0 or date > entries[-1][0]:
+			return True
+
+		if date in self.get_dates(source, portfolio) and \
+			self.as_of(source, portfolio, date, as_dict=True) == current:
+			return False
+
+		logger.error('HistoryStore.check_order(): {0} {1} on {2} is not after {3}'.
+						format(source, portfolio, date, entries[-1][0]))
+		raise HistoryOutOfOrder()
+
+
+	def as_of(self, source, portfolio, date, as_dict=False):
+		"""
+		Positions of a portfolio as of a date, i.e., the last snapshot on or
+		before the date, an empty list if there is none.
+
+		as_dict: if True, return a dictionary of key to position instead.
+		"""
+		entries = self.get_entries(source, portfolio)
+		i = bisect_right([entry[0] for entry in entries], get_date_string(date))
+		if i == 0:
+			return {} if as_dict else []
+
+		start = i - 1
+		while not entries[start][1]:
+			start = start - 1
+
+		positions = {}
+		for entry_date, is_full in entries[start:i]:
+			snapshot = load_snapshot(self.get_snapshot_file(source, portfolio, entry_date))
+			positions.update(snapshot['positions'])
+			for key in snapshot.get('removed', []):
+				del positions[key]
+
+		return positions if as_dict else list(positions.values())
+
+
+	def isin_history(self, isin, source=None):
+		"""
+		Changes of the positions of an ISIN, return a list of (source,
+		portfolio, date, position) in date order, position is None when
+		the position is gone on that date.
+		"""
+		history = []
+		for entry_source, portfolio, date, key in self.index['isin'].get(isin, []):
+			if not source is None and entry_source != source:
+				continue
+
+			snapshot = load_snapshot(self.get_snapshot_file(entry_source, portfolio, date))
+			history.append((entry_source, portfolio, date, snapshot['positions'].get(key)))
+
+		return sorted(history, key=lambda h: (h[2], h[0], h[1]))
+
+
+	def get_snapshot_file(self, source, portfolio, date):
+		return join(self.directory, source, portfolio, date + '.pickle')
+
+
+
+def append_trustee_holding(store, port_values):
+	"""
+	Append the bond holding of a trustee NAV file, port_values has the
+	'portfolio_id', 'date' and 'bond' holding.
+	"""
+	return store.append(TRUSTEE, port_values['portfolio_id'], port_values['date'],
+						port_values['bond'], lambda bond: bond['isin'])
+
+
+
+def append_geneva_holding(store, holding, date):
+	"""
+	Append Geneva positions of a date, the positions are grouped by
+	portfolio, one snapshot per portfolio. The date of every portfolio is
+	checked first, so if one raises HistoryOutOfOrder, none is appended.
+	"""
+	get_key = lambda position: position['InvestID']
+	portfolios = {}
+	for position in holding:
+		portfolios.setdefault(position['Portfolio'], []).append(position)
+
+	for portfolio, positions in portfolios.items():
+		store.check_order(GENEVA, portfolio, date, index_positions(positions, get_key))
+
+	return [store.append(GENEVA, portfolio, date, positions, get_key) \
+			for portfolio, positions in portfolios.items()]
+
+
+
+def index_positions(positions, get_key):
+	"""
+	Return a dictionary of key to position (a plain dictionary, whatever
+	record type it comes in). A key that appears again, e.g., a Geneva
+	investment id on two lines, gets a suffix: 'XS1213794578 HTM#2'.
+	"""
+	indexed = {}
+	for position in positions:
+		key = get_key(position)
+		count = 1
+		while key in indexed:
+			count = count + 1
+			key = '{0}#{1}'.format(get_key(position), count)
+
+		indexed[key] = dict(position.items())
+
+	return indexed
+
+
+
+def get_isin(key):
+	"""
+	The ISIN of a position key, a Geneva investment id looks like
+	'XS1213794578 HTM'.
+	"""
+	if isinstance(key, str) and key.strip() != '':
+		return key.split('#')[0].split()[0]
+
+	return key
+
+
+
+def get_date_string(date):
+	if isinstance(date, datetime):
+		return date.strftime('%Y-%m-%d')
+
+	return date
+
+
+
+def get_index_file(directory):
+	return join(directory, 'index.json')
+
+
+
+def load_index(directory):
+	try:
+		with open(get_index_file(directory), encoding='utf-8') as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return {'snapshots': {}, 'isin': {}}
+
+
+
+def save_index(directory, index):
+	index_file = get_index_file(directory)
+	write_atomic(index_file, lambda f: json.dump(index, f, ensure_ascii=False), binary=False)
+
+
+
+def load_snapshot(snapshot_file):
+	with open(snapshot_file, 'rb') as f:
+		return pickle.load(f)
+
+
+
+def save_snapshot(snapshot_file, snapshot):
+	directory = os.path.dirname(snapshot_file)
+	os.makedirs(directory, exist_ok=True)
+	write_atomic(snapshot_file, lambda f: pickle.dump(snapshot, f,
+													protocol=pickle.HIGHEST_PROTOCOL))
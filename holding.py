@@ -6,15 +6,22 @@
 #
 
 from xlrd import open_workbook
-from xlrd.xldate import xldate_as_datetime
 from trustee.utility import get_input_directory, get_datemode, \
 						get_output_directory
+from trustee.sheet_view import get_sheet_view
+from trustee.record import BondLot
+from trustee.excel_date import convert_excel_dates
+from trustee.security_master import get_security_master
+from trustee.fund_registry import get_fund_registry
+from trustee.writer import write_csv, field, fixed, computed, format_date
+from trustee.parallel import read_files
 from DIF.open_holding import read_bond_fields
 from DIF.utility import retrieve_or_create
 from DIF.open_dif import convert_datetime_to_string
 from bochk.open_bochk import retrieve_date_from_filename
 from datetime import datetime
-import re, csv
+from os.path import join
+import re
 import logging
 logger = logging.getLogger(__name__)
 
@@ -31,6 +38,21 @@ class InvalidFundName(Exception):
 
 
 
+# types of rows in the 'Portfolio Val.' sheet, see classify_rows()
+ROW_BLANK = 'blank'
+ROW_SUB_SECTION = 'sub_section'
+ROW_TOTAL = 'total'
+ROW_HOLDING = 'holding'
+
+SUB_SECTION_PATTERN = re.compile('\\([iv]+\\)([A-Za-z\\s]+)\\(.*\\)')
+SECURITY_ID_PATTERN = re.compile('\\([A-Za-z0-9]+\\)')
+FUND_NAME_PATTERN = re.compile('\\(基金名稱\\) :(.*)中國人壽')
+
+# fields of a bond holding that are Excel dates
+DATE_FIELDS = ['coupon_start_date', 'maturity_date']
+
+
+
 def read_holding(ws, port_values):
 	"""
 	Copied from DIF.open_holding.py, read_holding() function, with modifications
@@ -56,25 +78,26 @@ def read_holding(ws, port_values):
 	This version of read_holding() function does not care about equity holdings,
 	it reads bond holdings only.
 	"""
+	ws = get_sheet_view(ws)
+	row_types = classify_rows(ws)
 	port_values['portfolio_id'], row = read_portfolio_id(ws, 0)
 	while (row < ws.nrows):
 			
-		# search the first column
-		cell_value = ws.cell_value(row, 0)
-
-		if isinstance(cell_value, str) and 'debt securities' in cell_value.lower():
+		row_type, is_section = row_types[row]
+		if is_section:
+			cell_value = ws.cell_value(row, 0)
 			logger.debug('read_holding(): bond section: {0}'.format(cell_value))
 
 			currency = read_currency(cell_value)
 			fields, n = read_bond_fields(ws, row)	# read the bond field names
-			row = read_section(ws, row+n, fields, 'bond', currency, port_values)
+			row = read_section(ws, row+n, fields, 'bond', currency, port_values, row_types)
 
 		else:
 			row = row + 1
 
 
 
-def read_section(ws, row, fields, asset_class, currency, port_values):
+def read_section(ws, row, fields, asset_class, currency, port_values, row_types=None):
 	"""
 	Copied from DIF.open_holding, read_section() function, with some changes,
 	e.g., trustee has 'HTM' and 'AFS', but not trading.
@@ -82,32 +105,38 @@ def read_section(ws, row, fields, asset_class, currency, port_values):
 	asset_class: either 'bond' or 'equity', this is because later the
 		other functions will use these keys to retrieve holdings.
 
+	row_types: the result of classify_rows(ws), if not given, the rows
+		are classified here.
+
 	Return the row number after the whole section.
 	"""
+	ws = get_sheet_view(ws)
+	if row_types is None:
+		row_types = classify_rows(ws)
+
 	holding = retrieve_or_create(port_values, asset_class)
 
 	while (row < ws.nrows):
-		cell_value = ws.cell_value(row, 0)
-		if not isinstance(cell_value, str):
-			row = row + 1
-			continue
+		row_type = row_types[row][0]
 
 		# a subsection looks like (i) Held to Maturity (Transfer from ...)
-		if sub_section_begins(cell_value):
-			if 'held to maturity' in cell_value.lower():
+		if row_type == ROW_SUB_SECTION:
+			cell_value = ws.cell_value(row, 0).lower()
+			if 'held to maturity' in cell_value:
 				accounting_treatment = 'HTM'
 				
-			elif 'available for sale' in cell_value.lower():
+			elif 'available for sale' in cell_value:
 				accounting_treatment = 'AFS'
 
 			else:
 				logger.error('read_section(): invalid accounting treament at row {0}: {1}'.
-								format(row, cell_value))
+								format(row, ws.cell_value(row, 0)))
 				raise BadAccountingTreatment()
 
-			row = read_sub_section(ws, row+1, accounting_treatment, fields, asset_class, currency, holding)
+			row = read_sub_section(ws, row+1, accounting_treatment, fields, asset_class, 
+									currency, holding, row_types)
 
-		elif section_ends(cell_value):
+		elif row_type == ROW_TOTAL:
 			break
 
 		else:
@@ -117,7 +146,8 @@ def read_section(ws, row, fields, asset_class, currency, port_values):
 
 
 
-def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currency, holding):
+def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currency, 
+						holding, row_types=None):
 	"""
 	Copied from DIF.open_holding, read_sub_section() function, changes:
 
@@ -127,16 +157,23 @@ def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currenc
 
 	2. Return the row number where the reading stops.
 	"""
+	ws = get_sheet_view(ws)
+	if row_types is None:
+		row_types = classify_rows(ws)
+
+	securities = []	# holdings of this sub section, with their rows
 	while (row < ws.nrows):
-		cell_value = ws.cell_value(row, 0)
-		if not isinstance(cell_value, str) or cell_value.strip() == '':
+		row_type = row_types[row][0]
+		if row_type == ROW_BLANK:
 			row = row + 1
 			continue
 
-		if sub_section_begins(cell_value) or section_ends(cell_value):
+		if row_type != ROW_HOLDING:
 			break
 
-		m = re.search('\([A-Za-z0-9]+\)', cell_value)
+		values = ws.row_values(row)
+		cell_value = values[0]
+		m = SECURITY_ID_PATTERN.search(cell_value)
 		if m is None:
 			logger.error('read_sub_section(): unrecognized line at row {0}'.format(row))
 			raise UnrecognizedHoldingLine()
@@ -146,7 +183,7 @@ def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currenc
 			logger.warning('read_sub_section(): security id {0} at row {1} is not ISIN'.
 							format(security_id, row))
 
-		security = {}
+		security = BondLot()
 		security['isin'] = security_id
 		security['name'] = cell_value[len(security_id)+2:].strip()
 		security['currency'] = currency
@@ -155,19 +192,12 @@ def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currenc
 		column = 2	# now start reading fields in column C
 		bond_valid = True
 		for field in fields:
-			cell_value = ws.cell_value(row, column)
+			cell_value = values[column]
 			if field == 'par_amount' and \
 				(cell_value == 0 or isinstance(cell_value,str) and cell_value.strip() == ''):
 				bond_valid = False
 				break	# ignore this holding
 			
-			if field in ['coupon_start_date', 'maturity_date']:
-				try:
-					cell_value = xldate_as_datetime(cell_value, get_datemode())
-				except:
-					logger.warning('read_sub_section(): invalid date value {0} at row {1}'.
-						format(cell_value, row))
-		
 			if field in ['par_amount', 'average_cost', 'amortized_cost', 'book_cost', 
 							'interest_bought', 'amortized_value', 'accrued_interest',
 							'amortized_gain_loss', 'fx_gain_loss'] \
@@ -184,33 +214,91 @@ def read_sub_section(ws, row, accounting_treatment, fields, asset_class, currenc
 		# end of for loop
 
 		if bond_valid:
-			holding.append(security)
+			securities.append((row, security))
 
 		row = row + 1
 	# end of while
 
+	for field in DATE_FIELDS:
+		if field in fields:
+			convert_date_field(securities, field)
+
+	holding.extend(security for r, security in securities)
 	return row
 
 
 
+def convert_date_field(securities, field):
+	"""
+	Convert the field of all securities from Excel serial to datetime in
+	one go, an invalid date value is kept as it is.
+
+	securities: a list of (row number, security)
+	"""
+	dates, invalid = convert_excel_dates([security[field] for r, security in securities],
+											get_datemode())
+	for (r, security), date in zip(securities, dates):
+		security[field] = date
+
+	rows = [r for (r, security), is_invalid in zip(securities, invalid) if is_invalid]
+	if len(rows) > 0:
+		logger.warning('convert_date_field(): invalid {0} value at rows {1}'.
+						format(field, rows))
+
+
+
+def get_parser_name():
+	"""
+	Name of the parser for the cache, the portfolio id is resolved through
+	the fund registry when the file is read, so the cached result depends
+	on it.
+	"""
+	return 'holding: ' + get_fund_registry().get_key()
+
+
+
+def read_file(filename):
+	"""
+	Open a NAV file, read the bond holdings from the 'Portfolio Val.' sheet,
+	return the port_values dictionary with the portfolio id and holdings.
+
+	The workbook is opened on demand so that the other sheets are not
+	parsed.
+	"""
+	wb = open_workbook(filename=filename, on_demand=True)
+	try:
+		port_values = {}
+		read_holding(wb.sheet_by_name('Portfolio Val.'), port_values)
+		return port_values
+	finally:
+		wb.release_resources()
+
+
+
+def read_holding_table(filename):
+	"""
+	Like read_file(), but the bond holding is a columnar table, see
+	table.py. Fields missing in a bond (AFS and HTM bonds have different
+	fields) are ''.
+	"""
+	from trustee.table import PositionTable	# needs NumPy
+	port_values = read_file(filename)
+	bonds = port_values.get('bond', [])
+	fields = {}		# keeps the order in which fields first appear
+	for bond in bonds:
+		fields.update((fld, None) for fld in bond)
+
+	port_values['bond'] = PositionTable.from_records(bonds, list(fields))
+	return port_values
+
+
+
 def map_portfolio_id(fund_name):
-	p_map = {
-		'CLI HK BR Trust Fund (Capital) (Sub-Fund-Bond)':'12732',
-		'CLI HK BR Trust Fund (Capital)':'12857',
-		'CLI HK BR (CLASS A-HK) TRUST FUND (SUB-FUND-BOND)':'12229',
-		'CLI HK BR (Class A-HK) Trust Fund - Sub Fund I':'12734',
-		'CLI HK BR (Class A-HK) Trust Fund (Sub-Fund-Trading Bond)':'12528',
-		'CLI HK BR (CLASS A-HK) TRUST FUND':'11490',
-		'CLI MACAU BR (Class A-MC) TRUST FUND (SUB-FUND-BOND)':'12366',
-		'CLT-CLI Macau BR (Class A-MC) Trust Fund':'12298',
-		'CLI HK BR (Class G-HK) Trust Fund (Sub-Fund-Bond)':'12630',
-		'CLI HK BR (Class G-HK) Trust Fund':'12341',
-		'CLI MACAU BR (Class G-MC) TRUST FUND (SUB-FUND-BOND)':'12548',
-		'CLT-CLI Macau BR (Class G-MC) Trust Fund':'12726',
-		'CLI Overseas Trust Fund (Capital) (Sub-Fund-Bond)':'12733',
-		'CLI Overseas Trust Fund (Capital)':'12856'
-	}
-	return p_map[fund_name]
+	"""
+	Map a trustee fund name to portfolio id, raise KeyError if the fund is
+	not in the fund registry, see fund_registry.py
+	"""
+	return get_fund_registry().get_portfolio_id(fund_name)
 
 
 
@@ -219,17 +307,17 @@ def read_portfolio_id(ws, row):
 		cell_value = ws.cell_value(row, 0)
 		if isinstance(cell_value, str) and \
 			cell_value.strip().lower().startswith('fund name'):
-			m = re.search('\(基金名稱\) :(.*)中國人壽', cell_value)
+			m = FUND_NAME_PATTERN.search(cell_value)
 			if m is None:
 				logger.error('read_portfolio_id(): failed to get fund name at row {0}, {1}'.
 								format(row, cell_value))
 				raise InvalidFundName()
 
 			try:
-				return map_portfolio_id(m.group(0)[8:-4].strip()), row
+				return map_portfolio_id(m.group(1).strip()), row
 			except KeyError:
 				logger.error('read_portfolio_id(): fund name {0} does not find a match'.
-								format(m.group(0)[8:-4].strip()))
+								format(m.group(1).strip()))
 				raise InvalidFundName()
 
 		row = row + 1
@@ -264,8 +352,35 @@ def read_currency(cell_value):
 
 
 
+def classify_rows(ws):
+	"""
+	Tag every row of the worksheet once, based on its first column, so that
+	the parsers don't have to test the same cell again and again.
+
+	Return a list of (row type, is section start) for each row, where row
+	type is one of ROW_BLANK, ROW_SUB_SECTION, ROW_TOTAL, ROW_HOLDING, and
+	is section start tells whether the row begins a debt securities section.
+	"""
+	return [classify_row(cell_value) for cell_value in ws.col_values(0)]
+
+
+
+def classify_row(cell_value):
+	if not isinstance(cell_value, str) or cell_value.strip() == '':
+		return ROW_BLANK, False
+
+	is_section = 'debt securities' in cell_value.lower()
+	if sub_section_begins(cell_value):
+		return ROW_SUB_SECTION, is_section
+	elif section_ends(cell_value):
+		return ROW_TOTAL, is_section
+	else:
+		return ROW_HOLDING, is_section
+
+
+
 def sub_section_begins(cell_value):
-	m = re.search('\([iv]+\)([A-Za-z\s]+)\(.*\)', cell_value)
+	m = SUB_SECTION_PATTERN.search(cell_value)
 	if m is None:
 		return False
 	else:
@@ -282,18 +397,10 @@ def section_ends(cell_value):
 
 
 def get_custodian(portfolio_id):
-	c_map = {
-		'12229':'BOCHK',
-		'12630':'BOCHK',
-		'12366':'BOCHK',
-		'12548':'JPM',
-		'12528':'BOCHK',
-		'12732':'BOCHK',
-		'12733':'BOCHK',
-		'12734':'BOCHK'
-	}
-
-	return c_map[portfolio_id]
+	"""
+	Raise KeyError if the custodian of the portfolio is unknown.
+	"""
+	return get_fund_registry().get_custodian(portfolio_id)
 
 
 
@@ -315,37 +422,42 @@ def merge_lots(bond_holding):
 	"""
 	The bond holding may contain multiple lots for the same bond, the function
 	merge all of them into one position.
+
+	Lots are grouped by ISIN in one pass, then the par amount and the par
+	weighted average cost of each group are worked out at once. The merged
+	position is the first lot of the group, so its accounting treatment,
+	trade day FX, etc. are kept.
 	"""
-	merged_positions = []
-	merged_isin_list = []
+	lots_by_isin = {}	# keeps the order in which ISINs first appear
 	for bond in bond_holding:
-		if bond['isin'] in merged_isin_list:	# a merged position exists
-			merge_position(find_position(merged_positions, bond['isin']), bond)
-		else:
-			merged_isin_list.append(bond['isin'])
-			merged_positions.append(bond)
+		try:
+			lots_by_isin[bond['isin']].append(bond)
+		except KeyError:
+			lots_by_isin[bond['isin']] = [bond]
 
-	return merged_positions
+	return [merge_group(lots) for lots in lots_by_isin.values()]
 
 
 
-def find_position(positions, isin):
-	for position in positions:
-		if position['isin'] == isin:
-			return position
+def merge_group(lots):
+	"""
+	Merge all lots of the same bond into the first lot.
+	"""
+	p1 = lots[0]
+	if len(lots) > 1:
+		par_amount = sum(lot['par_amount'] for lot in lots)
+		p1['average_cost'] = sum(lot['par_amount']*lot['average_cost'] for lot in lots) / par_amount
+		p1['par_amount'] = par_amount
 
-	return None
+	return p1
 
 
 
 def get_security_id_map():
-	i_map = {
-		'WLHKFN09007':'BBG00000WLY9',	# WING LUNG BANK LTD CHINAM 5.7 12/28/21
-		'DBANFB12014':'HK0000175916',	# DRAGON DAYS LTD CHMERC 6 03/21/22
-		'HSBCFN13014':'HK0000163607'	# New World Development 6% Sept 2023
-	}
-
-	return i_map
+	"""
+	The trustee security code to ISIN map, see security_master.py
+	"""
+	return get_security_master().isin_by_code
 
 
 
@@ -353,37 +465,14 @@ def rename_position_isin(positions):
 	"""
 	Map trustee security code to investment code used in Geneva.
 	"""
-	i_map = get_security_id_map()	
+	security_master = get_security_master()
 	for position in positions:
-		if position['isin'] in i_map:
-			position['isin'] = i_map[position['isin']]
+		position['isin'] = security_master.map_code(position['isin'])
 
 	return positions
 
 
 
-def merge_position(p1, p2):
-	"""
-	Merge position p2 into p1. Note that the merged position's accounting
-	treatment, trade day FX will be p1's.
-	"""
-	# try:
-	p1['average_cost'] = (p1['par_amount']*p1['average_cost'] + p2['par_amount']*p2['average_cost']) / (p1['par_amount']+p2['par_amount'])
-	p1['par_amount'] = p1['par_amount'] + p2['par_amount']
-	# p1['amortized_cost'] = p1['amortized_cost'] + p2['amortized_cost']
-	# p1['book_cost'] = p1['book_cost'] + p2['book_cost']
-	# p1['interest_bought'] = p1['interest_bought'] + p2['interest_bought']
-	# p1['amortized_value'] = p1['amortized_value'] + p2['amortized_value']
-	# p1['accrued_interest'] = p1['accrued_interest'] + p2['accrued_interest']
-	# p1['amortized_gain_loss'] = p1['amortized_gain_loss'] + p2['amortized_gain_loss']
-	# p1['fx_gain_loss'] = p1['fx_gain_loss'] + p2['fx_gain_loss']
-	# except:
-	# 	print(p1['isin'], p1['par_amount'], p2['isin'], p2['par_amount'])
-	# 	import sys
-	# 	sys.exit(1)
-
-
-
 def write_bond_holding_csv(port_values, output_dir=get_output_directory()):
 	"""
 	Copied from DIF.open_holding.py, write_htm_holding_csv() function, with
@@ -392,38 +481,21 @@ def write_bond_holding_csv(port_values, output_dir=get_output_directory()):
 	date = convert_datetime_to_string(port_values['date'])
 	portfolio_id = port_values['portfolio_id']
 	holding_file = join(output_dir, portfolio_id+'_'+date+'_trustee_nav.csv')
-		
-	with open(holding_file, 'w', newline='') as csvfile:
-		file_writer = csv.writer(csvfile, delimiter='|')
-		bond_holding = port_values['bond']
-
-		# pick all fields that HTM bond have
-		fields = ['name', 'currency', 'accounting_treatment', 'par_amount', 
-					'is_listed', 'listed_location', 'fx_on_trade_day', 
-					'coupon_rate', 'coupon_start_date', 'maturity_date', 
-					'average_cost', 'amortized_cost', 'book_cost', 
-					'interest_bought', 'amortized_value', 'accrued_interest', 
-					'amortized_gain_loss', 'fx_gain_loss']
-
-		file_writer.writerow(['portfolio', 'date', 'custodian', 'geneva_investment_id', 
-								'isin', 'bloomberg_figi'] + fields)
-		
-		for bond in bond_holding:
-
-			row = [portfolio_id, date, get_custodian(portfolio_id),
-					bond['isin']+' HTM', '', '']
-			
-			for fld in fields:
-				try:
-					item = bond[fld]
-					if fld in ['coupon_start_date', 'maturity_date'] and isinstance(item, datetime):
-						item = convert_datetime_to_string(item)
-				except KeyError:
-					item = ''
 
-				row.append(item)
+	# pick all fields that HTM bond have
+	fields = ['name', 'currency', 'accounting_treatment', 'par_amount', 
+				'is_listed', 'listed_location', 'fx_on_trade_day', 
+				'coupon_rate', 'coupon_start_date', 'maturity_date', 
+				'average_cost', 'amortized_cost', 'book_cost', 
+				'interest_bought', 'amortized_value', 'accrued_interest', 
+				'amortized_gain_loss', 'fx_gain_loss']
 
-			file_writer.writerow(row)
+	header = ['portfolio', 'date', 'custodian', 'geneva_investment_id', 
+				'isin', 'bloomberg_figi'] + fields
+	columns = [fixed(portfolio_id), fixed(date), fixed(get_custodian(portfolio_id)),
+				computed(get_geneva_investment_id), fixed(''), fixed('')] + \
+				get_bond_columns(fields)
+	write_csv(holding_file, [header], columns, port_values['bond'], delimiter='|')
 
 
 
@@ -438,30 +510,42 @@ def write_simple_holding_csv(port_values, output_dir=get_output_directory()):
 	date = convert_datetime_to_string(port_values['date'])
 	portfolio_id = port_values['portfolio_id']
 	holding_file = join(output_dir, portfolio_id+'_'+date+'_trustee_nav.csv')
-		
-	with open(holding_file, 'w', newline='') as csvfile:
-		file_writer = csv.writer(csvfile, delimiter='|')
-		bond_holding = port_values['bond']
-
-		# pick all fields that HTM bond have
-		fields = ['name', 'par_amount', 'maturity_date', 'average_cost']
-		file_writer.writerow(['portfolio', 'date', 'geneva_investment_id'] + \
-								fields)
-		
-		for bond in bond_holding:
-			row = [portfolio_id, date, bond['isin']+' HTM']
-			
-			for fld in fields:
-				try:
-					item = bond[fld]
-					if fld in ['coupon_start_date', 'maturity_date'] and isinstance(item, datetime):
-						item = convert_datetime_to_string(item)
-				except KeyError:
-					item = ''
 
-				row.append(item)
+	# pick all fields that HTM bond have
+	fields = ['name', 'par_amount', 'maturity_date', 'average_cost']
+	header = ['portfolio', 'date', 'geneva_investment_id'] + fields
+	columns = [fixed(portfolio_id), fixed(date), computed(get_geneva_investment_id)] + \
+				get_bond_columns(fields)
+	write_csv(holding_file, [header], columns, port_values['bond'], delimiter='|')
+
 
-			file_writer.writerow(row)
+
+def get_bond_columns(fields):
+	"""
+	Output columns of the bond fields, dates are written as strings.
+	"""
+	return [field(fld, format_date) if fld in DATE_FIELDS else field(fld) for fld in fields]
+
+
+
+def get_bond_files(files):
+	"""
+	The NAV files of the bond portfolios (excluding trading bond), by the
+	file names.
+	"""
+	bond_files = []
+	for input_file in files:
+		filename = input_file.split('\\')[-1].lower()
+		if 'sub fund i' in filename or \
+			'bond' in filename and not 'trading bond' in filename:
+			bond_files.append(input_file)
+
+	return bond_files
+
+
+
+def get_geneva_investment_id(bond):
+	return bond['isin'] + ' HTM'
 
 
 
@@ -470,9 +554,19 @@ def write_simple_holding_csv(port_values, output_dir=get_output_directory()):
 if __name__ == '__main__':
 	import argparse, sys, glob
 	from os.path import join, isdir, exists
+	from trustee.export import export_bond_holding
+	from trustee.history import HistoryStore, HistoryOutOfOrder, append_trustee_holding
 	parser = argparse.ArgumentParser(description='Read trustee NAV file and create csv output for Geneva reconciliation.')
 	parser.add_argument('--folder', help='folder containing multiple NAV files', required=False)
 	parser.add_argument('--file', help='input NAV file', required=False)
+	parser.add_argument('--incremental', help='parse only files new or changed since the last run', 
+						action='store_true')
+	parser.add_argument('--workers', help='number of processes to parse files in parallel', 
+						type=int, default=1)
+	parser.add_argument('--columnar', help='also export to a columnar binary file (parquet or npz)', 
+						action='store_true')
+	parser.add_argument('--history', help='also save the holdings to the holdings history store', 
+						action='store_true')
 	args = parser.parse_args()
 
 	if not args.file is None:
@@ -495,18 +589,27 @@ if __name__ == '__main__':
 		print('Please provide either --file or --folder input')
 		sys.exit(1)
 
-	for input_file in files:
-		filename = input_file.split('\\')[-1]	# the file name without path
+	results, file_in_error = read_files(get_bond_files(files), get_parser_name(), read_file, 
+										workers=args.workers, incremental=args.incremental)
+	for input_file, error in file_in_error:
+		print('failed to read {0}: {1}'.format(input_file, error))
 
-		# focus on the bond portfolios (excluding trading bond) first
-		if 'sub fund i' in filename.lower() or \
-			'bond' in filename.lower() and not 'trading bond' in filename.lower():
-			print('read file {0}'.format(filename))
-			port_values = {}
-			port_values['date'] = retrieve_date_from_filename(filename)
-			wb = open_workbook(filename=input_file)
-			ws = wb.sheet_by_name('Portfolio Val.')
-			read_holding(ws, port_values)
-			port_values['bond'] = rename_position_isin(merge_lots(filter_maturity(port_values['bond'])))
-			# write_bond_holding_csv(port_values)
-			write_simple_holding_csv(port_values)
\ No newline at end of file
+	for input_file, port_values in results:
+		filename = input_file.split('\\')[-1]	# the file name without path
+		print('read file {0}'.format(filename))
+		port_values['date'] = retrieve_date_from_filename(filename)
+		port_values['bond'] = rename_position_isin(merge_lots(filter_maturity(port_values['bond'])))
+		# write_bond_holding_csv(port_values)
+		write_simple_holding_csv(port_values)
+		if args.columnar:
+			export_bond_holding(port_values, get_output_directory())
+
+	if args.history:
+		store = HistoryStore()
+		# snapshots of a portfolio must go in date order
+		for input_file, port_values in sorted(results, key=lambda r: r[1]['date']):
+			try:
+				append_trustee_holding(store, port_values)
+			except HistoryOutOfOrder:
+				print('{0} is older than the holdings history of {1}, not saved'.
+						format(input_file.split('\\')[-1], port_values['portfolio_id']))
@@ -0,0 +1,68 @@
+# coding=utf-8
+#
+# Incremental ingestion of a folder of input files.
+#
+# Our input folders pile up months of NAV files, and most runs only add
+# one or two. A manifest of (path, size, mtime, hash) is kept per parser
+# in the cache directory. A file whose size and mtime are the same as in
+# the manifest is taken as unchanged, its content hash comes from the
+# manifest and its parsed result from the cache (see cache.py), so it is
+# neither hashed nor parsed again. Only new or changed files are parsed.
+#
+# parallel.read_files() and iter_files() use the manifest when called
+# with incremental=True.
+#
+
+from trustee.utility import get_cache_directory, write_atomic
+from trustee.cache import get_file_hash
+from os.path import join, getsize, getmtime, abspath, isfile
+import hashlib, json
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+def check_file(manifest, file):
+	"""
+	Compare a file with its manifest entry, return (entry, changed), where
+	entry is the up to date manifest entry of the file, and changed tells
+	whether the file is new or changed since the last run.
+	"""
+	size, mtime = getsize(file), getmtime(file)
+	entry = manifest.get(abspath(file))
+	if not entry is None and entry['size'] == size and entry['mtime'] == mtime:
+		return entry, False
+
+	return {'size': size, 'mtime': mtime, 'hash': get_file_hash(file)}, True
+
+
+
+def get_manifest_file(parser_name):
+	key = hashlib.blake2b(parser_name.encode('utf-8'), digest_size=8).hexdigest()
+	return join(get_cache_directory(), 'manifest_{0}.json'.format(key))
+
+
+
+def load_manifest(parser_name):
+	"""
+	The manifest is a dictionary mapping the absolute path of a file to
+	its entry {'size': ..., 'mtime': ..., 'hash': ...}
+	"""
+	manifest_file = get_manifest_file(parser_name)
+	if not isfile(manifest_file):
+		return {}
+
+	try:
+		with open(manifest_file, encoding='utf-8') as f:
+			return json.load(f)
+	except ValueError:
+		logger.warning('load_manifest(): manifest {0} is corrupted, ignored'.
+						format(manifest_file))
+		return {}
+
+
+
+def save_manifest(parser_name, manifest):
+	manifest_file = get_manifest_file(parser_name)
+	write_atomic(manifest_file, lambda f: json.dump(manifest, f, ensure_ascii=False, indent=1,
+													sort_keys=True), binary=False)
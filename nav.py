@@ -0,0 +1,157 @@
+# coding=utf-8
+#
+# Read everything we need from a trustee NAV file in one go.
+#
+# holding.py reads the 'Portfolio Val.' sheet and transaction.py reads
+# the 'SECURITIES TRANSACTION IMPLEMENTED' sheet of the same NAV file,
+# when run separately each of them opens and decodes the whole workbook.
+# Here the workbook is opened once (on demand), and the extractor of each
+# report is run on its sheet in the same pass.
+#
+
+from xlrd import open_workbook
+from trustee.utility import get_input_directory
+from trustee.holding import read_holding, filter_maturity, merge_lots, \
+							rename_position_isin, write_simple_holding_csv
+from trustee.transaction import read_transaction, get_report_name, \
+							map_security_id, write_simple_transaction_csv
+from trustee.sheet_index import find_report_sheet
+from trustee.fund_registry import get_fund_registry
+from trustee.parallel import read_files
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+def get_parser_name():
+	"""
+	Name of the parser for the cache, the cached result depends on the
+	fund registry, see holding.get_parser_name()
+	"""
+	return 'nav: ' + get_fund_registry().get_key()
+
+
+
+def read_nav_file(filename):
+	"""
+	Open a NAV file once, read the bond holdings and bond transactions
+	from it, return a port_values dictionary like:
+
+	{
+		'portfolio_id': '12229',
+		'bond': [holding1, holding2, ...],
+		'bond_transactions': [transaction1, transaction2, ...]
+	}
+
+	If a report is not in the file, its key maps to an empty list.
+	"""
+	wb = open_workbook(filename=filename, on_demand=True)
+	try:
+		results = [read_report(wb, ws, extractor) for ws, extractor in get_report_sheets(wb)]
+	finally:
+		wb.release_resources()
+
+	port_values = {'bond': [], 'bond_transactions': []}
+	for values in results:
+		if 'portfolio_id' in port_values and \
+			port_values['portfolio_id'] != values['portfolio_id']:
+			logger.warning('read_nav_file(): portfolio id {0} and {1} mismatch in {2}'.
+							format(port_values['portfolio_id'], values['portfolio_id'],
+									filename))
+			values['portfolio_id'] = port_values['portfolio_id']
+
+		port_values.update(values)
+
+	return port_values
+
+
+
+def get_report_sheets(wb):
+	"""
+	Return the list of (worksheet, extractor) for the reports we read
+	from a NAV workbook, the holding report goes first so that its
+	portfolio id takes precedence.
+	"""
+	sheets = []
+	if 'Portfolio Val.' in wb.sheet_names():
+		sheets.append((wb.sheet_by_name('Portfolio Val.'), read_holding))
+
+	ws = find_report_sheet(wb, 'SECURITIES TRANSACTION IMPLEMENTED', get_report_name)
+	if not ws is None:
+		sheets.append((ws, read_transaction))
+
+	return sheets
+
+
+
+def read_report(wb, ws, extractor):
+	"""
+	Run the extractor on the worksheet, then unload the sheet since it
+	won't be used again.
+	"""
+	values = {}
+	extractor(ws, values)
+	wb.unload_sheet(ws.name)
+	return values
+
+
+
+
+
+if __name__ == '__main__':
+	import argparse, sys, glob
+	from os.path import join, isdir, exists
+	from bochk.open_bochk import retrieve_date_from_filename
+	from trustee.utility import get_output_directory
+	from trustee.export import export_bond_holding, export_transactions
+	parser = argparse.ArgumentParser(description='Read holdings and transactions from trustee NAV files in one pass.')
+	parser.add_argument('--folder', help='folder containing multiple NAV files', required=False)
+	parser.add_argument('--file', help='input NAV file', required=False)
+	parser.add_argument('--incremental', help='parse only files new or changed since the last run', 
+						action='store_true')
+	parser.add_argument('--workers', help='number of processes to parse files in parallel', 
+						type=int, default=1)
+	parser.add_argument('--columnar', help='also export to a columnar binary file (parquet or npz)', 
+						action='store_true')
+	args = parser.parse_args()
+
+	if not args.file is None:
+		file = join(get_input_directory(), args.file)
+		if not exists(file):
+			print('{0} does not exist'.format(file))
+			sys.exit(1)
+
+		files = [file]
+
+	elif not args.folder is None:
+		folder = join(get_input_directory(), args.folder)
+		if not exists(folder) or not isdir(folder):
+			print('{0} is not a valid directory'.format(folder))
+			sys.exit(1)
+
+		files = glob.glob(folder+'\\*.xls*')
+
+	else:
+		print('Please provide either --file or --folder input')
+		sys.exit(1)
+
+	results, file_in_error = read_files(files, get_parser_name(), read_nav_file, 
+										workers=args.workers, incremental=args.incremental)
+	for input_file, error in file_in_error:
+		print('failed to read {0}: {1}'.format(input_file, error))
+
+	transactions = []
+	for input_file, port_values in results:
+		filename = input_file.split('\\')[-1]	# the file name without path
+		print('read file {0}'.format(filename))
+		transactions.extend(port_values['bond_transactions'])
+		if len(port_values['bond']) > 0:
+			port_values['date'] = retrieve_date_from_filename(filename)
+			port_values['bond'] = rename_position_isin(merge_lots(filter_maturity(port_values['bond'])))
+			write_simple_holding_csv(port_values)
+			if args.columnar:
+				export_bond_holding(port_values, get_output_directory())
+
+	write_simple_transaction_csv('trades.csv', map_security_id(transactions))
+	if args.columnar:
+		export_transactions('trades', transactions, get_output_directory())
@@ -0,0 +1,134 @@
+# coding=utf-8
+#
+# Parse a batch of input files on multiple cores.
+#
+# Parsing an Excel file is CPU bound, so for a folder of files we spread
+# the parsing across a pool of processes. Results come back in the same
+# order as the input files, and an error in one file is reported in the
+# result instead of stopping the whole batch.
+#
+# The read function and its arguments are sent to the worker processes,
+# so they must be picklable, i.e., module level functions.
+#
+
+from trustee.cache import read_with_cache, read_cached
+from trustee.incremental import load_manifest, save_manifest, check_file
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from os.path import abspath
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+def read_files(file_list, parser_name, read_func, *args, workers=1, incremental=False):
+	"""
+	Read each file in the list with read_func(file, *args), results are
+	cached by file content, see cache.py
+
+	workers: number of worker processes, 1 means read the files one by
+		one in this process.
+
+	incremental: if True, only files new or changed since the last run
+		are parsed, see incremental.py
+
+	Return (results, file_in_error), where results is a list of (file,
+	result) in the same order as file_list, for files read successfully,
+	and file_in_error is a list of (file, error message) for the others.
+	"""
+	results = []
+	file_in_error = []
+	for file, result, error in iter_files(file_list, parser_name, read_func, *args,
+											workers=workers, incremental=incremental):
+		if error is None:
+			results.append((file, result))
+		else:
+			file_in_error.append((file, error))
+
+	return results, file_in_error
+
+
+
+def iter_files(file_list, parser_name, read_func, *args, workers=1, incremental=False):
+	"""
+	The generator version of read_files(), yields (file, result, error
+	message) in the same order as file_list, the error message is None
+	if the file is read successfully.
+
+	Files are read as the results are consumed, so only the results of a
+	few files (one if workers = 1) are held in memory at a time.
+	"""
+	if incremental:
+		manifest = load_manifest(parser_name)
+		entries = [check_file(manifest, file)[0] for file in file_list]
+		jobs = [(read_cached, file, parser_name, read_func, args, entry['hash']) \
+					for file, entry in zip(file_list, entries)]
+	else:
+		jobs = [(read_with_cache, file, parser_name, read_func, args, None) \
+					for file in file_list]
+
+	try:
+		for i, (result, error) in enumerate(iter_jobs(jobs, workers)):
+			file = file_list[i]
+			if error is None:
+				if incremental:
+					manifest[abspath(file)] = entries[i]
+			else:
+				logger.error('iter_files(): failed to read {0}: {1}'.format(file, error))
+
+			yield file, result, error
+
+	finally:
+		if incremental:
+			save_manifest(parser_name, manifest)
+
+
+
+def iter_jobs(jobs, workers):
+	"""
+	Run the jobs, in a process pool if workers > 1, yield (result, error
+	message) in the same order as the jobs. For a job that succeeds, the 
+	error message is None.
+
+	At most 2 x workers jobs are in flight at a time, so that results 
+	don't pile up in memory faster than they are consumed.
+	"""
+	if workers <= 1 or len(jobs) <= 1:
+		for job in jobs:
+			yield run_job(*job)
+
+		return
+
+	with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+		futures = deque()
+		for job in jobs:
+			futures.append(executor.submit(run_job, *job))
+			if len(futures) >= 2*workers:
+				yield get_job_result(futures.popleft())
+
+		while len(futures) > 0:
+			yield get_job_result(futures.popleft())
+
+
+
+def get_job_result(future):
+	"""
+	The job itself catches errors, but the worker process may still fail,
+	e.g., killed or the result cannot be pickled.
+	"""
+	try:
+		return future.result()
+	except Exception as e:
+		return None, '{0}: {1}'.format(type(e).__name__, e)
+
+
+
+def run_job(reader, file, parser_name, read_func, args, file_hash):
+	"""
+	Read one file, catch the error if there is one, so that one bad file
+	does not stop the others.
+	"""
+	try:
+		return reader(file, parser_name, read_func, *args, file_hash=file_hash), None
+	except Exception as e:
+		return None, '{0}: {1}'.format(type(e).__name__, e)
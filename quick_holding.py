@@ -32,23 +32,23 @@
 
 
 from small_program.read_file import read_file
-from trustee.holding import get_security_id_map
+from trustee.security_master import get_security_master
 from trustee.utility import get_output_directory, get_input_directory
 from trustee.geneva import read_line
-import logging
+from trustee.cache import read_with_cache
+from trustee.record import TrusteePosition
+from trustee.writer import write_csv, required, fixed, computed
+from os.path import join
+import csv, logging
 logger = logging.getLogger(__name__)
 
 
 
-class PositionNotFound(Exception):
-	pass
-
-
-
 def read_line_trustee(ws, row, fields):
-	position = {}
-	for i in range(16):
-		cell_value = ws.cell_value(row, i)
+	position = TrusteePosition()
+	values = ws.row_values(row, 0, 16)
+	for i in (0, 15):
+		cell_value = values[i]
 		if isinstance(cell_value, str):
 			cell_value = cell_value.strip()
 
@@ -63,6 +63,14 @@ def read_line_trustee(ws, row, fields):
 
 
 
+def read_trustee_file(filename):
+	"""
+	Read the trustee holding file, return (holding, row_in_error).
+	"""
+	return read_file(filename, read_line_trustee, starting_row=2)
+
+
+
 def get_identifier(description):
 	"""
 	Create position identifier based on trustee position description. Normally
@@ -79,32 +87,51 @@ def get_identifier(description):
 	In this case, we need to transform the code 'HSBCFN13014' to ISIN code
 	first, then create the identifier.
 	"""
-	code = description.split()[0]
-	try:
-		return get_security_id_map()[code] + ' HTM'
-	except KeyError:
-		return code + ' HTM'
+	security_master = get_security_master()
+	return security_master.get_invest_id(security_master.map_code(description.split()[0]))
 
 
 
 def update_amortized_cost(geneva_holding, trustee_holding):
-	for position in trustee_holding:
+	"""
+	Join the trustee positions to the Geneva positions on InvestID, and copy
+	the amortized cost of a trustee position to its Geneva positions. The
+	Geneva holding may have several portfolios, so the same InvestID can
+	appear more than once, every one of them gets the amortized cost.
+
+	Return the unmatched positions on both sides:
+
+	{
+		'not_in_geneva': [trustee positions not found in Geneva holding],
+		'not_in_trustee': [Geneva HTM positions (non cash) not found in
+							trustee holding]
+	}
+	"""
+	geneva_holding = list(geneva_holding)
+	geneva_index = {}
+	for position in geneva_holding:
 		try:
-			p = find_geneva_position(geneva_holding, position['Identifier'])
-			p['Amortized Cost'] = position['Amortized Cost']
-
-		except PositionNotFound:
-			pass
+			geneva_index[position['InvestID']].append(position)
+		except KeyError:
+			geneva_index[position['InvestID']] = [position]
 
+	not_in_geneva = []
+	matched = set()
+	for position in trustee_holding:
+		try:
+			positions = geneva_index[position['Identifier']]
+		except KeyError:
+			not_in_geneva.append(position)
+			continue
 
+		for p in positions:
+			p['Amortized Cost'] = position['Amortized Cost']
+			matched.add(id(p))
 
-def find_geneva_position(geneva_holding, invest_id):
-	for position in geneva_holding:
-		if position['InvestID'] == invest_id:
-			return position
+	not_in_trustee = [p for p in geneva_holding if not id(p) in matched \
+						and not is_cash_position(p) and not is_AFS_position(p)]
 
-	print('{0} not found in geneva holding'.format(invest_id))
-	raise PositionNotFound()
+	return {'not_in_geneva': not_in_geneva, 'not_in_trustee': not_in_trustee}
 
 
 
@@ -137,55 +164,61 @@ def is_AFS_position(geneva_position):
 
 
 
+def iter_non_cash_position(geneva_holding):
+	"""
+	A generator that filters out the cash positions.
+	"""
+	return (position for position in geneva_holding if not is_cash_position(position))
+
+
+
+def iter_HTM_position(geneva_holding):
+	"""
+	A generator that filters out the cash positions and the AFS positions.
+	"""
+	return (position for position in iter_non_cash_position(geneva_holding) \
+				if not is_AFS_position(position))
+
+
+
 def add_double_quote(string_item):
 	return '\"'+string_item+'\"'
 
 
 
 def write_upload_csv(geneva_holding, output_dir=get_output_directory()):
-	with open(join(output_dir, get_filename(get_portfolio_code(geneva_holding))), 
-					'w', newline='') as csvfile:
-
-		# note there is requirement for the upload file that all non numerical
-		# fields are double quoted. So we use the quoting parameter.
-		# For more quoting information, see this link:
-		#
-		# https://pymotw.com/2/csv/
-		#
-		file_writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_NONNUMERIC)
-	
-		for position in geneva_holding:
-			if is_cash_position(position) or is_AFS_position(position):
-				continue
-
-			# print(position['InvestID'])
-			row = []
-			for i in range(17):
-				if i == 0:	# currency
-					item = position['Group1']
-				elif i == 1:
-					item = 'Held to Maturity'
-				elif i == 2:
-					item = position['Quantity']
-				elif i == 3:	
-					item = position['InvestID']
-				elif i == 5: # description (optional)
-					item = position['ExtendedDescription']
-				elif i == 7:
-					item = position['Amortized Cost']
-				elif i == 10: # market value local
-					item = position['Amortized Cost']*position['Quantity']/100.0
-				elif i == 16:
-					item = position['Portfolio']
-				else:
-					item = None
-
-				# if isinstance(item, str) and item != '':
-				# 	item = add_double_quote(item)
-
-				row.append(item)
-
-			file_writer.writerow(row)
+	# note there is requirement for the upload file that all non numerical
+	# fields are double quoted. So we use the quoting parameter.
+	# For more quoting information, see this link:
+	#
+	# https://pymotw.com/2/csv/
+	#
+	write_csv(join(output_dir, get_filename(get_portfolio_code(geneva_holding))), [],
+				get_upload_columns(), iter_HTM_position(geneva_holding),
+				delimiter=',', quoting=csv.QUOTE_NONNUMERIC)
+
+
+
+def get_upload_columns():
+	"""
+	The 17 columns of the amortized cost upload file, columns not listed
+	here are empty (None).
+	"""
+	columns = [fixed(None)]*17
+	columns[0] = required('Group1')	# currency
+	columns[1] = fixed('Held to Maturity')
+	columns[2] = required('Quantity')
+	columns[3] = required('InvestID')
+	columns[5] = required('ExtendedDescription')	# description (optional)
+	columns[7] = required('Amortized Cost')
+	columns[10] = computed(get_market_value_local)
+	columns[16] = required('Portfolio')
+	return columns
+
+
+
+def get_market_value_local(position):
+	return position['Amortized Cost']*position['Quantity']/100.0
 
 
 
@@ -204,10 +237,20 @@ if __name__ == '__main__':
 	args = parser.parse_args()
 
 	input_file = join(get_input_directory(), args.trustee)
-	trustee_holding, row_in_error = read_file(input_file, read_line_trustee, starting_row=2)
+	# trustee codes are mapped when the file is read, so the cached result
+	# depends on the security master
+	trustee_holding, row_in_error = read_with_cache(input_file, 'quick_holding trustee: ' + \
+														get_security_master().get_key(),
+														read_trustee_file)
 
 	input_file = join(get_input_directory(), args.geneva)
-	geneva_holding, row_in_error = read_file(input_file, read_line)
+	geneva_holding, row_in_error = read_with_cache(input_file, 'geneva', read_file, read_line)
+
+	result = update_amortized_cost(geneva_holding, trustee_holding)
+	for position in result['not_in_geneva']:
+		logger.warning('{0} not found in geneva holding'.format(position['Identifier']))
+
+	for position in result['not_in_trustee']:
+		logger.warning('{0} not found in trustee holding'.format(position['InvestID']))
 
-	update_amortized_cost(geneva_holding, trustee_holding)
 	write_upload_csv(geneva_holding)
@@ -0,0 +1,148 @@
+# coding=utf-8
+#
+# The exchange rate table, read from the exchange file (Exchange.txt):
+#
+#	[Exchange]
+#	USDHKD=7.8472
+#	CNYHKD=1.1812
+#
+# The rates are parsed once into floats and kept for the process, they
+# are read again when the file is modified, so a long-running process
+# (see do_upload_exc.py --daemon) always sees the latest rates. A rate
+# between any two currencies is worked out from the pairs in the file:
+# directly, inverted (HKDUSD from USDHKD), or across a third currency
+# (USDCNY from USDHKD and CNYHKD).
+#
+
+from trustee.utility import get_exchange_file, ReloadingFile
+import configparser
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class ExchangeRateNotFound(Exception):
+	pass
+
+
+
+# Geneva currency descriptions (the Group1 column of an appraisal file)
+CURRENCY_BY_DESCRIPTION = {
+	'Hong Kong Dollar': 'HKD',
+	'United States Dollar': 'USD',
+	'Chinese Renminbi Yuan': 'CNY'
+}
+
+
+
+class RateTable():
+	"""
+	Exchange rates by currency pair, like {'USDHKD': 7.8472}, meaning 1 USD
+	= 7.8472 HKD.
+	"""
+	def __init__(self, rates={}):
+		self.rates = {}
+		for pair, rate in rates.items():
+			self.add(pair, rate)
+
+
+	def add(self, pair, rate):
+		pair = pair.upper()
+		self.rates[pair] = rate
+		if rate != 0:
+			self.rates.setdefault(pair[3:]+pair[:3], 1/rate)
+
+
+	def get_rate(self, from_currency, to_currency):
+		"""
+		Rate to convert 1 unit of from_currency into to_currency, raise
+		ExchangeRateNotFound if it cannot be worked out.
+		"""
+		if from_currency == to_currency:
+			return 1.0
+
+		try:
+			return self.rates[from_currency+to_currency]
+		except KeyError:
+			pass
+
+		for pair, rate in self.rates.items():
+			if pair[:3] == from_currency and pair[3:]+to_currency in self.rates:
+				return rate * self.rates[pair[3:]+to_currency]
+
+		logger.error('RateTable.get_rate(): no rate from {0} to {1}'.
+						format(from_currency, to_currency))
+		raise ExchangeRateNotFound()
+
+
+	def get_rates(self, currency_descriptions, to_currency='HKD'):
+		"""
+		Rates of a column of currency descriptions (or currency codes) to
+		to_currency, in the same order. Each distinct currency is looked
+		up once, however many rows it has.
+		"""
+		rate_by_description = {}
+		rates = []
+		for description in currency_descriptions:
+			try:
+				rates.append(rate_by_description[description])
+			except KeyError:
+				rate = self.get_rate(get_currency(description), to_currency)
+				rate_by_description[description] = rate
+				rates.append(rate)
+
+		return rates
+
+
+
+def get_currency(currency_description):
+	"""
+	The currency code of a Geneva currency description, a 3 letter code is
+	taken as the currency code already.
+	"""
+	try:
+		return CURRENCY_BY_DESCRIPTION[currency_description]
+	except KeyError:
+		if len(currency_description) == 3 and currency_description.isalpha():
+			return currency_description.upper()
+
+		logger.error('get_currency(): unknown currency {0}'.format(currency_description))
+		raise ExchangeRateNotFound()
+
+
+
+def read_rate_table(filename):
+	"""
+	Read the exchange file, an entry whose rate is not a number is left
+	out with a warning. A missing file gives an empty table.
+	"""
+	cfg = configparser.ConfigParser()
+	cfg.read(filename)
+	if not cfg.has_section('Exchange'):
+		logger.warning('read_rate_table(): no exchange rates in {0}'.format(filename))
+		return RateTable()
+
+	rates = {}
+	for pair, value in cfg['Exchange'].items():
+		try:
+			rates[pair] = float(value)
+		except ValueError:
+			logger.warning('read_rate_table(): invalid rate {0}={1}'.format(pair, value))
+
+	return RateTable(rates)
+
+
+
+_rate_table = ReloadingFile(read_rate_table)
+
+
+
+def get_rate_table(check=False):
+	"""
+	The rate table of this process, loaded from the exchange file the
+	first time, and again after the file is modified.
+
+	check: if True, check the file's modified time now, instead of at most
+		once every RELOAD_CHECK_INTERVAL seconds.
+	"""
+	return _rate_table.get(get_exchange_file(), check)
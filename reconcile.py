@@ -0,0 +1,262 @@
+# coding=utf-8
+#
+# Reconcile the trustee bond holdings with the Geneva positions.
+#
+# write_simple_holding_csv() and geneva.write_bond_holding_csv() produce
+# files for someone to compare by hand. Here the two sides are joined on
+# (portfolio, Geneva investment id) for all portfolios in one pass: the
+# Geneva positions are indexed in a dictionary, then each trustee bond
+# looks up its match. The par amount, the average cost and the maturity
+# date of each pair are compared within the tolerances in trustee.config
+# ([reconcile] section), and every difference becomes a break:
+#
+#	'not in geneva'		a trustee bond without Geneva position
+#	'not in trustee'	a Geneva bond position without trustee bond,
+#				for the portfolios on the trustee side only
+#	'quantity'		par amount differs from Geneva quantity
+#	'cost'			average cost differs from Geneva unit cost
+#	'maturity'		maturity dates differ
+#
+# The trustee holdings should have gone through filter_maturity(),
+# merge_lots() and rename_position_isin() first, as for the csv files.
+# Geneva bonds matured before the same cut off are left out here, as
+# geneva.filter_maturity() does.
+#
+# Both sides are snapshots of one date, a portfolio that appears twice
+# on the trustee side raises PortfolioRepeated instead of mixing dates.
+#
+
+from trustee.utility import get_output_directory, get_reconcile_tolerances
+from trustee.quick_holding import is_cash_position
+from trustee.geneva import is_matured
+from trustee.security_master import get_security_master
+from trustee.writer import write_csv, field, format_date
+from datetime import datetime
+from os.path import join
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+BREAK_FIELDS = ['portfolio', 'invest_id', 'break_type', 'trustee_value',
+				'geneva_value', 'difference']
+
+
+
+class PortfolioRepeated(Exception):
+	pass
+
+
+
+def reconcile(trustee_portfolios, geneva_holding, tolerances=None):
+	"""
+	trustee_portfolios: a list of port_values dictionaries, each with the
+		'portfolio_id' and its 'bond' holding.
+
+	geneva_holding: Geneva positions of all portfolios, any iterable.
+
+	tolerances: (quantity, cost, maturity in days), if not given, they come
+		from the configuration file.
+
+	Return the list of breaks, each break is a dictionary of BREAK_FIELDS.
+
+	If a portfolio appears more than once in trustee_portfolios, say the
+	NAV files of two dates, PortfolioRepeated is raised.
+	"""
+	if tolerances is None:
+		tolerances = get_reconcile_tolerances()
+
+	geneva_index = index_geneva_holding(geneva_holding)
+	security_master = get_security_master()
+	portfolios = set()
+	breaks = []
+	for port_values in trustee_portfolios:
+		portfolio_id = port_values['portfolio_id']
+		if portfolio_id in portfolios:
+			logger.error('reconcile(): portfolio {0} appears more than once'.
+							format(portfolio_id))
+			raise PortfolioRepeated(portfolio_id)
+
+		portfolios.add(portfolio_id)
+		for bond in port_values['bond']:
+			invest_id = get_trustee_invest_id(security_master, bond)
+			try:
+				position = geneva_index.pop((portfolio_id, invest_id))
+			except KeyError:
+				breaks.append(make_break(portfolio_id, invest_id, 'not in geneva',
+											bond['par_amount'], '', ''))
+				continue
+
+			breaks.extend(compare_position(portfolio_id, invest_id, bond, position, tolerances))
+
+	for (portfolio_id, invest_id), position in geneva_index.items():
+		if portfolio_id in portfolios:
+			breaks.append(make_break(portfolio_id, invest_id, 'not in trustee',
+										'', position['Quantity'], ''))
+
+	return breaks
+
+
+
+def index_geneva_holding(geneva_holding):
+	"""
+	Index the non cash, not matured Geneva positions by (portfolio,
+	investment id). If a position appears more than once, the quantities
+	are added up and the unit cost is quantity weighted.
+	"""
+	geneva_index = {}
+	for position in geneva_holding:
+		if is_cash_position(position) or is_matured(position):
+			continue
+
+		key = (position['Portfolio'], position['InvestID'])
+		try:
+			p = geneva_index[key]
+		except KeyError:
+			geneva_index[key] = {'Quantity': position['Quantity'],
+									'UnitCost': position['UnitCost'],
+									'MaturityDate': position.get('MaturityDate', '')}
+			continue
+
+		quantity = p['Quantity'] + position['Quantity']
+		if quantity != 0:
+			p['UnitCost'] = (p['Quantity']*p['UnitCost'] + \
+								position['Quantity']*position['UnitCost']) / quantity
+
+		p['Quantity'] = quantity
+
+	return geneva_index
+
+
+
+def get_trustee_invest_id(security_master, bond):
+	"""
+	The Geneva investment id of a trustee bond, HTM bonds are booked as
+	'<ISIN> HTM' in Geneva, AFS bonds as the ISIN.
+	"""
+	if bond.get('accounting_treatment') == 'AFS':
+		return bond['isin']
+
+	return security_master.get_invest_id(bond['isin'])
+
+
+
+def compare_position(portfolio_id, invest_id, bond, position, tolerances):
+	quantity_tolerance, cost_tolerance, maturity_tolerance = tolerances
+	breaks = []
+
+	difference = bond['par_amount'] - position['Quantity']
+	if abs(difference) > quantity_tolerance:
+		breaks.append(make_break(portfolio_id, invest_id, 'quantity', bond['par_amount'],
+									position['Quantity'], difference))
+
+	difference = bond['average_cost'] - position['UnitCost']
+	if abs(difference) > cost_tolerance:
+		breaks.append(make_break(portfolio_id, invest_id, 'cost', bond['average_cost'],
+									position['UnitCost'], difference))
+
+	trustee_date, geneva_date = bond.get('maturity_date', ''), position['MaturityDate']
+	if isinstance(trustee_date, datetime) and isinstance(geneva_date, datetime):
+		difference = (trustee_date - geneva_date).days
+		if abs(difference) > maturity_tolerance:
+			breaks.append(make_break(portfolio_id, invest_id, 'maturity', trustee_date,
+										geneva_date, difference))
+
+	elif isinstance(trustee_date, datetime) or isinstance(geneva_date, datetime):
+		# one side has a maturity date, the other does not
+		breaks.append(make_break(portfolio_id, invest_id, 'maturity', trustee_date,
+									geneva_date, ''))
+
+	return breaks
+
+
+
+def make_break(portfolio_id, invest_id, break_type, trustee_value, geneva_value, difference):
+	return {'portfolio': portfolio_id, 'invest_id': invest_id, 'break_type': break_type,
+			'trustee_value': trustee_value, 'geneva_value': geneva_value,
+			'difference': difference}
+
+
+
+def write_break_report(breaks, filename='reconciliation_breaks.csv',
+						output_dir=get_output_directory()):
+	columns = [field(fld, format_date) if fld in ['trustee_value', 'geneva_value'] \
+				else field(fld) for fld in BREAK_FIELDS]
+	return write_csv(join(output_dir, filename), [BREAK_FIELDS], columns,
+						sorted(breaks, key=lambda b: (b['portfolio'], b['invest_id'])),
+						delimiter='|')
+
+
+
+
+
+if __name__ == '__main__':
+	import argparse, sys, glob
+	from os.path import isdir
+	from trustee.utility import get_input_directory, get_geneva_input_directory
+	from trustee.holding import read_file, filter_maturity, merge_lots, rename_position_isin, \
+									get_parser_name, get_bond_files
+	from trustee.geneva import iter_position_files, get_report_date, PositionFileError
+	from bochk.open_bochk import retrieve_date_from_filename
+	from trustee.parallel import read_files
+	import logging.config
+	logging.config.fileConfig('logging.config', disable_existing_loggers=False)
+
+	parser = argparse.ArgumentParser(description='Reconcile trustee NAV files with Geneva \
+										local position appraisal files.')
+	parser.add_argument('--trustee', help='folder containing trustee NAV files', required=True)
+	parser.add_argument('--geneva', help='folder containing Geneva appraisal files',
+						required=False)
+	parser.add_argument('--workers', help='number of processes to parse files in parallel',
+						type=int, default=1)
+	parser.add_argument('--incremental', help='parse only files new or changed since the last run', 
+						action='store_true')
+	args = parser.parse_args()
+
+	trustee_folder = join(get_input_directory(), args.trustee)
+	if args.geneva is None:
+		geneva_folder = get_geneva_input_directory()
+	else:
+		geneva_folder = join(get_input_directory(), args.geneva)
+
+	for folder in [trustee_folder, geneva_folder]:
+		if not isdir(folder):
+			print('{0} is not a valid directory'.format(folder))
+			sys.exit(1)
+
+	trustee_files = get_bond_files(glob.glob(join(trustee_folder, '*.xls*')))
+	geneva_files = glob.glob(join(geneva_folder, '*.xlsx'))
+
+	# one date at a time, otherwise holdings of different dates get mixed
+	dates = set(retrieve_date_from_filename(f.split('\\')[-1]) for f in trustee_files)
+	dates.update(d for d in map(get_report_date, geneva_files) if not d is None)
+	if len(dates) > 1:
+		print('files of more than one date: {0}, reconcile one date at a time'.
+				format(', '.join(sorted(str(d) for d in dates))))
+		sys.exit(1)
+
+	results, file_in_error = read_files(trustee_files, get_parser_name(),
+										read_file, workers=args.workers,
+										incremental=args.incremental)
+	for input_file, error in file_in_error:
+		print('failed to read {0}: {1}'.format(input_file, error))
+
+	trustee_portfolios = []
+	for input_file, port_values in results:
+		port_values['bond'] = rename_position_isin(merge_lots(filter_maturity(port_values['bond'])))
+		trustee_portfolios.append(port_values)
+
+	geneva_holding = iter_position_files(geneva_files,
+										['Portfolio', 'Group1', 'Group2', 'InvestID',
+											'Description', 'Quantity', 'UnitCost'],
+										incremental=args.incremental, workers=args.workers)
+	try:
+		breaks = reconcile(trustee_portfolios, geneva_holding)
+	except PortfolioRepeated as e:
+		print('portfolio {0} is in more than one trustee file'.format(e))
+		sys.exit(1)
+	except PositionFileError as e:
+		print('failed to read {0}, not reconciled'.format(e.args[0]))
+		sys.exit(1)
+
+	print('{0} breaks, see {1}'.format(len(breaks), write_break_report(breaks)))
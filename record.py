@@ -0,0 +1,172 @@
+# coding=utf-8
+#
+# Compact record types for the rows we read from the input files.
+#
+# A full load of all portfolios creates hundreds of thousands of bond
+# lots, transactions and positions. As dictionaries, each of them carries
+# its own hash table, and the same field names over and over. A record
+# here keeps its values in __slots__ instead, the field names are stored
+# once per class.
+#
+# A record behaves like a dictionary (record['par_amount'], 'isin' in
+# record, record.get(), keys(), items(), ...), so the writers, merge and
+# lookup functions work with records and dictionaries alike. A field not
+# declared by the record type can still be set, it goes into a small
+# dictionary of extra fields, e.g., columns of a Geneva report that are
+# read only once in a while.
+#
+
+from collections.abc import MutableMapping
+
+
+
+class Record(MutableMapping):
+	"""
+	Base class of the record types. A subclass declares its field names
+	in _fields, field names may contain spaces, e.g., 'trade date', which
+	become underscores in the attribute names.
+	"""
+	__slots__ = ('_extra',)
+	_fields = ()
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._attributes = {field: get_attribute_name(field) for field in cls._fields}
+
+
+	def __init__(self, values=None):
+		self._extra = None
+		if not values is None:
+			self.update(values)
+
+
+	def __getitem__(self, key):
+		try:
+			return getattr(self, self._attributes[key])
+		except KeyError:
+			if self._extra is None:
+				raise
+
+			return self._extra[key]
+		except AttributeError:
+			raise KeyError(key)
+
+
+	def __setitem__(self, key, value):
+		try:
+			setattr(self, self._attributes[key], value)
+		except KeyError:
+			if self._extra is None:
+				self._extra = {}
+
+			self._extra[key] = value
+
+
+	def __delitem__(self, key):
+		try:
+			delattr(self, self._attributes[key])
+		except KeyError:
+			if self._extra is None:
+				raise
+
+			del self._extra[key]
+		except AttributeError:
+			raise KeyError(key)
+
+
+	def __contains__(self, key):
+		try:
+			return hasattr(self, self._attributes[key])
+		except KeyError:
+			return not self._extra is None and key in self._extra
+
+
+	def __iter__(self):
+		"""
+		Fields that are set, in the order of _fields, followed by the
+		extra fields in the order they are set.
+		"""
+		for field, attribute in self._attributes.items():
+			if hasattr(self, attribute):
+				yield field
+
+		if not self._extra is None:
+			yield from self._extra
+
+
+	def __len__(self):
+		return sum(1 for field in self)
+
+
+	def __repr__(self):
+		return '{0}({1})'.format(type(self).__name__, dict(self.items()))
+
+
+	def copy(self):
+		return type(self)(self)
+
+
+
+def get_attribute_name(field):
+	return field.replace(' ', '_')
+
+
+
+def get_slots(fields):
+	return tuple(get_attribute_name(field) for field in fields)
+
+
+
+class BondLot(Record):
+	"""
+	A bond holding (lot) in a trustee NAV file, see holding.read_sub_section()
+	"""
+	_fields = ('isin', 'name', 'currency', 'accounting_treatment', 'par_amount',
+				'is_listed', 'listed_location', 'fx_on_trade_day', 'coupon_rate',
+				'coupon_start_date', 'maturity_date', 'average_cost', 'amortized_cost',
+				'book_cost', 'interest_bought', 'amortized_value', 'accrued_interest',
+				'amortized_gain_loss', 'fx_gain_loss')
+	__slots__ = get_slots(_fields)
+
+
+
+class BondTransaction(Record):
+	"""
+	A bond transaction in a trustee NAV file, see transaction.read_bond_section()
+	"""
+	_fields = ('portfolio_id', 'action', 'security_id', 'description', 'trade date',
+				'value date', 'reference code', 'broker', 'currency', 'amount',
+				'price', 'cost', 'bought interest', 'fx rate', 'cost HKD equivalent',
+				'bought interest HKD equivalent', 'effective yield')
+	__slots__ = get_slots(_fields)
+
+
+
+class GenevaPosition(Record):
+	"""
+	A position in the Geneva local position appraisal report, see
+	geneva.make_position()
+	"""
+	_fields = ('Portfolio', 'Group1', 'Group2', 'InvestID', 'Description',
+				'MaturityDate', 'ExtendedDescription', 'Quantity', 'UnitCost',
+				'Amortized Cost', 'Yield at Cost', 'Purchase Cost',
+				'Maturity to Last Year End')
+	__slots__ = get_slots(_fields)
+
+
+
+class JonesPosition(Record):
+	"""
+	A position in the Jones holding file, see TSCF_upload.read_line_jones()
+	"""
+	_fields = ('ISIN', 'Purchase Cost', 'Yield at Cost', 'Portfolio')
+	__slots__ = get_slots(_fields)
+
+
+
+class TrusteePosition(Record):
+	"""
+	A position in the trustee holding file, see quick_holding.read_line_trustee()
+	"""
+	_fields = ('Identifier', 'Amortized Cost')
+	__slots__ = get_slots(_fields)
@@ -0,0 +1,117 @@
+# coding=utf-8
+#
+# The security master: trustee security code <-> ISIN <-> Geneva investment
+# id.
+#
+# The trustee identifies most bonds by ISIN, but a few by its own codes,
+# such as 'HSBCFN13014'. The mapping is kept in a csv file (see
+# security_master.csv), loaded once per process and shared by all the
+# parsers, so that adding a security needs no code change. The file is
+# loaded again when it is modified, the check is done at most once every
+# few seconds.
+#
+
+from trustee.utility import get_security_master_file, ReloadingFile
+import csv, hashlib
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class InvalidSecurityMaster(Exception):
+	pass
+
+
+
+class SecurityMaster():
+	"""
+	Lookups between trustee code, ISIN and Geneva investment id, all of
+	them are dictionary lookups.
+	"""
+	def __init__(self, entries=[]):
+		self.isin_by_code = {}
+		self.code_by_isin = {}
+		self.invest_id_by_isin = {}
+		self.isin_by_invest_id = {}
+		for code, isin, invest_id in entries:
+			self.add(code, isin, invest_id)
+
+
+	def add(self, code, isin, invest_id=''):
+		if invest_id == '':
+			invest_id = isin + ' HTM'
+
+		self.isin_by_code[code] = isin
+		self.code_by_isin[isin] = code
+		self.invest_id_by_isin[isin] = invest_id
+		self.isin_by_invest_id[invest_id] = isin
+
+
+	def map_code(self, code):
+		"""
+		Map a trustee security code to ISIN, a code not in the security
+		master is taken as an ISIN already.
+		"""
+		return self.isin_by_code.get(code, code)
+
+
+	def get_isin(self, code):
+		return self.isin_by_code[code]
+
+
+	def get_code(self, isin):
+		return self.code_by_isin[isin]
+
+
+	def get_invest_id(self, isin):
+		"""
+		Geneva investment id of an ISIN, for one not in the security master,
+		it is the ISIN + ' HTM'.
+		"""
+		return self.invest_id_by_isin.get(isin, isin + ' HTM')
+
+
+	def get_isin_from_invest_id(self, invest_id):
+		return self.isin_by_invest_id[invest_id]
+
+
+	def get_key(self):
+		"""
+		A short hash of the mappings, to tell apart results that depend on
+		the security master, e.g., in the cache.
+		"""
+		h = hashlib.blake2b(digest_size=8)
+		for code, isin in sorted(self.isin_by_code.items()):
+			h.update('{0}|{1}|{2}\n'.format(code, isin, self.invest_id_by_isin[isin]).encode('utf-8'))
+
+		return h.hexdigest()
+
+
+
+def read_security_master(filename):
+	"""
+	Read the security master csv file, lines starting with '#' are
+	comments, the first line after them is the header.
+	"""
+	with open(filename, newline='', encoding='utf-8') as f:
+		reader = csv.DictReader(line for line in f if not line.startswith('#'))
+		try:
+			return SecurityMaster([(row['trustee_code'].strip(), row['isin'].strip(),
+									row['geneva_invest_id'].strip()) for row in reader])
+		except (KeyError, AttributeError):
+			logger.error('read_security_master(): invalid security master file {0}'.
+							format(filename))
+			raise InvalidSecurityMaster()
+
+
+
+_security_master = ReloadingFile(read_security_master)
+
+
+
+def get_security_master():
+	"""
+	The security master of this process, loaded from the file the first
+	time, and again after the file is modified.
+	"""
+	return _security_master.get(get_security_master_file())
@@ -1,7 +1,18 @@
 # coding=utf-8
 # 
-# Upload files to a sftp site. The code relies on WinSCP program to
-# do the FTP work.
+# Upload files to a sftp site, through one of two transports:
+# 
+# paramiko: an SFTP client in this process, the SSH session is kept
+# 	open between uploads (reconnected if it drops), and writes are
+# 	pipelined, so an upload costs a round trip, not a new process and
+# 	a new SSH handshake.
+# 
+# winscp: write a script for WinSCP.com, run it, then read its log for
+# 	the files transferred. The default, and the fallback if paramiko
+# 	is not installed or no known hosts file is set.
+# 
+# The transport is chosen by 'transport' in sftp.config (winscp unless
+# set to paramiko), either way upload() returns {'pass': [...], 'fail': [...]}.
 # 
 # SFTP parameters like site IP address, user name and password are
 # set in the sftp.config file.
@@ -9,16 +20,22 @@
 # There are two known issues:
 # 
 # 1. For a SFTP site, please use WinSCP to connect at least once
-# 	so that the server's host key can be verified.
+# 	so that the server's host key can be verified. The paramiko
+# 	transport checks the host key against the known hosts file in
+# 	sftp.config, unknown hosts are rejected.
 # 
 # 2. There cannot be any spaces in file name or directory name in
-# 	the upload file path.
+# 	the upload file path (winscp only).
 # 
 
-import time, os
-from os.path import join
+import time, os, posixpath, threading
+from os.path import join, basename
 from subprocess import run, TimeoutExpired, CalledProcessError
 from trustee.utility import get_current_directory
+try:
+	import paramiko
+except ImportError:
+	paramiko = None
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,7 +50,167 @@ if not 'config' in globals():
 
 
 
-def upload(file_list):
+def upload(file_list, transport=None):
+	"""
+	Upload the files to the sftp site, return a dictionary, 'pass' is the
+	list of files uploaded, 'fail' the list of files that are not.
+
+	transport: the transport to use, get_transport() by default.
+	"""
+	if transport is None:
+		transport = get_transport()
+
+	return transport.upload(file_list)
+
+
+
+class WinSCPTransport():
+	"""
+	Upload through winscp.com, a new process and SSH session every time.
+	"""
+	def upload(self, file_list):
+		return upload_winscp(file_list)
+
+
+	def close(self):
+		pass
+
+
+
+class ParamikoTransport():
+	"""
+	Upload through an SFTP session in this process, the session is opened
+	on the first upload and kept for the next ones.
+	"""
+	def __init__(self, server, username, password, port=22, remote_dir='',
+					known_hosts='', timeout=None):
+		self.server = server
+		self.username = username
+		self.password = password
+		self.port = port
+		self.remote_dir = remote_dir
+		self.known_hosts = known_hosts
+		self.timeout = timeout
+		self.client = None
+		self.sftp = None
+		self.lock = threading.Lock()
+
+
+	def upload(self, file_list):
+		"""
+		Upload the files one by one, once the session cannot be opened
+		(again), the files left are failed.
+		"""
+		pass_list = []
+		with self.lock:
+			for file in file_list:
+				if not self.is_connected():
+					try:
+						self.connect()
+					except (OSError, EOFError, paramiko.SSHException):
+						logger.exception('ParamikoTransport.upload(): cannot connect to {0}'.
+											format(self.server))
+						break
+
+				try:
+					self.put(file)
+					pass_list.append(file)
+				except (OSError, EOFError, paramiko.SSHException):
+					logger.exception('ParamikoTransport.upload(): failed to upload {0}'.
+										format(file))
+
+		return {'pass': pass_list, 'fail': get_fail_list(file_list, pass_list)}
+
+
+	def put(self, file):
+		"""
+		Upload a file, the remote file has the same name in the remote
+		directory. If the session has dropped, connect again and retry once.
+		"""
+		remote_file = posixpath.join(self.remote_dir, basename(file))
+		try:
+			self.sftp.put(file, remote_file)	# writes are pipelined
+		except (OSError, EOFError, paramiko.SSHException):
+			if self.is_connected():
+				raise
+
+			logger.warning('ParamikoTransport.put(): session dropped, connect again')
+			self.connect()
+			self.sftp.put(file, remote_file)
+
+
+	def is_connected(self):
+		return not self.client is None and not self.client.get_transport() is None \
+				and self.client.get_transport().is_active()
+
+
+	def connect(self):
+		self.close()
+		client = paramiko.SSHClient()
+		if self.known_hosts != '':
+			client.load_host_keys(self.known_hosts)
+
+		client.set_missing_host_key_policy(paramiko.RejectPolicy())
+		client.connect(self.server, port=self.port, username=self.username,
+						password=self.password, timeout=self.timeout,
+						allow_agent=False, look_for_keys=False)
+		self.client = client
+		self.sftp = client.open_sftp()
+		self.sftp.get_channel().settimeout(self.timeout)
+		logger.debug('ParamikoTransport.connect(): connected to {0}'.format(self.server))
+
+
+	def close(self):
+		if not self.client is None:
+			self.client.close()
+
+		self.client = None
+		self.sftp = None
+
+
+
+_lock = threading.Lock()
+_transport = None
+
+
+
+def get_transport():
+	"""
+	The transport of this process, created on first use, so that the
+	paramiko session is shared by all uploads.
+	"""
+	global _transport
+	with _lock:
+		if _transport is None:
+			_transport = create_transport(get_transport_name())
+
+		return _transport
+
+
+
+def create_transport(name):
+	"""
+	The paramiko transport is used only when asked for, and only with a
+	known hosts file to check the server against.
+	"""
+	if name == 'paramiko' and paramiko is None:
+		logger.warning('create_transport(): paramiko is not installed, use winscp')
+		name = 'winscp'
+
+	if name == 'paramiko' and get_known_hosts_file() == '':
+		logger.warning('create_transport(): no known_hosts file in sftp.config, use winscp')
+		name = 'winscp'
+
+	if name == 'paramiko':
+		return ParamikoTransport(get_sftp_server(), get_sftp_user(), get_sftp_password(),
+									get_sftp_port(), get_remote_directory(),
+									get_known_hosts_file(), get_timeout())
+
+	return WinSCPTransport()
+
+
+
+def upload_winscp(file_list):
 	"""
 	Call winscp.com to execute the sftp upload job.
 	"""
@@ -202,6 +379,30 @@ def get_sftp_password():
 
 
 
+def get_sftp_port():
+	global config
+	return int(config['sftp'].get('port', '22'))
+
+
+
+def get_remote_directory():
+	global config
+	return config['sftp'].get('remote_dir', '').strip()
+
+
+
+def get_known_hosts_file():
+	global config
+	return config['sftp'].get('known_hosts', '').strip()
+
+
+
+def get_transport_name():
+	global config
+	return config['sftp'].get('transport', 'winscp').strip().lower()
+
+
+
 
 if __name__ == '__main__':
 	"""
@@ -0,0 +1,101 @@
+# coding=utf-8
+#
+# Locate a report (worksheet) in a trustee NAV workbook without parsing
+# every sheet in it.
+#
+# A NAV workbook has many heavy sheets, each is a report, and usually we
+# need only one of them. The workbook is opened with on_demand=True so
+# that sheets are parsed only when asked for, and we keep an index of
+# report name to sheet position per workbook template (the list of sheet
+# names), saved in the cache directory. Later files of the same template
+# jump straight to the right sheet.
+#
+
+from trustee.utility import get_cache_directory, write_atomic
+from os.path import join, isfile
+import json
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+def find_report_sheet(wb, report_name, get_report_name):
+	"""
+	Find the worksheet whose report name is report_name in the workbook,
+	the workbook should be opened with on_demand=True.
+
+	get_report_name: a function that takes a worksheet and returns its
+		report name.
+
+	Return the worksheet, or None if no sheet has that report name. Sheets
+	that are checked but not matched are unloaded.
+	"""
+	index = load_sheet_index()
+	template = get_template_key(wb)
+	reports = index.get(template, {})
+
+	if report_name in reports:
+		sheet_index = reports[report_name]
+		if sheet_index < wb.nsheets:
+			ws = wb.sheet_by_index(sheet_index)
+			if get_report_name(ws) == report_name:
+				return ws
+
+			wb.unload_sheet(sheet_index)
+
+		logger.warning('find_report_sheet(): index of {0} is out of date'.
+						format(report_name))
+
+	for sheet_index in range(wb.nsheets):
+		ws = wb.sheet_by_index(sheet_index)
+		name = get_report_name(ws)
+		reports[name] = sheet_index
+		if name == report_name:
+			index[template] = reports
+			save_sheet_index(index)
+			return ws
+
+		wb.unload_sheet(sheet_index)
+
+	index[template] = reports
+	save_sheet_index(index)
+	return None
+
+
+
+def get_template_key(wb):
+	"""
+	Workbooks with the same sheet names are considered the same template.
+	"""
+	return '|'.join(wb.sheet_names())
+
+
+
+def get_sheet_index_file():
+	return join(get_cache_directory(), 'sheet_index.json')
+
+
+
+def load_sheet_index():
+	"""
+	Load the index, which is a dictionary of template key to a dictionary
+	of report name to sheet position.
+	"""
+	index_file = get_sheet_index_file()
+	if not isfile(index_file):
+		return {}
+
+	try:
+		with open(index_file, encoding='utf-8') as f:
+			return json.load(f)
+	except ValueError:
+		logger.warning('load_sheet_index(): index file {0} is corrupted, ignored'.
+						format(index_file))
+		return {}
+
+
+
+def save_sheet_index(index):
+	index_file = get_sheet_index_file()
+	write_atomic(index_file, lambda f: json.dump(index, f, ensure_ascii=False, indent=1,
+												sort_keys=True), binary=False)
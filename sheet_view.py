@@ -0,0 +1,61 @@
+# coding=utf-8
+#
+# A read-only view of an xlrd worksheet, which fetches the cell values
+# one row at a time instead of one cell at a time.
+#
+# The parsers in this package walk the trustee NAV worksheets row by row,
+# and most of the time they look at every column of the row. Calling
+# ws.cell_value(row, col) for each cell is where most of the parsing time
+# goes for big "Portfolio Val." sheets, so the parsers work on rows
+# (lists of cell values) fetched in bulk instead.
+#
+
+
+
+class SheetView(object):
+	"""
+	Wrap an xlrd worksheet and materialise all its cell values as a list
+	of rows, with one row_values() call per row.
+
+	The view supports the subset of the xlrd Sheet interface used by the
+	parsers (nrows, ncols, cell_value, row_values, col_values, row_len),
+	so it can be passed to any function that expects a worksheet.
+	"""
+	def __init__(self, ws):
+		self.name = ws.name
+		self.nrows = ws.nrows
+		self.ncols = ws.ncols
+		self.rows = [ws.row_values(row) for row in range(ws.nrows)]
+
+
+
+	def cell_value(self, rowx, colx):
+		return self.rows[rowx][colx]
+
+
+
+	def row_values(self, rowx, start_colx=0, end_colx=None):
+		return self.rows[rowx][start_colx:end_colx]
+
+
+
+	def col_values(self, colx, start_rowx=0, end_rowx=None):
+		return [values[colx] if colx < len(values) else '' \
+					for values in self.rows[start_rowx:end_rowx]]
+
+
+
+	def row_len(self, rowx):
+		return len(self.rows[rowx])
+
+
+
+def get_sheet_view(ws):
+	"""
+	Return a SheetView of the worksheet, if ws is already a SheetView,
+	return it as is.
+	"""
+	if isinstance(ws, SheetView):
+		return ws
+
+	return SheetView(ws)
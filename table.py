@@ -0,0 +1,261 @@
+# coding=utf-8
+#
+# A columnar table of holdings or positions, backed by NumPy arrays.
+#
+# The list functions, like holding.filter_maturity(), merge_lots() and
+# quick_holding.is_cash_position(), go through a holding one position at
+# a time. For a big holding (all portfolios over many dates), we keep one
+# array per field instead, so that filters and aggregations run on whole
+# columns at once:
+#
+#	table = PositionTable.from_records(holding)
+#	table = table.take(~table.is_cash() & table.is_HTM())
+#	holding = table.to_records()
+#
+# geneva.read_position_table() and holding.read_holding_table() read a
+# file straight into a table.
+#
+# Numeric columns are float64 arrays, other columns are object arrays,
+# so values are kept as they are, e.g., a maturity date is either a
+# datetime or '' (no maturity date). Date comparisons work on a datetime64
+# copy of the column, where a value that is not a date becomes NaT.
+#
+# This module needs NumPy, the rest of the package does not.
+#
+
+import numpy as np
+from datetime import datetime
+
+
+
+class PositionTable():
+	"""
+	A table of positions, columns is a dictionary of field name to array,
+	all arrays have the same length.
+	"""
+	def __init__(self, columns):
+		self.columns = columns
+		self._dates = {}
+
+
+	@classmethod
+	def from_records(cls, records, fields=None):
+		"""
+		Create a table from positions (records or dictionaries), records can
+		be any iterable, including a generator.
+
+		fields: the fields to keep, if not given, fields of the first record
+			are used. A record without a field gets '' for it.
+		"""
+		records = iter(records)
+		if fields is None:
+			try:
+				first = next(records)
+			except StopIteration:
+				return cls({})
+
+			fields = list(first.keys())
+			records = _chain_first(first, records)
+
+		values = {field: [] for field in fields}
+		for record in records:
+			for field in fields:
+				values[field].append(record.get(field, ''))
+
+		return cls({field: make_column(v) for field, v in values.items()})
+
+
+	def __len__(self):
+		for column in self.columns.values():
+			return len(column)
+
+		return 0
+
+
+	def __getitem__(self, field):
+		return self.columns[field]
+
+
+	def __setitem__(self, field, values):
+		self.columns[field] = values
+		self._dates.pop(field, None)
+
+
+	def __contains__(self, field):
+		return field in self.columns
+
+
+	def fields(self):
+		return list(self.columns.keys())
+
+
+	def take(self, index):
+		"""
+		Return a new table of the selected rows, index is either a boolean
+		mask or an array of row numbers.
+		"""
+		return PositionTable({field: column[index] for field, column in self.columns.items()})
+
+
+	def get_dates(self, field):
+		"""
+		The column as datetime64, values that are not datetime become NaT.
+
+		Maturity dates repeat a lot, so each distinct date is converted
+		once, then the rows pick their dates by index.
+		"""
+		try:
+			return self._dates[field]
+		except KeyError:
+			pass
+
+		distinct = {}
+		index = np.array([distinct.setdefault(value, len(distinct)) \
+							if isinstance(value, datetime) else -1 \
+							for value in self.columns[field]], dtype=np.intp)
+		dates = np.append(np.array(list(distinct), dtype='datetime64[us]'),
+							np.datetime64('NaT', 'us'))[index]	# -1 picks NaT
+		self._dates[field] = dates
+		return dates
+
+
+	def matures_before(self, cutoff, field='MaturityDate'):
+		"""
+		Rows whose maturity date is a date earlier than the cutoff (datetime),
+		a row without maturity date is never True.
+		"""
+		return self.get_dates(field) < np.datetime64(cutoff, 'us')
+
+
+	def matures_after(self, cutoff, field='MaturityDate'):
+		return self.get_dates(field) > np.datetime64(cutoff, 'us')
+
+
+	def has_date(self, field):
+		return ~np.isnat(self.get_dates(field))
+
+
+	def is_cash(self, field='Group2'):
+		"""
+		The vectorised quick_holding.is_cash_position()
+		"""
+		return self.columns[field] == 'Cash and Equivalents'
+
+
+	def is_HTM(self, field='InvestID'):
+		return np.char.find(self.columns[field].astype(str), 'HTM') >= 0
+
+
+	def is_AFS(self, field='InvestID'):
+		"""
+		The vectorised quick_holding.is_AFS_position()
+		"""
+		return ~self.is_HTM(field)
+
+
+	def group_by(self, field):
+		"""
+		Group the rows by the values of a field, return (first, group), where
+		first is the row number of the first row of each group, in the order
+		the groups first appear, and group is the group number of each row.
+		"""
+		if len(self) == 0:
+			return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+		keys, first, group = np.unique(self.columns[field].astype(str),
+										return_index=True, return_inverse=True)
+		order = np.argsort(first)
+		rank = np.empty_like(order)
+		rank[order] = np.arange(len(order))
+		return first[order], rank[group.reshape(-1)]
+
+
+	def sum_by(self, group, field, n_groups):
+		return np.bincount(group, weights=self.columns[field], minlength=n_groups)
+
+
+	def to_records(self, record_type=dict):
+		"""
+		Convert the table back to a list of positions, for the writers.
+		"""
+		fields = self.fields()
+		columns = [self.columns[field].tolist() for field in fields]
+		records = []
+		for values in zip(*columns):
+			record = record_type()
+			for field, value in zip(fields, values):
+				record[field] = value
+
+			records.append(record)
+
+		return records
+
+
+
+def make_column(values):
+	"""
+	Numbers (but not booleans) go into a float64 array, anything else goes
+	into an object array.
+	"""
+	if len(values) > 0 and all(isinstance(v, (int, float)) and not isinstance(v, bool) \
+								for v in values):
+		return np.array(values, dtype=np.float64)
+
+	column = np.empty(len(values), dtype=object)
+	column[:] = values
+	return column
+
+
+
+def _chain_first(first, records):
+	yield first
+	yield from records
+
+
+
+def filter_geneva_maturity(table):
+	"""
+	The vectorised geneva.filter_maturity(), filter out all cash positions,
+	and bonds with maturity earlier than 2016-12-31.
+	"""
+	mask = (table['Group1'] == 'Cash and Equivalents') | \
+			(table['Group2'] == 'Cash and Equivalents') | \
+			table.matures_before(datetime(2017,1,1))
+	return table.take(~mask)
+
+
+
+def filter_holding_maturity(table):
+	"""
+	The vectorised holding.filter_maturity(), filter out bonds with maturity
+	earlier than 2016-12-31.
+	"""
+	mask = ~table.has_date('maturity_date') | \
+			table.matures_after(datetime(2016,12,31), 'maturity_date')
+	return table.take(mask)
+
+
+
+def merge_lots(table):
+	"""
+	The vectorised holding.merge_lots(), merge all lots of the same bond
+	into one, the par amounts are added up and the average cost is par
+	weighted. Other fields are those of the first lot.
+	"""
+	first, group = table.group_by('isin')
+	par_amount = table.sum_by(group, 'par_amount', len(first))
+	weighted_cost = np.bincount(group, weights=table['par_amount']*table['average_cost'],
+								minlength=len(first))
+
+	# like the list version, a single lot is kept as it is, and lots whose
+	# par amounts add up to zero cannot be merged
+	multiple = np.bincount(group, minlength=len(first)) > 1
+	if np.any(multiple & (par_amount == 0)):
+		raise ZeroDivisionError('merge_lots(): par amounts of {0} add up to zero'.
+								format(table['isin'][first[multiple & (par_amount == 0)][0]]))
+
+	merged = table.take(first)
+	merged['average_cost'] = np.where(multiple, weighted_cost / np.where(multiple, par_amount, 1),
+										merged['average_cost'])
+	merged['par_amount'] = par_amount
+	return merged
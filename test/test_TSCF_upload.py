@@ -8,7 +8,9 @@ from xlrd import open_workbook
 from trustee.utility import get_current_directory
 from small_program.read_file import read_file
 from trustee.TSCF_upload import read_line_jones, update_position, \
-                                get_days_maturity_LYE
+                                get_days_maturity_LYE, index_jones_holding, \
+                                lookup_jones_position, PositionNotFound, \
+                                consolidate_security, iter_consolidated_security
 from trustee.geneva import read_line
 from os.path import join
 from datetime import datetime
@@ -68,6 +70,39 @@ class TestTSCFUpload(unittest2.TestCase):
 
 
 
+    def test_lookup_jones_position(self):
+        jones_holding = [
+            {'ISIN':'HK0000171949', 'Purchase Cost':100, 'Yield at Cost':6.15},
+            {'ISIN':'HK0000171949', 'Portfolio':'12732', 'Purchase Cost':99, 'Yield at Cost':6.2},
+            {'ISIN':'XS1736887099', 'Purchase Cost':100, 'Yield at Cost':4.8}
+        ]
+        jones_index = index_jones_holding(jones_holding)
+        self.assertEqual(lookup_jones_position(jones_index, 'HK0000171949', '12732'), 
+                            jones_holding[1])
+        self.assertEqual(lookup_jones_position(jones_index, 'HK0000171949', '12229'), 
+                            jones_holding[0])
+        self.assertEqual(lookup_jones_position(jones_index, 'XS1736887099', '12229'), 
+                            jones_holding[2])
+        with self.assertRaises(PositionNotFound):
+            lookup_jones_position(jones_index, 'US912803AY96', '12229')
+
+
+
+    def test_consolidate_security(self):
+        holding = [
+            {'InvestID':'CNY', 'Group2':'Cash and Equivalents', 'Portfolio':'12229'},
+            {'InvestID':'HK0000171949 HTM', 'Group2':'Corporate Bond', 'Portfolio':'12229'},
+            {'InvestID':'XS1736887099', 'Group2':'Corporate Bond', 'Portfolio':'12229'},
+            {'InvestID':'HK0000171949 HTM', 'Group2':'Corporate Bond', 'Portfolio':'12732'},
+            {'InvestID':'XS1736887099 HTM', 'Group2':'Corporate Bond', 'Portfolio':'12732'}
+        ]
+        consolidated = consolidate_security(holding)
+        self.assertEqual(consolidated, [holding[1], holding[2]])
+        self.assertEqual(list(iter_consolidated_security(p for p in holding)), 
+                            [holding[1], holding[2]])
+
+
+
     def verify_jones_position1(self, position):
         # fist position in Jones Holding 2017.12.20.xlsx
         # FR0013101599 CNP ASSURANCES (CNPFP 6 01/22/49 FIXED)
@@ -0,0 +1,75 @@
+"""
+Test the read_with_cache() method from cache.py
+
+"""
+
+import unittest2, tempfile, shutil, os, uuid
+import trustee.utility
+from trustee.cache import read_with_cache, get_file_hash
+
+
+
+class TestCache(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestCache, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.calls = 0
+        self.cache_directory = trustee.utility.config['cache']['directory']
+        self.directory = tempfile.mkdtemp()
+        trustee.utility.config['cache']['directory'] = self.directory
+        f, self.filename = tempfile.mkstemp(suffix='.txt')
+        # a unique second line, so that no earlier run has cached the content
+        os.write(f, '12229|XS1213794578 HTM|20000000\n{0}'.format(uuid.uuid4()).encode())
+        os.close(f)
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        os.remove(self.filename)
+        trustee.utility.config['cache']['directory'] = self.cache_directory
+        shutil.rmtree(self.directory)
+
+
+
+    def read_func(self, filename, separator):
+        self.calls = self.calls + 1
+        with open(filename) as f:
+            return f.readline().strip().split(separator)
+
+
+
+    def test_read_with_cache(self):
+        result = read_with_cache(self.filename, 'test', self.read_func, '|')
+        self.assertEqual(result, ['12229', 'XS1213794578 HTM', '20000000'])
+        self.assertEqual(self.calls, 1)
+
+        result = read_with_cache(self.filename, 'test', self.read_func, '|')
+        self.assertEqual(result, ['12229', 'XS1213794578 HTM', '20000000'])
+        self.assertEqual(self.calls, 1)  # from cache
+
+        read_with_cache(self.filename, 'test2', self.read_func, ' ')
+        self.assertEqual(self.calls, 2)  # another parser
+
+
+
+    def test_content_change(self):
+        read_with_cache(self.filename, 'test', self.read_func, '|')
+        with open(self.filename, 'w') as f:
+            f.write('12229|XS1213794578 HTM|100\n{0}'.format(uuid.uuid4()))
+
+        result = read_with_cache(self.filename, 'test', self.read_func, '|')
+        self.assertEqual(result[-1], '100')
+        self.assertEqual(self.calls, 2)
+
+
+
+    def test_get_file_hash(self):
+        h = get_file_hash(self.filename)
+        self.assertEqual(len(h), 40)
+        self.assertEqual(h, get_file_hash(self.filename))
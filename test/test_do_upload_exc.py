@@ -0,0 +1,134 @@
+"""
+Test the daemon mode of do_upload_exc.py
+
+"""
+
+import unittest2, tempfile, os
+import trustee.do_upload_exc as do_upload_exc
+from trustee.do_upload_exc import watch_file_poll, get_file_state, run_daemon
+from trustee.rate_table import ExchangeRateNotFound
+
+
+
+class TestDoUploadExc(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestDoUploadExc, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        f, self.filename = tempfile.mkstemp(suffix='.txt')
+        os.close(f)
+        self.saved = {name: getattr(do_upload_exc, name) for name in \
+                        ['upload_exc', 'load_holding', 'get_directory_state',
+                            'reload_exchange_rates', 'wait_until_settled',
+                            'get_geneva_input_directory', 'get_exchange_file',
+                            'upload', 'write_upload_csv_exc']}
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        for name, value in self.saved.items():
+            setattr(do_upload_exc, name, value)
+
+        os.remove(self.filename)
+
+
+
+    def test_get_file_state(self):
+        self.assertEqual(get_file_state(self.filename)[1], 0)
+        self.assertEqual(get_file_state(self.filename+'.none'), None)
+
+
+
+    def test_watch_file_poll(self):
+        events = watch_file_poll(self.filename, 0.05, poll_interval=0.01)
+        self.assertFalse(next(events))
+
+        with open(self.filename, 'w') as f:
+            f.write('[Exchange]\nUSDHKD=7.8472\n')
+
+        self.assertTrue(next(events))
+        self.assertFalse(next(events))
+
+
+
+    def test_run_daemon(self):
+        rates = [{'usdhkd': '7.8'}, {'usdhkd': '7.8'}, {'usdhkd': '7.81'},
+                    {'usdhkd': '7.82'}]
+        directory_states = [{'a.xlsx': 1}, {'a.xlsx': 1}, {'a.xlsx': 1},
+                            {'a.xlsx': 1}, {'a.xlsx': 2}, {'a.xlsx': 2}]
+        upload_results = [False, True]
+        uploaded, loaded = [], []
+
+        def load_holding(workers=1, incremental=False):
+            loaded.append(workers)
+            return ['holding {0}'.format(len(loaded))]
+
+        def upload_exc(holding):
+            uploaded.append(holding[0])
+            return upload_results.pop(0)
+
+        do_upload_exc.get_geneva_input_directory = lambda: 'appraisal'
+        do_upload_exc.get_exchange_file = lambda: self.filename
+        do_upload_exc.get_directory_state = lambda directory: directory_states.pop(0)
+        do_upload_exc.reload_exchange_rates = lambda: rates.pop(0)
+        do_upload_exc.wait_until_settled = lambda filename: None
+        do_upload_exc.load_holding = load_holding
+        do_upload_exc.upload_exc = upload_exc
+
+        # file touched with the same rates, new rates with a failed upload,
+        # appraisal files change, then a retry
+        run_daemon(workers=2, events=[False, True, True, False, False])
+        self.assertEqual(loaded, [2, 2])
+        self.assertEqual(uploaded, ['holding 1', 'holding 2'])
+        self.assertEqual(rates, [])
+
+
+
+    def test_run_daemon_error(self):
+        rates = [{'usdhkd': '7.8'}, {'usdhkd': '7.81'}, {'usdhkd': '7.81'},
+                    {'usdhkd': '7.81'}]
+        holdings = [IOError('bad appraisal file'), ['holding 1']]
+        upload_results = [ExchangeRateNotFound(), True]
+        uploaded = []
+
+        def load_holding(workers=1, incremental=False):
+            holding = holdings.pop(0)
+            if isinstance(holding, Exception):
+                raise holding
+
+            return holding
+
+        def upload_exc(holding):
+            uploaded.append(holding[0])
+            result = upload_results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+
+            return result
+
+        do_upload_exc.get_geneva_input_directory = lambda: 'appraisal'
+        do_upload_exc.get_exchange_file = lambda: self.filename
+        do_upload_exc.get_directory_state = lambda directory: {'a.xlsx': 1}
+        do_upload_exc.reload_exchange_rates = lambda: rates.pop(0)
+        do_upload_exc.wait_until_settled = lambda filename: None
+        do_upload_exc.load_holding = load_holding
+        do_upload_exc.upload_exc = upload_exc
+
+        # the holding fails to load at start, the first upload raises, the
+        # daemon goes on and uploads on the next check
+        run_daemon(events=[True, False, False])
+        self.assertEqual(uploaded, ['holding 1', 'holding 1'])
+        self.assertEqual(upload_results, [])
+        self.assertEqual(rates, [{'usdhkd': '7.81'}])
+
+
+
+    def test_upload_exc_no_result(self):
+        do_upload_exc.upload = lambda file_list: {'pass': [], 'fail': []}
+        do_upload_exc.write_upload_csv_exc = lambda holding: 'exc.inc'
+        self.assertFalse(do_upload_exc.upload_exc([]))
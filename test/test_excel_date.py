@@ -0,0 +1,55 @@
+"""
+Test the convert_excel_dates() method from excel_date.py
+
+"""
+
+import unittest2
+from datetime import datetime
+import trustee.excel_date as excel_date
+from trustee.excel_date import convert_excel_dates
+
+
+
+class TestExcelDate(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestExcelDate, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.np = excel_date.np
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        excel_date.np = self.np
+
+
+
+    def test_convert_excel_dates(self):
+        self.verify_dates()
+
+
+
+    def test_convert_excel_dates_no_numpy(self):
+        excel_date.np = None
+        self.verify_dates()
+
+
+
+    def verify_dates(self):
+        values = [42916.0, 'N/A', 43100.5, '', 1.0, 61.0]
+        dates, invalid = convert_excel_dates(values, 0)
+        self.assertEqual(invalid, [False, True, False, True, False, False])
+        self.assertEqual(dates[0], datetime(2017,6,30))
+        self.assertEqual(dates[1], 'N/A')
+        self.assertEqual(dates[2], datetime(2017,12,31,12))
+        self.assertEqual(dates[3], '')
+        self.assertEqual(dates[4], datetime(1900,1,1))
+        self.assertEqual(dates[5], datetime(1900,3,1))
+
+        dates, invalid = convert_excel_dates([0.0], 1)
+        self.assertEqual(dates[0], datetime(1904,1,1))
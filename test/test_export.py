@@ -0,0 +1,76 @@
+"""
+Test the columnar export from export.py
+
+"""
+
+import unittest2, tempfile, shutil, os
+from datetime import datetime
+import trustee.export as export
+from trustee.export import export_bond_holding, export_transactions, read_columnar
+
+
+
+@unittest2.skipIf(export.np is None, 'NumPy is not installed')
+class TestExport(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestExport, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.output_dir = tempfile.mkdtemp()
+        self.pyarrow = export.pyarrow
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        export.pyarrow = self.pyarrow
+        shutil.rmtree(self.output_dir)
+
+
+
+    def test_export_npz(self):
+        export.pyarrow = None
+        self.verify_bond_holding('.npz')
+        self.verify_transactions('.npz')
+
+
+
+    @unittest2.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+    def test_export_parquet(self):
+        self.verify_bond_holding('.parquet')
+        self.verify_transactions('.parquet')
+
+
+
+    def verify_bond_holding(self, extension):
+        port_values = {'portfolio_id': '12229', 'date': datetime(2018,1,2), 'bond': [
+                        {'isin': 'XS1213794578', 'par_amount': 1000000.0, 
+                            'maturity_date': datetime(2025,4,15), 'average_cost': 99.5},
+                        {'isin': 'HK0000163607', 'par_amount': 2000000.0, 
+                            'maturity_date': 'N/A', 'average_cost': 100.25}]}
+        filename = export_bond_holding(port_values, self.output_dir)
+        self.assertTrue(filename.endswith('12229_2018-01-02_trustee_nav'+extension))
+
+        columns = read_columnar(filename)
+        self.assertEqual(list(columns['isin']), ['XS1213794578', 'HK0000163607'])
+        self.assertEqual(list(columns['portfolio_id']), ['12229', '12229'])
+        self.assertAlmostEqual(columns['par_amount'][1], 2000000.0)
+        self.assertEqual(str(columns['maturity_date'][0])[:10], '2025-04-15')
+        self.assertTrue(export.np.isnat(columns['maturity_date'][1]))
+        self.assertTrue(export.np.isnan(columns['coupon_rate'][0]))
+
+
+
+    def verify_transactions(self, extension):
+        transactions = [{'portfolio_id': '12229', 'action': 'buy', 'security_id': 'XS1',
+                            'trade date': datetime(2018,1,2), 'reference code': 123.0,
+                            'amount': 1000.0}]
+        filename = export_transactions('trades', transactions, self.output_dir)
+        self.assertEqual(filename, os.path.join(self.output_dir, 'trades'+extension))
+        columns = read_columnar(filename)
+        self.assertEqual(list(columns['reference code']), ['123'])
+        self.assertEqual(str(columns['trade date'][0])[:10], '2018-01-02')
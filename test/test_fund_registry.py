@@ -0,0 +1,72 @@
+"""
+Test the fund registry from fund_registry.py
+
+"""
+
+import unittest2
+from trustee.fund_registry import FundRegistry, InvalidFundRegistry, \
+                                    normalise_fund_name
+from trustee.holding import map_portfolio_id, get_custodian
+from trustee.transaction import map_portfolio_id as map_transaction_portfolio_id
+
+
+
+class TestFundRegistry(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestFundRegistry, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        pass
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        pass
+
+
+
+    def test_normalise_fund_name(self):
+        self.assertEqual(normalise_fund_name('CLT-CLI HK BR Trust Fund (Capital) (Sub-Fund-Bond) '),
+                            normalise_fund_name('CLT-CLI HK BR Trust Fund(Capital)(Sub-Fund-Bond)'))
+
+
+
+    def test_map_portfolio_id(self):
+        self.assertEqual(map_portfolio_id('CLI HK BR (CLASS A-HK) TRUST FUND (SUB-FUND-BOND)'), '12229')
+        self.assertEqual(map_portfolio_id('CLI HK BR (CLASS A-HK) TRUST FUND'), '11490')
+        self.assertEqual(map_transaction_portfolio_id('CLT-CLI HK BR Trust Fund (Capital) (Sub-Fund-Bond) '), 
+                            '12732')
+        self.assertEqual(map_transaction_portfolio_id('CLT-CLI Macau BR (Class G-MC)Trust Fund (Sub-Fund-Bond)'),
+                            '12548')
+        with self.assertRaises(KeyError):
+            map_portfolio_id('CLI Unknown Trust Fund')
+
+
+
+    def test_get_custodian(self):
+        self.assertEqual(get_custodian('12229'), 'BOCHK')
+        self.assertEqual(get_custodian('12548'), 'JPM')
+        with self.assertRaises(KeyError):
+            get_custodian('12857')
+
+
+
+    def test_conflict(self):
+        with self.assertRaises(InvalidFundRegistry):
+            FundRegistry([('12229', 'BOCHK', 'Fund A'), ('12366', 'BOCHK', 'FUND-A')])
+
+
+
+    def test_get_key(self):
+        registry = FundRegistry([('12229', 'BOCHK', 'CLT-CLI HK BR (Class A-HK) Trust Fund')])
+        key = registry.get_key()
+        self.assertEqual(FundRegistry([('12229', 'BOCHK', 'CLT-CLI HK BR (Class A-HK) Trust Fund')]).
+                            get_key(), key)
+
+        registry.add('12734', 'BOCHK', 'CLT-CLI HK BR (Class G-HK) Trust Fund')
+        self.assertNotEqual(registry.get_key(), key)
@@ -6,7 +6,8 @@ Test the read_holding() method from open_holding.py
 import unittest2
 from datetime import datetime
 from trustee.utility import get_current_directory
-from trustee.geneva import read_line, filter_maturity
+from trustee.geneva import read_line, filter_maturity, read_positions, \
+                            iter_position_files, PositionFileError, get_report_date
 from small_program.read_file import read_file
 from os.path import join
 
@@ -73,6 +74,50 @@ class TestGeneva(unittest2.TestCase):
 
 
 
+    def test_read_positions(self):
+        file = join(get_current_directory(), 'samples', '12229_local_appraisal_sample1.xlsx')
+        holding = list(read_positions(file))
+        self.assertEqual(len(holding), 58)
+        self.assertEqual(len(filter_maturity(holding)), 27)
+        self.verify_position1(holding[0])
+        self.assertEqual(holding[2]['InvestID'], 'HK0000083706 HTM')
+        self.assertEqual(holding[2]['MaturityDate'], datetime(2016,6,30))
+        self.assertAlmostEqual(holding[2]['UnitCost'], 100)
+
+
+
+    def test_read_positions_columns(self):
+        file = join(get_current_directory(), 'samples', '12732_local_appraisal_sample4.xlsx')
+        holding = list(read_positions(file, ['InvestID', 'Quantity']))
+        self.assertEqual(len(holding), 3)
+        self.assertEqual(sorted(holding[0].keys()), ['InvestID', 'Quantity'])
+
+
+
+    def test_iter_position_files(self):
+        files = [join(get_current_directory(), 'samples', '12229_local_appraisal_sample1.xlsx'),
+                    join(get_current_directory(), 'samples', 'no_such_file.xlsx'),
+                    join(get_current_directory(), 'samples', '12732_local_appraisal_sample4.xlsx')]
+        holding = iter_position_files(files, ['InvestID', 'Quantity'], skip_error=True)
+        self.assertFalse(isinstance(holding, list))
+        holding = list(holding)
+        self.assertEqual(len(holding), 61)
+        self.assertEqual(holding[2]['InvestID'], 'HK0000083706 HTM')
+
+        # by default, a file in error stops the holding
+        with self.assertRaises(PositionFileError):
+            list(iter_position_files(files, ['InvestID', 'Quantity']))
+
+
+
+    def test_get_report_date(self):
+        self.assertEqual(get_report_date(join(get_current_directory(), 'samples',
+                                                '12229 local appraisal 20180103.xlsx')),
+                            datetime(2018,1,3))
+        self.assertEqual(get_report_date('12229_local_appraisal_sample1.xlsx'), None)
+
+
+
     def verify_position1(self, position):
         self.assertEqual(position['Portfolio'], '12229')
         self.assertEqual(position['InvestID'], 'CNY')
@@ -0,0 +1,164 @@
+"""
+Test the holdings history store from history.py
+
+"""
+
+import unittest2, tempfile, shutil
+from datetime import datetime
+import trustee.history
+from trustee.history import HistoryStore, HistoryOutOfOrder, append_trustee_holding, \
+                            append_geneva_holding, get_isin, TRUSTEE, GENEVA
+
+
+
+class TestHistory(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestHistory, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.directory = tempfile.mkdtemp()
+        self.interval = trustee.history.FULL_SNAPSHOT_INTERVAL
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        trustee.history.FULL_SNAPSHOT_INTERVAL = self.interval
+        shutil.rmtree(self.directory)
+
+
+
+    def test_as_of(self):
+        store = HistoryStore(self.directory)
+        for port_values in get_trustee_holdings():
+            self.assertTrue(append_trustee_holding(store, port_values))
+
+        self.assertEqual(store.get_dates(TRUSTEE, '12229'),
+                            ['2017-03-01', '2017-03-02', '2017-03-03'])
+        self.assertEqual(store.as_of(TRUSTEE, '12229', datetime(2017,2,28)), [])
+        self.assertEqual(get_par_amounts(store.as_of(TRUSTEE, '12229', '2017-03-01')),
+                            {'XS1213794578': 100, 'HK0000163607': 200})
+
+        # a date between snapshots gives the last snapshot before it
+        self.assertEqual(get_par_amounts(store.as_of(TRUSTEE, '12229', datetime(2017,3,2,12))),
+                            {'XS1213794578': 150, 'HK0000163607': 200})
+        self.assertEqual(get_par_amounts(store.as_of(TRUSTEE, '12229', datetime(2017,12,31))),
+                            {'XS1213794578': 150, 'US912828R366': 300})
+
+        # the store opened again reads the same index
+        store = HistoryStore(self.directory)
+        self.assertEqual(get_par_amounts(store.as_of(TRUSTEE, '12229', '2017-03-03')),
+                            {'XS1213794578': 150, 'US912828R366': 300})
+
+
+
+    def test_delta(self):
+        store = HistoryStore(self.directory)
+        for port_values in get_trustee_holdings():
+            append_trustee_holding(store, port_values)
+
+        self.assertEqual(store.get_entries(TRUSTEE, '12229'),
+                            [['2017-03-01', True], ['2017-03-02', False], ['2017-03-03', False]])
+        snapshot = trustee.history.load_snapshot(
+                        store.get_snapshot_file(TRUSTEE, '12229', '2017-03-03'))
+        self.assertEqual(list(snapshot['positions']), ['US912828R366'])
+        self.assertEqual(snapshot['removed'], ['HK0000163607'])
+
+
+
+    def test_full_snapshot_interval(self):
+        trustee.history.FULL_SNAPSHOT_INTERVAL = 1
+        store = HistoryStore(self.directory)
+        for port_values in get_trustee_holdings():
+            append_trustee_holding(store, port_values)
+
+        self.assertEqual([entry[1] for entry in store.get_entries(TRUSTEE, '12229')],
+                            [True, False, True])
+        self.assertEqual(get_par_amounts(store.as_of(TRUSTEE, '12229', '2017-03-03')),
+                            {'XS1213794578': 150, 'US912828R366': 300})
+
+
+
+    def test_append_again(self):
+        store = HistoryStore(self.directory)
+        holdings = get_trustee_holdings()
+        for port_values in holdings:
+            append_trustee_holding(store, port_values)
+
+        # the same snapshot again is ignored, a different one is an error
+        self.assertFalse(append_trustee_holding(store, holdings[1]))
+        holdings[0]['bond'][0]['par_amount'] = 99
+        with self.assertRaises(HistoryOutOfOrder):
+            append_trustee_holding(store, holdings[0])
+
+
+
+    def test_isin_history(self):
+        store = HistoryStore(self.directory)
+        for port_values in get_trustee_holdings():
+            append_trustee_holding(store, port_values)
+
+        history = store.isin_history('HK0000163607')
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0][:3], (TRUSTEE, '12229', '2017-03-01'))
+        self.assertEqual(history[0][3]['par_amount'], 200)
+        self.assertEqual(history[1], (TRUSTEE, '12229', '2017-03-03', None))
+
+        history = store.isin_history('XS1213794578')
+        self.assertEqual([(h[2], h[3]['par_amount']) for h in history],
+                            [('2017-03-01', 100), ('2017-03-02', 150)])
+        self.assertEqual(store.isin_history('XS0000000000'), [])
+
+
+
+    def test_geneva(self):
+        store = HistoryStore(self.directory)
+        holding = [{'Portfolio': '12229', 'InvestID': 'XS1213794578 HTM', 'Quantity': 100},
+                    {'Portfolio': '12229', 'InvestID': 'XS1213794578 HTM', 'Quantity': 50},
+                    {'Portfolio': '12734', 'InvestID': 'HK0000163607', 'Quantity': 200}]
+        self.assertEqual(append_geneva_holding(store, holding, datetime(2017,3,1)), [True, True])
+
+        positions = store.as_of(GENEVA, '12229', '2017-03-01', as_dict=True)
+        self.assertEqual(sorted(positions), ['XS1213794578 HTM', 'XS1213794578 HTM#2'])
+        self.assertEqual(len(store.isin_history('XS1213794578', source=GENEVA)), 2)
+        self.assertEqual(store.isin_history('XS1213794578', source=TRUSTEE), [])
+        self.assertEqual(get_isin('XS1213794578 HTM#2'), 'XS1213794578')
+        self.assertEqual(get_isin('HK0000163607'), 'HK0000163607')
+
+
+
+    def test_geneva_out_of_order(self):
+        store = HistoryStore(self.directory)
+        append_geneva_holding(store, [{'Portfolio': '12734', 'InvestID': 'HK0000163607',
+                                        'Quantity': 200}], datetime(2017,3,2))
+
+        # 12734 is already on a later date, so 12229 is not appended either
+        holding = [{'Portfolio': '12229', 'InvestID': 'XS1213794578 HTM', 'Quantity': 100},
+                    {'Portfolio': '12734', 'InvestID': 'HK0000163607', 'Quantity': 300}]
+        with self.assertRaises(HistoryOutOfOrder):
+            append_geneva_holding(store, holding, datetime(2017,3,1))
+
+        self.assertEqual(store.get_dates(GENEVA, '12229'), [])
+        self.assertEqual(store.get_dates(GENEVA, '12734'), ['2017-03-02'])
+
+
+
+def get_trustee_holdings():
+    return [{'portfolio_id': '12229', 'date': datetime(2017,3,1),
+                'bond': [{'isin': 'XS1213794578', 'par_amount': 100},
+                            {'isin': 'HK0000163607', 'par_amount': 200}]},
+            {'portfolio_id': '12229', 'date': datetime(2017,3,2),
+                'bond': [{'isin': 'XS1213794578', 'par_amount': 150},
+                            {'isin': 'HK0000163607', 'par_amount': 200}]},
+            {'portfolio_id': '12229', 'date': datetime(2017,3,3),
+                'bond': [{'isin': 'XS1213794578', 'par_amount': 150},
+                            {'isin': 'US912828R366', 'par_amount': 300}]}]
+
+
+
+def get_par_amounts(positions):
+    return {p['isin']: p['par_amount'] for p in positions}
@@ -8,7 +8,8 @@ from datetime import datetime
 from xlrd import open_workbook
 from trustee.utility import get_current_directory
 from trustee.holding import read_sub_section, read_section, read_holding, \
-                        merge_position, merge_lots
+                        merge_lots, classify_row, ROW_BLANK, \
+                        ROW_SUB_SECTION, ROW_TOTAL, ROW_HOLDING
 from os.path import join
 
 
@@ -32,12 +33,12 @@ class TestHolding(unittest2.TestCase):
 
 
 
-    def test_merge_position(self):
+    def test_merge_two_lots(self):
         p1 = self.create_position1()
         p2 = self.create_position2()
-        merge_position(p1, p2)    
+        p1 = merge_lots([p1, p2])[0]
         self.verify_merged_position1(p1) 
-        merge_position(p1, self.create_position4())
+        p1 = merge_lots([p1, self.create_position4()])[0]
         self.verify_merged_position2(p1) 
         
 
@@ -52,6 +53,17 @@ class TestHolding(unittest2.TestCase):
         self.assertEqual(bond['isin'], 'HK002')
         self.assertEqual(bond['par_amount'], 1000)
         self.assertAlmostEqual(bond['average_cost'], 74)
+
+
+
+    def test_merge_lots_order(self):
+        bond_holding = [self.create_position3(), self.create_position2(),
+                        self.create_position1(), self.create_position4()]
+        bond_holding = merge_lots(bond_holding)
+        self.assertEqual([bond['isin'] for bond in bond_holding], ['HK002', 'HK001'])
+        bond = bond_holding[1]
+        self.assertEqual(bond['accounting_treatment'], 'AFS')  # the first lot's
+        self.verify_merged_position2(bond)
         
 
 
@@ -118,6 +130,19 @@ class TestHolding(unittest2.TestCase):
 
 
 
+    def test_classify_row(self):
+        self.assertEqual(classify_row(''), (ROW_BLANK, False))
+        self.assertEqual(classify_row(12.5), (ROW_BLANK, False))
+        self.assertEqual(classify_row('V. Debt Securities - US$  (債務票據- 美元)'), 
+                            (ROW_HOLDING, True))
+        self.assertEqual(classify_row('(i) Held to Maturity (Transfer from AFS)'), 
+                            (ROW_SUB_SECTION, False))
+        self.assertEqual(classify_row('Total'), (ROW_TOTAL, False))
+        self.assertEqual(classify_row('(US78387GAP81) AT&T INC 5.1%'), 
+                            (ROW_HOLDING, False))
+
+
+
     def verify_bond_position1(self, bond):
         """
         Bond position at A73, nav_sample1.xls
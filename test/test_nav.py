@@ -0,0 +1,40 @@
+"""
+Test the read_nav_file() method from nav.py
+
+"""
+
+import unittest2
+from datetime import datetime
+from trustee.utility import get_current_directory
+from trustee.nav import read_nav_file
+from os.path import join
+
+
+
+class TestNav(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestNav, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        pass
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        pass
+
+
+
+    def test_read_nav_file(self):
+        filename = join(get_current_directory(), 'samples', 'new_nav_sample2.xls')
+        port_values = read_nav_file(filename)
+        self.assertEqual(port_values['portfolio_id'], '12229')
+        self.assertEqual(len(port_values['bond']), 0)
+        transactions = port_values['bond_transactions']
+        self.assertEqual(len(transactions), 3)
+        self.assertEqual(transactions[0]['portfolio_id'], '12229')
@@ -0,0 +1,112 @@
+"""
+Test the read_files() method from parallel.py
+
+"""
+
+import unittest2, tempfile, shutil, os, uuid
+import trustee.utility
+from os.path import join
+from trustee.parallel import read_files
+
+
+
+def read_number(filename):
+    with open(filename) as f:
+        return int(f.read().split('|')[0])
+
+
+
+class TestParallel(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestParallel, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = trustee.utility.config['cache']['directory']
+        trustee.utility.config['cache']['directory'] = join(self.directory, 'cache')
+        self.files = []
+        for i in range(6):
+            file = join(self.directory, 'file{0}.txt'.format(i))
+            with open(file, 'w') as f:
+                if i == 3:
+                    f.write('bad|{0}'.format(uuid.uuid4()))
+                else:
+                    f.write('{0}|{1}'.format(i, uuid.uuid4()))
+
+            self.files.append(file)
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        trustee.utility.config['cache']['directory'] = self.cache_directory
+        shutil.rmtree(self.directory)
+
+
+
+    def test_read_files(self):
+        results, file_in_error = read_files(self.files, 'test number', read_number)
+        self.verify_results(results, file_in_error)
+
+
+
+    def test_read_files_parallel(self):
+        results, file_in_error = read_files(self.files, 'test number', read_number, 
+                                            workers=3)
+        self.verify_results(results, file_in_error)
+
+
+
+    def test_read_files_incremental(self):
+        results, file_in_error = read_files(self.files, 'test number', read_number, 
+                                            workers=2, incremental=True)
+        self.verify_results(results, file_in_error)
+
+
+
+    def test_read_files_incremental_changes(self):
+        parser_name = 'test ' + str(uuid.uuid4())
+        files = [file for file in self.files if not file.endswith('3.txt')]
+        parsed = []
+        def read_func(filename):
+            parsed.append(filename)
+            return read_number(filename)
+
+        results, file_in_error = read_files(files, parser_name, read_func, incremental=True)
+        self.assertEqual([n for file, n in results], [0, 1, 2, 4, 5])
+        self.assertEqual(parsed, files)
+
+        # nothing changed
+        parsed.clear()
+        results, file_in_error = read_files(files, parser_name, read_func, incremental=True)
+        self.assertEqual([n for file, n in results], [0, 1, 2, 4, 5])
+        self.assertEqual(parsed, [])
+
+        # one file changed, one file added
+        with open(files[1], 'w') as f:
+            f.write('8|{0}'.format(uuid.uuid4()))
+        os.utime(files[1], (0, 0))
+
+        file = join(self.directory, 'file6.txt')
+        with open(file, 'w') as f:
+            f.write('6|{0}'.format(uuid.uuid4()))
+
+        parsed.clear()
+        results, file_in_error = read_files(files + [file], parser_name, read_func,
+                                            incremental=True)
+        self.assertEqual([n for file, n in results], [0, 8, 2, 4, 5, 6])
+        self.assertEqual(parsed, [files[1], file])
+
+
+
+    def verify_results(self, results, file_in_error):
+        self.assertEqual([file for file, n in results], 
+                            [file for file in self.files if not file.endswith('3.txt')])
+        self.assertEqual([n for file, n in results], [0, 1, 2, 4, 5])
+        self.assertEqual(len(file_in_error), 1)
+        self.assertEqual(file_in_error[0][0], self.files[3])
+        self.assertTrue(file_in_error[0][1].startswith('ValueError'))
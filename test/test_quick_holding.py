@@ -58,6 +58,40 @@ class TestQuickHolding(unittest2.TestCase):
 
 
 
+    def test_update_amortized_cost_unmatched(self):
+        geneva_holding = [
+            {'InvestID':'CNY', 'Group2':'Cash and Equivalents'},
+            {'InvestID':'HK0000134780 HTM', 'Group2':'Corporate Bond'},
+            {'InvestID':'HK0000175916 HTM', 'Group2':'Corporate Bond'},
+            {'InvestID':'XS1600847666', 'Group2':'Corporate Bond'}
+        ]
+        trustee_holding = [
+            {'Identifier':'HK0000134780 HTM', 'Amortized Cost':99.5},
+            {'Identifier':'US912803AY96 HTM', 'Amortized Cost':79.8}
+        ]
+        result = update_amortized_cost(geneva_holding, trustee_holding)
+        self.assertAlmostEqual(geneva_holding[1]['Amortized Cost'], 99.5)
+        self.assertEqual(result['not_in_geneva'], [trustee_holding[1]])
+        self.assertEqual(result['not_in_trustee'], [geneva_holding[2]])
+
+
+
+    def test_update_amortized_cost_portfolios(self):
+        geneva_holding = [
+            {'Portfolio':'12229', 'InvestID':'HK0000134780 HTM', 'Group2':'Corporate Bond'},
+            {'Portfolio':'12229', 'InvestID':'HK0000175916 HTM', 'Group2':'Corporate Bond'},
+            {'Portfolio':'12734', 'InvestID':'HK0000134780 HTM', 'Group2':'Corporate Bond'},
+            {'Portfolio':'12734', 'InvestID':'HK0000175916 HTM', 'Group2':'Corporate Bond'}
+        ]
+        trustee_holding = [{'Identifier':'HK0000134780 HTM', 'Amortized Cost':99.5}]
+        result = update_amortized_cost(geneva_holding, trustee_holding)
+        self.assertAlmostEqual(geneva_holding[0]['Amortized Cost'], 99.5)
+        self.assertAlmostEqual(geneva_holding[2]['Amortized Cost'], 99.5)
+        self.assertEqual(result['not_in_geneva'], [])
+        self.assertEqual(result['not_in_trustee'], [geneva_holding[1], geneva_holding[3]])
+
+
+
     def verify_trustee_position1(self, position):
         # fist position in new_12229.xlsx
         # HK0000134780 FarEast Horizon5.75%
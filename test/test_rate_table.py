@@ -0,0 +1,96 @@
+"""
+Test the exchange rate table from rate_table.py
+
+"""
+
+import unittest2, tempfile, os
+import trustee.rate_table
+from trustee.rate_table import RateTable, ExchangeRateNotFound, read_rate_table, \
+                                get_rate_table, get_currency
+
+
+
+class TestRateTable(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestRateTable, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        f, self.filename = tempfile.mkstemp(suffix='.txt')
+        os.close(f)
+        write_exchange_file(self.filename, ['USDHKD=7.8472', 'CNYHKD=1.1812'])
+        self.get_exchange_file = trustee.rate_table.get_exchange_file
+        trustee.rate_table.get_exchange_file = lambda: self.filename
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        trustee.rate_table.get_exchange_file = self.get_exchange_file
+        trustee.rate_table._rate_table.reset()
+        os.remove(self.filename)
+
+
+
+    def test_read_rate_table(self):
+        table = read_rate_table(self.filename)
+        self.assertEqual(table.rates['USDHKD'], 7.8472)
+        self.assertEqual(table.rates['CNYHKD'], 1.1812)
+
+
+
+    def test_read_rate_table_invalid(self):
+        write_exchange_file(self.filename, ['USDHKD=N/A', 'CNYHKD=1.1812'])
+        table = read_rate_table(self.filename)
+        self.assertFalse('USDHKD' in table.rates)
+        self.assertEqual(read_rate_table(self.filename+'.none').rates, {})
+
+
+
+    def test_get_rate(self):
+        table = RateTable({'USDHKD': 7.8, 'CNYHKD': 1.2})
+        self.assertEqual(table.get_rate('HKD', 'HKD'), 1.0)
+        self.assertEqual(table.get_rate('USD', 'HKD'), 7.8)
+        self.assertAlmostEqual(table.get_rate('HKD', 'USD'), 1/7.8)
+        self.assertAlmostEqual(table.get_rate('USD', 'CNY'), 6.5)
+        with self.assertRaises(ExchangeRateNotFound):
+            table.get_rate('EUR', 'HKD')
+
+
+
+    def test_get_rates(self):
+        table = RateTable({'USDHKD': 7.8, 'CNYHKD': 1.2})
+        self.assertEqual(table.get_rates(['United States Dollar', 'Hong Kong Dollar',
+                                            'United States Dollar', 'Chinese Renminbi Yuan']),
+                            [7.8, 1.0, 7.8, 1.2])
+        self.assertEqual(table.get_rates([]), [])
+        with self.assertRaises(ExchangeRateNotFound):
+            table.get_rates(['United States Dollar', 'Euro Currency'])
+
+
+
+    def test_get_currency(self):
+        self.assertEqual(get_currency('Hong Kong Dollar'), 'HKD')
+        self.assertEqual(get_currency('usd'), 'USD')
+        with self.assertRaises(ExchangeRateNotFound):
+            get_currency('Japanese Yen')
+
+
+
+    def test_get_rate_table_reload(self):
+        table = get_rate_table()
+        self.assertEqual(table.get_rate('USD', 'HKD'), 7.8472)
+        self.assertTrue(get_rate_table() is table)
+
+        write_exchange_file(self.filename, ['USDHKD=7.8', 'CNYHKD=1.1812'])
+        os.utime(self.filename, (0, 0))    # make sure the modified time changes
+        self.assertEqual(get_rate_table(check=True).get_rate('USD', 'HKD'), 7.8)
+
+
+
+def write_exchange_file(filename, lines):
+    with open(filename, 'w') as f:
+        f.write('[Exchange]\n' + '\n'.join(lines) + '\n')
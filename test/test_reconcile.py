@@ -0,0 +1,96 @@
+"""
+Test the reconcile() method from reconcile.py
+
+"""
+
+import unittest2
+from datetime import datetime
+from trustee.reconcile import reconcile, PortfolioRepeated
+
+
+
+class TestReconcile(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestReconcile, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        pass
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        pass
+
+
+
+    def test_reconcile(self):
+        trustee_portfolios = [
+            {'portfolio_id': '12229', 'bond': [
+                {'isin': 'XS1213794578', 'accounting_treatment': 'HTM', 'par_amount': 1000000.0,
+                    'average_cost': 99.5, 'maturity_date': datetime(2025,4,15)},
+                {'isin': 'HK0000163607', 'accounting_treatment': 'HTM', 'par_amount': 2000000.0,
+                    'average_cost': 100.0, 'maturity_date': datetime(2023,9,8)},
+                {'isin': 'XS0000000001', 'accounting_treatment': 'AFS', 'par_amount': 500000.0,
+                    'average_cost': 101.0, 'maturity_date': datetime(2022,1,1)}]},
+            {'portfolio_id': '12732', 'bond': [
+                {'isin': 'XS1213794578', 'accounting_treatment': 'HTM', 'par_amount': 300000.0,
+                    'average_cost': 99.0, 'maturity_date': datetime(2025,4,15)}]}]
+
+        geneva_holding = [
+            make_position('12229', 'XS1213794578 HTM', 1000000.0, 99.50001, datetime(2025,4,15)),
+            make_position('12229', 'HK0000163607 HTM', 1500000.0, 100.0, datetime(2023,9,9)),
+            make_position('12229', 'US0000000002 HTM', 100.0, 100.0, ''),
+            make_position('12229', 'USD', 1.0, 1.0, '', 'Cash and Equivalents'),
+            make_position('12732', 'XS1213794578 HTM', 100000.0, 99.0, datetime(2025,4,15)),
+            make_position('12732', 'XS1213794578 HTM', 200000.0, 99.0, datetime(2025,4,15)),
+            make_position('12630', 'XS9999999999 HTM', 100.0, 100.0, '')]
+
+        breaks = reconcile(trustee_portfolios, iter(geneva_holding), (0.01, 0.0001, 0))
+        found = sorted((b['portfolio'], b['invest_id'], b['break_type']) for b in breaks)
+        self.assertEqual(found, [
+            ('12229', 'HK0000163607 HTM', 'maturity'),
+            ('12229', 'HK0000163607 HTM', 'quantity'),
+            ('12229', 'US0000000002 HTM', 'not in trustee'),
+            ('12229', 'XS0000000001', 'not in geneva')])
+
+        quantity_break = [b for b in breaks if b['break_type'] == 'quantity'][0]
+        self.assertAlmostEqual(quantity_break['difference'], 500000.0)
+
+        breaks = reconcile(trustee_portfolios, geneva_holding, (0.01, 0.0001, 1))
+        self.assertEqual(len(breaks), 3)
+
+
+
+    def test_reconcile_matured(self):
+        trustee_portfolios = [{'portfolio_id': '12229', 'bond': []}]
+        geneva_holding = [
+            make_position('12229', 'XS1213794578 HTM', 1000000.0, 99.5, datetime(2016,12,31)),
+            make_position('12229', 'HK0000163607 HTM', 2000000.0, 100.0, datetime(2017,1,1))]
+
+        breaks = reconcile(trustee_portfolios, geneva_holding, (0.01, 0.0001, 0))
+        self.assertEqual([(b['invest_id'], b['break_type']) for b in breaks],
+                            [('HK0000163607 HTM', 'not in trustee')])
+
+
+
+    def test_reconcile_repeated(self):
+        bond = {'isin': 'XS1213794578', 'accounting_treatment': 'HTM', 'par_amount': 1000000.0,
+                'average_cost': 99.5, 'maturity_date': datetime(2025,4,15)}
+        trustee_portfolios = [{'portfolio_id': '12229', 'bond': [bond]},
+                                {'portfolio_id': '12229', 'bond': [dict(bond)]}]
+
+        with self.assertRaises(PortfolioRepeated):
+            reconcile(trustee_portfolios, [], (0.01, 0.0001, 0))
+
+
+
+def make_position(portfolio, invest_id, quantity, unit_cost, maturity_date, 
+                    group='Corporate Bond'):
+    return {'Portfolio': portfolio, 'InvestID': invest_id, 'Group1': group, 
+            'Group2': group, 'Quantity': quantity, 'UnitCost': unit_cost,
+            'MaturityDate': maturity_date}
@@ -0,0 +1,80 @@
+"""
+Test the record types from record.py
+
+"""
+
+import unittest2, pickle
+from trustee.record import BondLot, BondTransaction, GenevaPosition
+from trustee.holding import merge_lots
+
+
+
+class TestRecord(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestRecord, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        pass
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        pass
+
+
+
+    def test_mapping(self):
+        bond = BondLot()
+        bond['isin'] = 'XS1213794578'
+        bond['par_amount'] = 1000.0
+        self.assertEqual(len(bond), 2)
+        self.assertTrue('isin' in bond)
+        self.assertFalse('name' in bond)
+        self.assertEqual(bond.get('name', ''), '')
+        self.assertEqual(list(bond.keys()), ['isin', 'par_amount'])
+        self.assertEqual(bond, {'isin': 'XS1213794578', 'par_amount': 1000.0})
+        with self.assertRaises(KeyError):
+            bond['name']
+
+        self.assertFalse(hasattr(bond, '__dict__'))
+
+
+
+    def test_field_with_space(self):
+        t = BondTransaction({'trade date': 1, 'action': 'buy'})
+        self.assertEqual(t['trade date'], 1)
+        self.assertEqual(sorted(t.keys()), ['action', 'trade date'])
+
+
+
+    def test_extra_field(self):
+        position = GenevaPosition()
+        position['InvestID'] = 'US912803AY96 HTM'
+        position['PercentAssets'] = 0.02
+        self.assertEqual(len(position), 2)
+        self.assertAlmostEqual(position['PercentAssets'], 0.02)
+        del position['PercentAssets']
+        self.assertFalse('PercentAssets' in position)
+
+
+
+    def test_pickle(self):
+        position = GenevaPosition({'InvestID': 'CNY', 'Quantity': 100.0, 'CostBook': 1.0})
+        p = pickle.loads(pickle.dumps(position, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(isinstance(p, GenevaPosition))
+        self.assertEqual(p, position)
+
+
+
+    def test_merge_lots(self):
+        holding = [BondLot({'isin': 'A', 'par_amount': 100.0, 'average_cost': 99.0}),
+                    BondLot({'isin': 'A', 'par_amount': 300.0, 'average_cost': 103.0})]
+        merged = merge_lots(holding)
+        self.assertEqual(len(merged), 1)
+        self.assertAlmostEqual(merged[0]['par_amount'], 400.0)
+        self.assertAlmostEqual(merged[0]['average_cost'], 102.0)
@@ -0,0 +1,59 @@
+"""
+Test the security master from security_master.py
+
+"""
+
+import unittest2, tempfile, os
+from trustee.security_master import read_security_master, get_security_master
+from trustee.quick_holding import get_identifier
+from trustee.holding import rename_position_isin, get_security_id_map
+
+
+
+class TestSecurityMaster(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestSecurityMaster, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        f, self.filename = tempfile.mkstemp(suffix='.csv')
+        os.write(f, '# comment\ntrustee_code,isin,geneva_invest_id,description\n'
+                    'HSBCFN13014,HK0000163607,,New World\n'
+                    'ABCDFN00001,XS0000000001,XS0000000001 AFS,test\n'.encode())
+        os.close(f)
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        os.remove(self.filename)
+
+
+
+    def test_read_security_master(self):
+        security_master = read_security_master(self.filename)
+        self.assertEqual(security_master.get_isin('HSBCFN13014'), 'HK0000163607')
+        self.assertEqual(security_master.get_code('HK0000163607'), 'HSBCFN13014')
+        self.assertEqual(security_master.map_code('XS1213794578'), 'XS1213794578')
+        self.assertEqual(security_master.get_invest_id('HK0000163607'), 'HK0000163607 HTM')
+        self.assertEqual(security_master.get_invest_id('XS0000000001'), 'XS0000000001 AFS')
+        self.assertEqual(security_master.get_isin_from_invest_id('XS0000000001 AFS'), 
+                            'XS0000000001')
+        with self.assertRaises(KeyError):
+            security_master.get_isin('XS1213794578')
+
+        self.assertNotEqual(security_master.get_key(), get_security_master().get_key())
+
+
+
+    def test_call_sites(self):
+        self.assertEqual(get_identifier('HSBCFN13014 NEW WORLD 6%'), 'HK0000163607 HTM')
+        self.assertEqual(get_identifier('HK0000134780 FarEast Horizon5.75%'), 
+                            'HK0000134780 HTM')
+        positions = rename_position_isin([{'isin': 'WLHKFN09007'}, {'isin': 'HK0000134780'}])
+        self.assertEqual([p['isin'] for p in positions], ['BBG00000WLY9', 'HK0000134780'])
+        self.assertEqual(get_security_id_map()['DBANFB12014'], 'HK0000175916')
+        self.assertTrue(get_security_master() is get_security_master())
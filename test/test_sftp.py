@@ -0,0 +1,268 @@
+"""
+Test the paramiko transport of sftp.py against a stand-in sftp server
+running in this process.
+
+"""
+
+import unittest2, tempfile, shutil, socket, threading, os
+from os.path import join, isfile
+try:
+    import paramiko
+    import trustee.sftp
+    from trustee.sftp import ParamikoTransport, WinSCPTransport, upload, create_transport
+except ImportError:
+    paramiko = None
+
+
+
+@unittest2.skipIf(paramiko is None, 'paramiko is not installed')
+class TestSftp(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestSftp, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.local_dir = tempfile.mkdtemp()
+        self.remote_dir = tempfile.mkdtemp()
+        self.server = StandInServer(self.remote_dir)
+        self.known_hosts = join(self.local_dir, 'known_hosts')
+        self.server.write_known_hosts(self.known_hosts)
+        self.transport = self.make_transport()
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        self.transport.close()
+        self.server.close()
+        shutil.rmtree(self.local_dir)
+        shutil.rmtree(self.remote_dir)
+
+
+
+    def test_upload(self):
+        file_list = [self.make_file('upload_sample1.txt', 'CD025,4,XS1,,7.8,7.8'),
+                        self.make_file('upload_sample2.txt', 'CD024,4,HK2,,35,35')]
+        result = upload(file_list, self.transport)
+        self.assertEqual(result, {'pass': file_list, 'fail': []})
+        with open(join(self.remote_dir, 'upload_sample1.txt')) as f:
+            self.assertEqual(f.read(), 'CD025,4,XS1,,7.8,7.8')
+
+
+
+    def test_upload_persistent(self):
+        for i in range(3):
+            file = self.make_file('upload_{0}.txt'.format(i), 'line {0}'.format(i))
+            self.assertEqual(upload([file], self.transport)['pass'], [file])
+
+        # one session for all uploads
+        self.assertEqual(self.server.connections, 1)
+
+
+
+    def test_upload_reconnect(self):
+        file1 = self.make_file('upload_sample1.txt', 'abc')
+        file2 = self.make_file('upload_sample2.txt', 'def')
+        self.assertEqual(upload([file1], self.transport)['pass'], [file1])
+
+        self.server.drop_connections()
+        self.assertEqual(upload([file2], self.transport)['pass'], [file2])
+        self.assertEqual(self.server.connections, 2)
+        self.assertTrue(isfile(join(self.remote_dir, 'upload_sample2.txt')))
+
+
+
+    def test_upload_reconnect_failed(self):
+        file1 = self.make_file('upload_sample1.txt', 'abc')
+        file2 = self.make_file('upload_sample2.txt', 'def')
+        file3 = self.make_file('upload_sample3.txt', 'ghi')
+        self.assertEqual(upload([file1], self.transport)['pass'], [file1])
+
+        # the session drops, and the server is gone when connecting again
+        self.server.drop_connections()
+        self.transport.port = get_closed_port()
+        self.assertEqual(upload([file2, file3], self.transport),
+                            {'pass': [], 'fail': [file2, file3]})
+
+
+
+    def test_upload_missing_file(self):
+        file1 = self.make_file('upload_sample1.txt', 'abc')
+        file2 = join(self.local_dir, 'no_such_file.txt')
+        result = upload([file2, file1], self.transport)
+        self.assertEqual(result, {'pass': [file1], 'fail': [file2]})
+
+
+
+    def test_upload_wrong_password(self):
+        file1 = self.make_file('upload_sample1.txt', 'abc')
+        transport = self.make_transport(password='wrong')
+        self.assertEqual(upload([file1], transport), {'pass': [], 'fail': [file1]})
+        self.assertFalse(isfile(join(self.remote_dir, 'upload_sample1.txt')))
+
+
+
+    def test_upload_unknown_host(self):
+        file1 = self.make_file('upload_sample1.txt', 'abc')
+        transport = self.make_transport(known_hosts=join(self.local_dir, 'empty_known_hosts'))
+        with open(transport.known_hosts, 'w') as f:
+            pass
+
+        self.assertEqual(upload([file1], transport), {'pass': [], 'fail': [file1]})
+
+
+
+    def test_create_transport(self):
+        get_known_hosts_file = trustee.sftp.get_known_hosts_file
+        try:
+            trustee.sftp.get_known_hosts_file = lambda: ''
+            self.assertTrue(isinstance(create_transport('winscp'), WinSCPTransport))
+            self.assertTrue(isinstance(create_transport('paramiko'), WinSCPTransport))
+
+            trustee.sftp.get_known_hosts_file = lambda: self.known_hosts
+            self.assertTrue(isinstance(create_transport('paramiko'), ParamikoTransport))
+        finally:
+            trustee.sftp.get_known_hosts_file = get_known_hosts_file
+
+
+
+    def make_transport(self, password='password', known_hosts=None):
+        if known_hosts is None:
+            known_hosts = self.known_hosts
+
+        return ParamikoTransport('127.0.0.1', 'demo', password, port=self.server.port,
+                                    known_hosts=known_hosts, timeout=10)
+
+
+
+    def make_file(self, filename, content):
+        file = join(self.local_dir, filename)
+        with open(file, 'w') as f:
+            f.write(content)
+
+        return file
+
+
+
+def get_closed_port():
+    """
+    A port on localhost that nothing listens to.
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+
+class StandInServer():
+    """
+    An sftp server on localhost that accepts user 'demo' with password
+    'password', files are written to the root directory.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.connections = 0
+        self.transports = []
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(5)
+        self.port = self.socket.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+
+    def serve(self):
+        while True:
+            try:
+                client, address = self.socket.accept()
+            except OSError:
+                return    # closed
+
+            self.connections = self.connections + 1
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, StandInSFTPServer,
+                                            root=self.root)
+            self.transports.append(transport)
+            try:
+                transport.start_server(server=StandInAuth())
+            except (paramiko.SSHException, EOFError):
+                pass
+
+
+    def write_known_hosts(self, filename):
+        host_keys = paramiko.HostKeys()
+        host_keys.add('[127.0.0.1]:{0}'.format(self.port), self.host_key.get_name(),
+                        self.host_key)
+        host_keys.save(filename)
+
+
+    def drop_connections(self):
+        for transport in self.transports:
+            transport.close()
+
+
+    def close(self):
+        self.drop_connections()
+        self.socket.close()
+
+
+
+class StandInAuth(paramiko.ServerInterface if paramiko else object):
+
+    def check_auth_password(self, username, password):
+        if username == 'demo' and password == 'password':
+            return paramiko.AUTH_SUCCESSFUL
+
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else \
+                paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+
+class StandInHandle(paramiko.SFTPHandle if paramiko else object):
+
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.writefile.fileno()))
+
+
+
+class StandInSFTPServer(paramiko.SFTPServerInterface if paramiko else object):
+
+    def __init__(self, server, *args, root=None, **kwargs):
+        super(StandInSFTPServer, self).__init__(server, *args, **kwargs)
+        self.root = root
+
+    def get_path(self, path):
+        return join(self.root, path.lstrip('/'))
+
+    def open(self, path, flags, attr):
+        try:
+            f = open(self.get_path(path), 'wb')
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        handle = StandInHandle(flags)
+        handle.writefile = f
+        handle.filename = self.get_path(path)
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.get_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
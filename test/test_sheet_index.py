@@ -0,0 +1,140 @@
+"""
+Test the find_report_sheet() method from sheet_index.py
+
+"""
+
+import unittest2, tempfile, shutil, os
+import trustee.utility
+from trustee.sheet_index import find_report_sheet, load_sheet_index, \
+                                get_sheet_index_file
+
+
+
+class TestSheetIndex(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestSheetIndex, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.cache_directory = trustee.utility.config['cache']['directory']
+        self.directory = tempfile.mkdtemp()
+        trustee.utility.config['cache']['directory'] = self.directory
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        trustee.utility.config['cache']['directory'] = self.cache_directory
+        shutil.rmtree(self.directory)
+
+
+
+    def test_find_report_sheet(self):
+        wb = Workbook(['Cover', 'Portfolio Val.', 'Transactions', 'Cash'])
+        ws = find_report_sheet(wb, 'Transactions report', get_report_name)
+        self.assertEqual(ws.name, 'Transactions')
+        self.assertEqual(wb.loaded, [0, 1, 2])
+        self.assertEqual(wb.unloaded, [0, 1])
+
+        # the index is saved, no temporary file left behind
+        index = load_sheet_index()
+        self.assertEqual(index[wb.get_key()]['Transactions report'], 2)
+        self.assertEqual(os.listdir(self.directory), ['sheet_index.json'])
+
+
+
+    def test_find_report_sheet_indexed(self):
+        find_report_sheet(Workbook(['Cover', 'Portfolio Val.', 'Transactions']),
+                            'Transactions report', get_report_name)
+
+        # another workbook of the same template goes straight to the sheet
+        wb = Workbook(['Cover', 'Portfolio Val.', 'Transactions'])
+        ws = find_report_sheet(wb, 'Transactions report', get_report_name)
+        self.assertEqual(ws.name, 'Transactions')
+        self.assertEqual(wb.loaded, [2])
+
+        # so does another report seen on the way
+        wb = Workbook(['Cover', 'Portfolio Val.', 'Transactions'])
+        ws = find_report_sheet(wb, 'Portfolio Val. report', get_report_name)
+        self.assertEqual(ws.name, 'Portfolio Val.')
+        self.assertEqual(wb.loaded, [1])
+
+
+
+    def test_find_report_sheet_out_of_date(self):
+        find_report_sheet(Workbook(['Cover', 'Portfolio Val.', 'Transactions']),
+                            'Transactions report', get_report_name)
+
+        # same sheet names, but the reports are in other sheets
+        wb = Workbook(['Cover', 'Portfolio Val.', 'Transactions'],
+                        ['Cover report', 'Transactions report', 'Portfolio Val. report'])
+        ws = find_report_sheet(wb, 'Transactions report', get_report_name)
+        self.assertEqual(ws.name, 'Portfolio Val.')
+        self.assertEqual(load_sheet_index()[wb.get_key()]['Transactions report'], 1)
+
+
+
+    def test_find_report_sheet_not_found(self):
+        wb = Workbook(['Cover', 'Portfolio Val.'])
+        self.assertEqual(find_report_sheet(wb, 'Transactions report', get_report_name), None)
+        self.assertEqual(wb.unloaded, [0, 1])
+        self.assertEqual(load_sheet_index()[wb.get_key()],
+                            {'Cover report': 0, 'Portfolio Val. report': 1})
+
+
+
+    def test_load_sheet_index_corrupted(self):
+        with open(get_sheet_index_file(), 'w') as f:
+            f.write('{"Cover|Portfolio')
+
+        self.assertEqual(load_sheet_index(), {})
+        ws = find_report_sheet(Workbook(['Cover', 'Portfolio Val.']),
+                                'Portfolio Val. report', get_report_name)
+        self.assertEqual(ws.name, 'Portfolio Val.')
+        self.assertEqual(len(load_sheet_index()), 1)
+
+
+
+class Worksheet():
+
+    def __init__(self, name, report_name):
+        self.name = name
+        self.report_name = report_name
+
+
+
+class Workbook():
+    """
+    Stands in for an xlrd workbook opened with on_demand=True, it records
+    the sheets loaded and unloaded.
+    """
+    def __init__(self, sheet_names, report_names=None):
+        if report_names is None:
+            report_names = [name + ' report' for name in sheet_names]
+
+        self.sheets = [Worksheet(name, report_name) for name, report_name \
+                        in zip(sheet_names, report_names)]
+        self.nsheets = len(self.sheets)
+        self.loaded = []
+        self.unloaded = []
+
+    def sheet_names(self):
+        return [ws.name for ws in self.sheets]
+
+    def sheet_by_index(self, i):
+        self.loaded.append(i)
+        return self.sheets[i]
+
+    def unload_sheet(self, i):
+        self.unloaded.append(i)
+
+    def get_key(self):
+        return '|'.join(self.sheet_names())
+
+
+
+def get_report_name(ws):
+    return ws.report_name
@@ -0,0 +1,53 @@
+"""
+Test the SheetView class from sheet_view.py
+
+"""
+
+import unittest2
+from xlrd import open_workbook
+from trustee.utility import get_current_directory
+from trustee.sheet_view import SheetView, get_sheet_view
+from os.path import join
+
+
+
+class TestSheetView(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestSheetView, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        pass
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        pass
+
+
+
+    def test_sheet_view(self):
+        filename = join(get_current_directory(), 'samples', 'nav_sample1.xls')
+        wb = open_workbook(filename=filename)
+        ws = wb.sheet_by_name('Portfolio Val.')
+        view = SheetView(ws)
+        self.assertEqual(view.nrows, ws.nrows)
+        self.assertEqual(view.ncols, ws.ncols)
+        self.assertEqual(view.cell_value(72, 0), ws.cell_value(72, 0))
+        self.assertEqual(view.row_values(72), ws.row_values(72))
+        self.assertEqual(view.row_values(72, 2, 5), ws.row_values(72, 2, 5))
+        self.assertEqual(view.col_values(0), ws.col_values(0))
+        self.assertEqual(view.col_values(0, 60, 70), ws.col_values(0, 60, 70))
+
+
+
+    def test_get_sheet_view(self):
+        filename = join(get_current_directory(), 'samples', 'nav_sample1.xls')
+        wb = open_workbook(filename=filename)
+        view = get_sheet_view(wb.sheet_by_name('Portfolio Val.'))
+        self.assertTrue(isinstance(view, SheetView))
+        self.assertTrue(get_sheet_view(view) is view)
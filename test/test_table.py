@@ -0,0 +1,134 @@
+"""
+Test the PositionTable from table.py
+
+"""
+
+import unittest2
+import trustee.holding
+from datetime import datetime
+from trustee.utility import get_current_directory
+from trustee.geneva import read_positions, read_position_table, filter_maturity
+from trustee.holding import merge_lots as merge_lot_list, read_holding_table
+from trustee.quick_holding import is_cash_position
+from os.path import join
+try:
+    import numpy
+    from trustee.table import PositionTable, filter_geneva_maturity, \
+                                filter_holding_maturity, merge_lots
+except ImportError:
+    numpy = None
+
+
+
+@unittest2.skipIf(numpy is None, 'NumPy is not installed')
+class TestTable(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestTable, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        self.read_file = trustee.holding.read_file
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        trustee.holding.read_file = self.read_file
+
+
+
+    def test_filter_geneva_maturity(self):
+        file = join(get_current_directory(), 'samples', '12229_local_appraisal_sample1.xlsx')
+        holding = list(read_positions(file))
+        table = PositionTable.from_records(holding)
+        self.assertEqual(len(table), 58)
+        self.assertEqual(list(table.is_cash()), [is_cash_position(p) for p in holding])
+
+        filtered = filter_geneva_maturity(table)
+        expected = filter_maturity(holding)
+        self.assertEqual(len(filtered), 27)
+        self.assertEqual(list(filtered['InvestID']), [p['InvestID'] for p in expected])
+
+
+
+    def test_read_position_table(self):
+        file = join(get_current_directory(), 'samples', '12229_local_appraisal_sample1.xlsx')
+        holding = list(read_positions(file))
+        table = read_position_table(file)
+        self.assertEqual(len(table), 58)
+        self.assertEqual(table.fields()[-1], 'MaturityDate')
+        self.assertEqual(list(table['MaturityDate']), [p['MaturityDate'] for p in holding])
+        self.assertTrue(any(isinstance(d, datetime) for d in table['MaturityDate']))
+        self.assertEqual(list(filter_geneva_maturity(table)['InvestID']),
+                            [p['InvestID'] for p in filter_maturity(holding)])
+
+        table = read_position_table(file, ['Portfolio', 'InvestID', 'Quantity'])
+        self.assertEqual(table.fields(), ['Portfolio', 'InvestID', 'Quantity'])
+        self.assertEqual(list(table['Quantity']), [p['Quantity'] for p in holding])
+
+
+
+    def test_HTM_AFS(self):
+        table = PositionTable.from_records([{'InvestID': 'XS1 HTM'}, {'InvestID': 'XS2'}])
+        self.assertEqual(list(table.is_HTM()), [True, False])
+        self.assertEqual(list(table.is_AFS()), [False, True])
+
+
+
+    def test_filter_holding_maturity(self):
+        table = PositionTable.from_records([
+                    {'isin': 'A', 'maturity_date': datetime(2016,6,30)},
+                    {'isin': 'B', 'maturity_date': datetime(2020,6,30)},
+                    {'isin': 'C', 'maturity_date': 'N/A'}])
+        self.assertEqual(list(filter_holding_maturity(table)['isin']), ['B', 'C'])
+
+
+
+    def test_merge_lots(self):
+        holding = [{'isin': 'B', 'par_amount': 100.0, 'average_cost': 99.0, 'name': 'b1'},
+                    {'isin': 'A', 'par_amount': 200.0, 'average_cost': 101.0, 'name': 'a'},
+                    {'isin': 'B', 'par_amount': 300.0, 'average_cost': 103.0, 'name': 'b2'}]
+        merged = merge_lots(PositionTable.from_records(holding)).to_records()
+        self.assertEqual([p['isin'] for p in merged], ['B', 'A'])
+        self.assertEqual(merged[0]['name'], 'b1')
+        self.assertAlmostEqual(merged[0]['par_amount'], 400.0)
+        self.assertAlmostEqual(merged[0]['average_cost'], 102.0)
+        self.assertAlmostEqual(merged[1]['average_cost'], 101.0)
+
+        expected = merge_lot_list(holding)
+        self.assertEqual([p['isin'] for p in expected], ['B', 'A'])
+
+
+
+    def test_merge_lots_zero(self):
+        holding = [{'isin': 'B', 'par_amount': 100.0, 'average_cost': 99.0},
+                    {'isin': 'A', 'par_amount': 0.0, 'average_cost': 101.0},
+                    {'isin': 'B', 'par_amount': -100.0, 'average_cost': 103.0}]
+
+        # a single lot of zero par amount is kept as it is
+        merged = merge_lots(PositionTable.from_records(holding[1:2])).to_records()
+        self.assertEqual(merged, merge_lot_list([dict(holding[1])]))
+
+        with self.assertRaises(ZeroDivisionError):
+            merge_lot_list([dict(p) for p in holding])
+        with self.assertRaises(ZeroDivisionError):
+            merge_lots(PositionTable.from_records(holding))
+
+
+
+    def test_read_holding_table(self):
+        trustee.holding.read_file = lambda filename: {'portfolio_id': '12229', 'bond': [
+            {'isin': 'XS1', 'par_amount': 100.0, 'accounting_treatment': 'AFS'},
+            {'isin': 'XS2', 'par_amount': 200.0, 'accounting_treatment': 'HTM',
+                'amortized_cost': 99.0}]}
+
+        port_values = read_holding_table('nav.xls')
+        self.assertEqual(port_values['portfolio_id'], '12229')
+        table = port_values['bond']
+        self.assertEqual(table.fields(), ['isin', 'par_amount', 'accounting_treatment',
+                                            'amortized_cost'])
+        self.assertEqual(list(table['par_amount']), [100.0, 200.0])
+        self.assertEqual(list(table['amortized_cost']), ['', 99.0])
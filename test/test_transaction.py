@@ -37,6 +37,8 @@ class TestTransaction(unittest2.TestCase):
         wb = open_workbook(filename=filename)
         ws = wb.sheet_by_index(0)
         self.assertEqual(get_report_name(ws), 'SECURITIES TRANSACTION IMPLEMENTED')
+        self.assertEqual(get_report_name(ShortSheet([])), '')
+        self.assertEqual(get_report_name(ShortSheet([['Cover'], ['']])), '')
         
 
 
@@ -131,4 +133,18 @@ class TestTransaction(unittest2.TestCase):
         self.assertEqual(t['amount'], 40000000)
         self.assertAlmostEqual(t['price'], 98.737)
         self.assertAlmostEqual(t['fx rate'], 7.75190)
-        self.assertAlmostEqual(t['effective yield'], 6.099958)
\ No newline at end of file
+        self.assertAlmostEqual(t['effective yield'], 6.099958)
+
+
+
+class ShortSheet():
+    """
+    Stands in for an xlrd worksheet with fewer than 3 rows, like an empty
+    sheet in a NAV file.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.nrows = len(rows)
+
+    def row_values(self, row):
+        return self.rows[row]
@@ -0,0 +1,58 @@
+"""
+Test the row builder and writer from writer.py
+
+"""
+
+import unittest2, tempfile, os, csv
+from datetime import datetime
+from trustee.writer import make_row_builder, write_csv, field, required, fixed, \
+                            computed, format_date
+
+
+
+class TestWriter(unittest2.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestWriter, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        """
+            Run before a test function
+        """
+        f, self.filename = tempfile.mkstemp(suffix='.csv')
+        os.close(f)
+
+    def tearDown(self):
+        """
+            Run after a test finishes
+        """
+        os.remove(self.filename)
+
+
+
+    def test_make_row_builder(self):
+        build_row = make_row_builder([fixed('12229'), field('name'), required('isin'),
+                                        computed(lambda p: p['isin']+' HTM'), fixed(None)])
+        self.assertEqual(build_row({'isin': 'XS1'}), ['12229', '', 'XS1', 'XS1 HTM', None])
+        with self.assertRaises(KeyError):
+            build_row({'name': 'no isin'})
+
+
+
+    def test_format_date(self):
+        build_row = make_row_builder([field('maturity_date', format_date)])
+        self.assertEqual(build_row({'maturity_date': 'N/A'}), ['N/A'])
+        self.assertEqual(build_row({}), [''])
+
+
+
+    def test_write_csv(self):
+        positions = ({'isin': 'XS{0}'.format(i), 'par_amount': float(i)} for i in range(2500))
+        write_csv(self.filename, [['isin', 'par_amount']], 
+                    [field('isin'), field('par_amount')], positions, delimiter='|')
+        with open(self.filename, newline='') as f:
+            rows = list(csv.reader(f, delimiter='|'))
+
+        self.assertEqual(len(rows), 2501)
+        self.assertEqual(rows[0], ['isin', 'par_amount'])
+        self.assertEqual(rows[2500], ['XS2499', '2499.0'])
@@ -5,15 +5,23 @@
 #
 
 from xlrd import open_workbook
-from xlrd.xldate import xldate_as_datetime
-from trustee.utility import logger, get_input_directory, get_datemode, \
+from trustee.utility import get_input_directory, get_datemode, \
 						get_output_directory, retrieve_or_create
-from trustee.holding import get_security_id_map
+from trustee.security_master import get_security_master
+from trustee.fund_registry import get_fund_registry
+from trustee.writer import write_csv, field, format_date
+from trustee.sheet_view import get_sheet_view
+from trustee.record import BondTransaction
+from trustee.excel_date import convert_excel_dates
+from trustee.sheet_index import find_report_sheet
+from trustee.parallel import read_files
 from jpm.open_jpm import is_blank_line
-from DIF.open_dif import convert_datetime_to_string
 from bochk.open_bochk import retrieve_date_from_filename
 from datetime import datetime
-import re, csv
+from os.path import join
+import re
+import logging
+logger = logging.getLogger(__name__)
 
 
 
@@ -26,6 +34,9 @@ class UnrecognizedHoldingLine(Exception):
 class InvalidFundName(Exception):
 	pass
 
+class InvalidTransactionDate(Exception):
+	pass
+
 
 
 def read_transaction(ws, port_values):
@@ -44,6 +55,7 @@ def read_transaction(ws, port_values):
 
 	Foreign Currency Commitment
 	"""
+	ws = get_sheet_view(ws)
 	port_values['portfolio_id'], row = get_portfolio_id(ws)
 	while (row < ws.nrows):
 			
@@ -103,10 +115,13 @@ def read_bond_section(ws, row, action, port_values):
 	"""
 	Read a bond sub section 
 	"""
+	ws = get_sheet_view(ws)
 	transactions = retrieve_or_create(port_values, 'bond_transactions')
 	fields, row = get_bond_fields(ws, row)
+	section = []	# transactions of this section, with their rows
 	while (row < ws.nrows):
-		cell_value = ws.cell_value(row, 0)
+		values = ws.row_values(row)
+		cell_value = values[0]
 		if isinstance(cell_value, str):
 			cell_value = cell_value.strip()
 
@@ -118,12 +133,12 @@ def read_bond_section(ws, row, action, port_values):
 		if not m is None:
 			break
 
-		t = {}
+		t = BondTransaction()
 		t['action'] = action
 		t['portfolio_id'] = port_values['portfolio_id']
 		i = 0
 		for fld in fields:
-			cell_value = ws.cell_value(row, i)
+			cell_value = values[i]
 			if isinstance(cell_value, str):
 				cell_value = cell_value.strip()
 
@@ -131,15 +146,7 @@ def read_bond_section(ws, row, action, port_values):
 			if fld == 'empty' or fld == 'currency' and i == 1:
 				continue
 
-			if fld in ['trade date', 'value date']:
-				try:
-					t[fld] = xldate_as_datetime(cell_value, 0)
-				except:
-					print(row, i, cell_value)
-					import sys
-					sys.exit(1)
-
-			elif fld == 'description':
+			if fld == 'description':
 				t['security_id'], t['description'] = get_id_description(cell_value)
 
 			elif fld == 'reference code' and isinstance(cell_value, float):
@@ -147,13 +154,36 @@ def read_bond_section(ws, row, action, port_values):
 			else:
 				t[fld] = cell_value
 
-		transactions.append(t)
+		section.append((row, t))
 		row = row + 1
 
+	for fld in ['trade date', 'value date']:
+		convert_date_field(section, fld)
+
+	transactions.extend(t for r, t in section)
 	return row
 
 
 
+def convert_date_field(section, fld):
+	"""
+	Convert the field of all transactions from Excel serial to datetime in
+	one go, trade date and value date are required, so an invalid value is
+	an error.
+
+	section: a list of (row number, transaction)
+	"""
+	dates, invalid = convert_excel_dates([t[fld] for r, t in section], 0)
+	rows = [r for (r, t), is_invalid in zip(section, invalid) if is_invalid]
+	if len(rows) > 0:
+		logger.error('convert_date_field(): invalid {0} value at rows {1}'.format(fld, rows))
+		raise InvalidTransactionDate()
+
+	for (r, t), date in zip(section, dates):
+		t[fld] = date
+
+
+
 def is_purchase_section(ws, row):
 	cell_value = get_cell_value(ws, row)
 	if isinstance(cell_value, str) and cell_value.lower().startswith('purchase'):
@@ -250,33 +280,27 @@ def read_FX(ws, row, port_values):
 
 def get_report_name(ws):
 	"""
-	Each worksheet in the NAV file is a report, get the report name.
+	Each worksheet in the NAV file is a report, get the report name, ''
+	if the sheet is too short to have one.
 	"""
-	col = 0
-	while col < ws.ncols:
-		cell_value = ws.cell_value(2, col)
+	if ws.nrows < 3:
+		return ''
+
+	for cell_value in ws.row_values(2):
 		if isinstance(cell_value, str):
 			if cell_value.strip() != '':
 				return cell_value.strip()
 
-		col = col + 1
-
 	return ''
 
 
 
 def map_portfolio_id(fund_name):
-	p_map = {
-		'CLT-CLI HK BR (Class A-HK) Trust Fund (Sub-Fund-Bond)':'12229',
-		'CLT-CLI Macau BR (Class A-MC)Trust Fund (Sub-Fund-Bond)':'12366',
-		'CLT-CLI HK BR (Class A-HK)Trust Fund(Sub-Fund-Trading Bond)':'12528',
-		'CLT-CLI Macau BR (Class G-MC)Trust Fund (Sub-Fund-Bond)':'12548',
-		'CLI HK BR (Class G-HK) Trust Fund (Sub-Fund-Bond)':'12630',
-		'CLT-CLI HK BR Trust Fund (Capital) (Sub-Fund-Bond) ':'12732',
-		'CLT-CLI Overseas Trust Fund (Capital) (Sub-Fund-Bond)':'12733',
-		'CLT-CLI HK BR (Class A-HK) Trust Fund - Sub Fund I':'12734'
-	}
-	return p_map[fund_name]
+	"""
+	Map a trustee fund name to portfolio id, raise KeyError if the fund is
+	not in the fund registry, see fund_registry.py
+	"""
+	return get_fund_registry().get_portfolio_id(fund_name)
 
 
 
@@ -294,17 +318,32 @@ def get_portfolio_id(ws):
 
 
 
+def get_parser_name():
+	"""
+	Name of the parser for the cache, the cached result depends on the
+	fund registry, see holding.get_parser_name()
+	"""
+	return 'transaction: ' + get_fund_registry().get_key()
+
+
+
 def read_file(filename):
 	"""
 	Open a NAV file, search for the sheet that contains the transactions,
 	then read and return the list of transactions.
+
+	The workbook is opened on demand, so only the sheets checked for the
+	report name are parsed, see sheet_index.find_report_sheet().
 	"""
-	wb = open_workbook(filename=filename)
-	for ws in wb.sheets():
-		if get_report_name(ws) == 'SECURITIES TRANSACTION IMPLEMENTED':
+	wb = open_workbook(filename=filename, on_demand=True)
+	try:
+		ws = find_report_sheet(wb, 'SECURITIES TRANSACTION IMPLEMENTED', get_report_name)
+		if not ws is None:
 			port_values = {}
 			read_transaction(ws, port_values)
 			return port_values['bond_transactions']
+	finally:
+		wb.release_resources()
 
 
 
@@ -318,38 +357,22 @@ def map_security_id(transactions):
 	"""
 	Map trustee security code to investment code used in Geneva.
 	"""
-	i_map = get_security_id_map()	
+	security_master = get_security_master()
 	for t in transactions:
-		if t['security_id'] in i_map:
-			t['security_id'] = i_map[t['security_id']]
+		t['security_id'] = security_master.map_code(t['security_id'])
 
 	return transactions
 
 
 
 def write_simple_transaction_csv(filename, transactions, output_dir=get_output_directory()):
-	with open(join(output_dir, filename), 'w', newline='') as csvfile:
-		file_writer = csv.writer(csvfile, delimiter='|')
-
-		# pick all fields that HTM bond have
-		fields = ['portfolio_id', 'action', 'security_id', 'description', 
-					'trade date', 'value date', 'currency', 'reference code',
-					'amount', 'price', 'fx rate']
-		file_writer.writerow(fields)
-		
-		for t in transactions:
-			row = []
-			for fld in fields:
-				try:
-					item = t[fld]
-					if fld in ['trade date', 'value date']:
-						item = convert_datetime_to_string(item)
-				except KeyError:
-					item = ''
-
-				row.append(item)
-
-			file_writer.writerow(row)
+	# pick all fields that HTM bond have
+	fields = ['portfolio_id', 'action', 'security_id', 'description', 
+				'trade date', 'value date', 'currency', 'reference code',
+				'amount', 'price', 'fx rate']
+	columns = [field(fld, format_date) if fld in ['trade date', 'value date'] else field(fld) \
+				for fld in fields]
+	write_csv(join(output_dir, filename), [fields], columns, transactions, delimiter='|')
 
 
 
@@ -357,9 +380,16 @@ def write_simple_transaction_csv(filename, transactions, output_dir=get_output_d
 if __name__ == '__main__':
 	import argparse, sys, glob
 	from os.path import join, isdir, exists
+	from trustee.export import export_transactions
 	parser = argparse.ArgumentParser(description='Read trustee NAV file and create csv output for Geneva reconciliation.')
 	parser.add_argument('--folder', help='folder containing multiple NAV files', required=False)
 	parser.add_argument('--file', help='input NAV file', required=False)
+	parser.add_argument('--incremental', help='parse only files new or changed since the last run', 
+						action='store_true')
+	parser.add_argument('--workers', help='number of processes to parse files in parallel', 
+						type=int, default=1)
+	parser.add_argument('--columnar', help='also export to a columnar binary file (parquet or npz)', 
+						action='store_true')
 	args = parser.parse_args()
 
 	if not args.file is None:
@@ -382,8 +412,15 @@ if __name__ == '__main__':
 		print('Please provide either --file or --folder input')
 		sys.exit(1)
 
+	results, file_in_error = read_files(files, get_parser_name(), read_file, 
+										workers=args.workers, incremental=args.incremental)
+	for input_file, error in file_in_error:
+		print('failed to read {0}: {1}'.format(input_file, error))
+
 	transactions = []
-	for input_file in files:
-		accumulate_transactions(transactions, read_file(input_file))
+	for input_file, result in results:
+		accumulate_transactions(transactions, result)
 
-	write_simple_transaction_csv('trades.csv', map_security_id(transactions))
\ No newline at end of file
+	write_simple_transaction_csv('trades.csv', map_security_id(transactions))
+	if args.columnar:
+		export_transactions('trades', transactions, get_output_directory())
\ No newline at end of file
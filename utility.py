@@ -1,6 +1,6 @@
 # coding=utf-8
 # 
-import configparser, os
+import configparser, os, threading, time
 # from config_logging.file_logger import get_file_logger
 
 
@@ -74,16 +74,172 @@ def get_output_directory():
 
 
 
+def get_cache_directory():
+	"""
+	Where to keep cached data, the directory is created if it does not
+	exist yet.
+	"""
+	global config
+	if config['cache']['directory'].strip() == '':
+		directory = os.path.join(get_current_directory(), 'cache')
+	else:
+		directory = config['cache']['directory']
+
+	os.makedirs(directory, exist_ok=True)	# other processes may create it too
+
+	return directory
+
+
+
+def is_cache_enabled():
+	global config
+	return config['cache']['enabled'].strip().lower() in ['yes', 'true', '1']
+
+
+
 def get_exchange_file():
 	global config
 	return config['data']['exchange_file']
 
 
 
+def get_security_master_file():
+	global config
+	if config['data'].get('security_master', '').strip() == '':
+		return os.path.join(get_current_directory(), 'security_master.csv')
+
+	return config['data']['security_master']
+
+
+
+def get_fund_registry_file():
+	global config
+	if config['data'].get('fund_registry', '').strip() == '':
+		return os.path.join(get_current_directory(), 'fund_registry.csv')
+
+	return config['data']['fund_registry']
+
+
+
+def get_history_directory():
+	"""
+	Where to keep the holdings history store, see history.py. The directory
+	is created if it does not exist yet.
+	"""
+	global config
+	section = config['history'] if 'history' in config else {}
+	if section.get('directory', '').strip() == '':
+		directory = os.path.join(get_current_directory(), 'history')
+	else:
+		directory = section['directory']
+
+	os.makedirs(directory, exist_ok=True)	# other processes may create it too
+
+	return directory
+
+
+
+def get_reconcile_tolerances():
+	"""
+	Return (quantity tolerance, cost tolerance, maturity tolerance in days)
+	for the reconciliation, see reconcile.py
+	"""
+	global config
+	section = config['reconcile'] if 'reconcile' in config else {}
+	return float(section.get('quantity_tolerance', '0.01')), \
+			float(section.get('cost_tolerance', '0.0001')), \
+			int(section.get('maturity_tolerance', '0'))
+
+
+
 def retrieve_or_create(port_values, key):
 	if not key in port_values:
 		# print('create')
 		port_values[key] = []
 
 	# print('retrieve')
-	return port_values[key]
\ No newline at end of file
+	return port_values[key]
+
+
+
+def write_atomic(filename, dump_fn, binary=True):
+	"""
+	Write the file through dump_fn(f) to a temporary file first, then
+	replace the file, so that a reader (another process) never sees a
+	half written file.
+
+	binary: if False, the file is opened as utf-8 text.
+	"""
+	temp_file = '{0}.{1}.tmp'.format(filename, os.getpid())
+	try:
+		if binary:
+			f = open(temp_file, 'wb')
+		else:
+			f = open(temp_file, 'w', encoding='utf-8')
+
+		with f:
+			dump_fn(f)
+
+		os.replace(temp_file, filename)
+	except:
+		if os.path.exists(temp_file):
+			os.remove(temp_file)
+		raise
+
+
+
+# seconds between two checks of a reloaded file's modified time
+RELOAD_CHECK_INTERVAL = 5
+
+
+
+class ReloadingFile():
+	"""
+	The content of a data file (security master, fund registry, exchange
+	rates), loaded once per process by load_fn(filename) and shared by
+	all threads. It is loaded again when the file name changes or the file
+	is modified, the modified time is checked at most once every
+	RELOAD_CHECK_INTERVAL seconds.
+	"""
+	def __init__(self, load_fn):
+		self.load_fn = load_fn
+		self.lock = threading.Lock()
+		self.reset()
+
+
+	def get(self, filename, check=False):
+		"""
+		check: if True, check the file's modified time now, instead of at
+			most once every RELOAD_CHECK_INTERVAL seconds.
+		"""
+		now = time.monotonic()
+		if not self.content is None and not check and \
+			now - self.last_check < RELOAD_CHECK_INTERVAL:
+			return self.content
+
+		with self.lock:
+			mtime = get_mtime(filename)
+			if self.content is None or filename != self.filename or mtime != self.mtime:
+				self.content = self.load_fn(filename)
+				self.filename, self.mtime = filename, mtime
+
+			self.last_check = now
+			return self.content
+
+
+	def reset(self):
+		self.content = None
+		self.filename = None
+		self.mtime = None
+		self.last_check = 0
+
+
+
+def get_mtime(filename):
+	"""
+	Modified time of the file, None if it does not exist.
+	"""
+	try:
+		return os.path.getmtime(filename)
+	except FileNotFoundError:
+		return None
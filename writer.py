@@ -0,0 +1,139 @@
+# coding=utf-8
+#
+# Write positions to csv (and .inc upload) files from a column spec.
+#
+# The output functions used to build each row field by field, with a
+# try/except KeyError, a date check or a long if/elif chain for every
+# field of every position. Here the columns of an output file are given
+# once as a list of column specs:
+#
+#	field('par_amount')			the value of a field, '' if missing
+#	field('maturity_date', format_date)	the same, passed through a converter
+#	required('InvestID')			the value of a field, KeyError if missing
+#	fixed('Held to Maturity')		the same value on every row
+#	computed(lambda p: p['isin']+' HTM')	worked out from the position
+#
+# make_row_builder() turns the spec into a function that builds a row from
+# a position, and write_rows() writes rows to the csv writer in batches.
+#
+
+from DIF.open_dif import convert_datetime_to_string
+from datetime import datetime
+from itertools import islice
+import csv
+
+
+
+# number of rows to write at a time
+BATCH_SIZE = 1000
+
+
+
+def field(name, converter=None):
+	"""
+	Column of a field of the position, '' if the position does not have
+	the field. The converter, if given, is applied to the field value.
+	"""
+	if converter is None:
+		return lambda position: position.get(name, '')
+
+	def get_value(position):
+		try:
+			return converter(position[name])
+		except KeyError:
+			return ''
+
+	return get_value
+
+
+
+def required(name):
+	"""
+	Column of a field the position must have, KeyError if it does not.
+	"""
+	return lambda position: position[name]
+
+
+
+def fixed(value):
+	"""
+	Column of the same value on every row.
+	"""
+	return lambda position: value
+
+
+
+def computed(func):
+	"""
+	Column whose value is func(position).
+	"""
+	return func
+
+
+
+def format_date(value):
+	"""
+	Converter of date fields, a datetime becomes a string like 'yyyy-mm-dd',
+	other values are kept as they are.
+	"""
+	if isinstance(value, datetime):
+		return convert_datetime_to_string(value)
+
+	return value
+
+
+
+def make_row_builder(columns):
+	"""
+	Return a function that builds a row (list) from a position.
+	"""
+	columns = tuple(columns)
+	return lambda position: [column(position) for column in columns]
+
+
+
+def iter_rows(positions, *row_builders):
+	"""
+	A generator of rows, each position gives one row per row builder.
+	"""
+	if len(row_builders) == 1:
+		row_builder = row_builders[0]
+		for position in positions:
+			yield row_builder(position)
+
+	else:
+		for position in positions:
+			for row_builder in row_builders:
+				yield row_builder(position)
+
+
+
+def write_rows(file_writer, rows, batch_size=BATCH_SIZE):
+	"""
+	Write the rows to the csv writer, batch_size rows at a time. rows can
+	be any iterable, including a generator.
+	"""
+	rows = iter(rows)
+	while True:
+		batch = list(islice(rows, batch_size))
+		if len(batch) == 0:
+			break
+
+		file_writer.writerows(batch)
+
+
+
+def write_csv(filename, header_rows, columns, positions, **fmtparams):
+	"""
+	Write a csv file, first the header rows, then one row per position
+	built from the columns. fmtparams go to csv.writer(), like delimiter
+	or quoting.
+
+	Return the file name.
+	"""
+	with open(filename, 'w', newline='') as csvfile:
+		file_writer = csv.writer(csvfile, **fmtparams)
+		file_writer.writerows(header_rows)
+		write_rows(file_writer, iter_rows(positions, make_row_builder(columns)))
+
+	return filename
@@ -0,0 +1,229 @@
+# coding=utf-8
+#
+# Stream rows out of an .xlsx file without loading the whole workbook.
+#
+# An .xlsx file is a zip archive, the cells of a worksheet are stored in
+# an XML file inside it (xl/worksheets/sheetN.xml), and the text values
+# are stored once in a shared string table (xl/sharedStrings.xml). Here
+# we parse the worksheet XML incrementally, one row at a time, and only
+# decode the cells in the columns that the caller asks for, so memory
+# stays flat however big the file is.
+#
+# The first row of the worksheet is the header row (field names), the
+# reading stops at the first blank row, the same as how we read the
+# Geneva local position appraisal reports with xlrd.
+#
+
+from zipfile import ZipFile
+from xml.etree.ElementTree import iterparse
+import posixpath, re
+import logging
+logger = logging.getLogger(__name__)
+
+
+
+class ColumnNotFound(Exception):
+	pass
+
+class SheetNotFound(Exception):
+	pass
+
+
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+TAG_ROW = NS_MAIN + 'row'
+TAG_CELL = NS_MAIN + 'c'
+TAG_VALUE = NS_MAIN + 'v'
+TAG_TEXT = NS_MAIN + 't'
+TAG_SHEET_DATA = NS_MAIN + 'sheetData'
+
+CELL_REFERENCE = re.compile('([A-Z]+)')
+
+
+
+def read_rows(filename, columns, sheet_index=0):
+	"""
+	A generator that yields one list of cell values per row, the values
+	are those of the columns (field names in the header row) asked for,
+	in the same order as they are in columns.
+
+	Text cells are returned as str, numeric cells (including dates) as
+	float, empty cells as '', the same as xlrd does.
+	"""
+	with ZipFile(filename) as zf:
+		shared_strings = read_shared_strings(zf)
+		with zf.open(get_sheet_path(zf, sheet_index)) as f:
+			rows = iter_sheet_rows(f)
+			header = read_header(rows, shared_strings)
+			try:
+				positions = [header[column] for column in columns]
+			except KeyError as e:
+				logger.error('read_rows(): column {0} not found in {1}'.
+								format(e, filename))
+				raise ColumnNotFound()
+
+			wanted = {col: i for i, col in enumerate(positions)}
+			last_row = 1
+			for row_number, cells in rows:
+				if row_number > last_row + 1 or len(cells) == 0:
+					break	# a blank row
+
+				values = [''] * len(positions)
+				for col, cell in cells:
+					try:
+						values[wanted[col]] = decode_cell(cell, shared_strings)
+					except KeyError:
+						pass	# column not asked for
+
+				yield values
+				last_row = row_number
+
+
+
+def read_header(rows, shared_strings):
+	"""
+	Read the header row, return a dictionary mapping field names to
+	column indexes.
+	"""
+	header = {}
+	for row_number, cells in rows:
+		for col, cell in cells:
+			value = decode_cell(cell, shared_strings)
+			if isinstance(value, str):
+				value = value.strip()
+
+			if value != '' and not value in header:
+				header[value] = col
+
+		break
+
+	return header
+
+
+
+def iter_sheet_rows(f):
+	"""
+	Incrementally parse the worksheet XML, yield (row number, cells) for
+	each row, where cells is a list of (column index, cell element) for
+	cells that have a value.
+
+	Elements are cleared once the row is yielded, so that the parsed tree
+	does not grow with the size of the file.
+	"""
+	sheet_data = None
+	row_number = 0
+	for event, elem in iterparse(f, events=('start', 'end')):
+		if event == 'start':
+			if elem.tag == TAG_SHEET_DATA:
+				sheet_data = elem
+			continue
+
+		if elem.tag != TAG_ROW:
+			continue
+
+		row_number = int(elem.get('r', row_number+1))
+		cells = []
+		col = 0
+		for cell in elem.iter(TAG_CELL):
+			ref = cell.get('r')
+			if not ref is None:
+				col = column_index(CELL_REFERENCE.match(ref).group(1))
+
+			if has_value(cell):
+				cells.append((col, cell))
+
+			col = col + 1
+
+		yield row_number, cells
+		elem.clear()
+		if not sheet_data is None:
+			sheet_data.clear()
+
+
+
+def column_index(letters):
+	"""
+	Convert column letters to a zero based index, 'A' -> 0, 'AB' -> 27
+	"""
+	index = 0
+	for c in letters:
+		index = index*26 + ord(c) - ord('A') + 1
+
+	return index - 1
+
+
+
+def has_value(cell):
+	if cell.get('t') == 'inlineStr':
+		return True
+
+	return not cell.find(TAG_VALUE) is None
+
+
+
+def decode_cell(cell, shared_strings):
+	cell_type = cell.get('t')
+	if cell_type == 'inlineStr':
+		return ''.join(t.text or '' for t in cell.iter(TAG_TEXT))
+
+	v = cell.find(TAG_VALUE)
+	if v is None or v.text is None:
+		return ''
+
+	if cell_type == 's':
+		return shared_strings[int(v.text)]
+	elif cell_type in ('str', 'e'):
+		return v.text
+	elif cell_type == 'b':
+		return int(v.text)
+	else:
+		return float(v.text)
+
+
+
+def read_shared_strings(zf):
+	"""
+	Read the shared string table, a list of str.
+	"""
+	shared_strings = []
+	try:
+		f = zf.open('xl/sharedStrings.xml')
+	except KeyError:
+		return shared_strings	# no text cells in the workbook
+
+	with f:
+		for event, elem in iterparse(f):
+			if elem.tag == NS_MAIN + 'si':
+				shared_strings.append(''.join(t.text or '' for t in elem.iter(TAG_TEXT)))
+				elem.clear()
+
+	return shared_strings
+
+
+
+def get_sheet_path(zf, sheet_index):
+	"""
+	Find the path of the worksheet XML inside the zip archive, based on
+	the sheet's position in the workbook.
+	"""
+	with zf.open('xl/workbook.xml') as f:
+		sheets = [elem.get(NS_REL + 'id') for event, elem in iterparse(f) \
+					if elem.tag == NS_MAIN + 'sheet']
+
+	with zf.open('xl/_rels/workbook.xml.rels') as f:
+		targets = {elem.get('Id'): elem.get('Target') for event, elem in iterparse(f) \
+					if elem.tag == NS_PKG_REL + 'Relationship'}
+
+	try:
+		target = targets[sheets[sheet_index]]
+	except (IndexError, KeyError):
+		logger.error('get_sheet_path(): sheet {0} not found'.format(sheet_index))
+		raise SheetNotFound()
+
+	if target.startswith('/'):
+		return target[1:]
+
+	return posixpath.normpath(posixpath.join('xl', target))